@@ -1,17 +1,48 @@
 """API routes for Pomotrack."""
 
-import asyncio
-import json
-from datetime import datetime, timezone
-from typing import Optional
-
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import delete, select
+import tempfile
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime, timezone
+from typing import IO, Any, Optional
+
+import orjson
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, func, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_session
-from app.models import KanbanTask, SessionRecord
+from app import (
+    archive,
+    blobclients,
+    bulk,
+    changes,
+    coalescer,
+    export,
+    labels,
+    metrics,
+    search,
+    stats,
+    sync,
+    wire,
+)
+from app.config import settings
+from app.database import get_read_session, get_session
+from app.feed import (
+    MAX_EVENT_ITEMS,
+    REPLACE,
+    SESSION_UPSERTED,
+    SESSIONS_CLEARED,
+    SESSIONS_UPSERTED,
+    TASK_DELETED,
+    TASK_UPSERTED,
+    TASKS_CLEARED,
+    TASKS_UPSERTED,
+    feed,
+)
+from app.models import KanbanTask, SessionArchive, SessionRecord
+from app.static import accepted_encodings, etag_matches
 
 router = APIRouter()
 
@@ -34,6 +65,48 @@ async def health_check():
     return HealthResponse(status="healthy", version="1.0.0")
 
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics (404 when ``POMOTRACK_METRICS_ENABLED`` is off)."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET
+# ---------------------------------------------------------------------------
+
+
+async def _check_data_version(
+    request: Request, response: Response, db: AsyncSession
+) -> Optional[Response]:
+    """Tag a list response with the data version; 304 if the client has it.
+
+    The version is read before the rows, so a concurrent write can only make
+    the body newer than its tag, never older.
+    """
+    etag = f'"{await changes.current_seq(db)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def _wire_response(
+    rows: Sequence[Any], keys: tuple[str, ...], response: Response
+) -> Response:
+    """JSON array of ``rows`` built by ``app.wire``, bypassing response models.
+
+    ``response`` carries headers set by the handler; FastAPI does not merge
+    them into a returned ``Response`` so they are copied here.
+    """
+    out = Response(content=wire.dumps_rows(rows, keys), media_type="application/json")
+    out.headers.update(response.headers)
+    return out
+
+
 # ---------------------------------------------------------------------------
 # Sessions
 # ---------------------------------------------------------------------------
@@ -57,39 +130,148 @@ class SessionOut(BaseModel):
     duration: int
 
 
-def _record_to_out(r: SessionRecord) -> SessionOut:
-    return SessionOut(
-        id=r.id,
-        type=r.type,
-        label=r.label,
-        startedAt=r.started_at,
-        completedAt=r.completed_at,
-        duration=r.duration,
-    )
+def _session_row(s: SessionIn, seq: int) -> dict:
+    return {
+        "id": s.id,
+        "type": s.type,
+        "label": s.label,
+        "started_at": s.startedAt,
+        "completed_at": s.completedAt,
+        "duration": s.duration,
+        "seq": seq,
+    }
+
+
+MAX_SESSIONS_PAGE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_session_cursor(cursor: str) -> tuple[int, Optional[str]]:
+    """Parse a ``<completedAt>[:<id>]`` keyset cursor."""
+    completed_at, sep, session_id = cursor.partition(":")
+    try:
+        value = int(completed_at)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from e
+    return value, (session_id if sep else None)
+
+
+def _session_sort_key(row: Sequence[Any]) -> tuple[int, str]:
+    session = wire.session_to_wire(row)
+    return session["completedAt"], session["id"]
 
 
 @router.get("/sessions", response_model=list[SessionOut])
-async def list_sessions(db: AsyncSession = Depends(get_session)):
-    """Return all sessions ordered by most recent first."""
-    result = await db.execute(
-        select(SessionRecord).order_by(SessionRecord.completed_at.desc())
+async def list_sessions(
+    request: Request,
+    response: Response,
+    before: Optional[str] = Query(
+        default=None, description="Cursor: return sessions completed before it"
+    ),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_SESSIONS_PAGE),
+    from_: Optional[int] = Query(default=None, alias="from", description="ms, inclusive"),
+    to: Optional[int] = Query(default=None, description="ms, exclusive"),
+    type_: Optional[str] = Query(default=None, alias="type"),
+    label: Optional[str] = Query(default=None, description="Exact label ('' = unlabeled)"),
+    include_archived: bool = Query(default=False, alias="includeArchived"),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Return sessions ordered by most recent first.
+
+    Without ``limit`` the full history is returned. With ``limit`` a page is
+    returned and, if more rows may follow, the cursor for the next page is sent
+    in the ``X-Next-Cursor`` header. ``from``/``to`` (completion time, ms),
+    ``type`` and ``label`` filter in SQL over the composite indexes, and
+    combine with the cursor. Archived sessions are only included with
+    ``includeArchived=true``. Responses carry an ETag of the data version and
+    ``If-None-Match`` is answered with 304.
+    """
+    if not_modified := await _check_data_version(request, response, db):
+        return not_modified
+
+    cursor = _parse_session_cursor(before) if before is not None else None
+    stmt = select(*wire.SESSION_COLUMNS).order_by(
+        SessionRecord.completed_at.desc(), SessionRecord.id.desc()
     )
-    return [_record_to_out(r) for r in result.scalars().all()]
+    if from_ is not None:
+        stmt = stmt.where(SessionRecord.completed_at >= from_)
+    if to is not None:
+        stmt = stmt.where(SessionRecord.completed_at < to)
+    if type_ is not None:
+        stmt = stmt.where(SessionRecord.type == type_)
+    if label is not None:
+        stmt = stmt.where(SessionRecord.label == label)
+    if cursor is not None:
+        completed_at, session_id = cursor
+        if session_id is None:
+            stmt = stmt.where(SessionRecord.completed_at < completed_at)
+        else:
+            stmt = stmt.where(
+                tuple_(SessionRecord.completed_at, SessionRecord.id)
+                < tuple_(completed_at, session_id)
+            )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    rows: Sequence[Sequence[Any]] = (await db.execute(stmt)).all()
+    if include_archived:
+        archived = await archive.list_rows(
+            db, cursor, limit, start=from_, end=to, type_=type_, label=label
+        )
+        if archived:
+            # Hot and archived ranges can interleave after a session is rewritten
+            rows = sorted([*rows, *archived], key=_session_sort_key, reverse=True)
+            rows = rows[:limit] if limit is not None else rows
+    if limit is not None and len(rows) == limit:
+        last = wire.session_to_wire(rows[-1])
+        response.headers[NEXT_CURSOR_HEADER] = f"{last['completedAt']}:{last['id']}"
+    return _wire_response(rows, wire.SESSION_KEYS, response)
+
+
+async def _write_sessions(db: AsyncSession, items: Sequence[SessionIn]) -> int:
+    """Upsert ``items`` in one transaction and commit; returns its data version."""
+    # Last occurrence of an id wins, matching sequential upserts
+    seq = await changes.next_seq(db)
+    rows = {item.id: _session_row(item, seq) for item in items}
+    existing = await stats.fetch_existing_sessions(db, list(rows))
+    existing += await archive.unarchive_sessions(db, rows.values())
+    await stats.apply_session_changes(db, existing, rows.values())
+    await bulk.upsert_sessions(db, rows.values())
+    await labels.apply_session_changes(db, existing, rows.values())
+    await changes.clear_tombstones(db, changes.SESSION, list(rows))
+    await db.commit()
+    return seq
+
+
+async def _flush_session_writes(db: AsyncSession, items: list[SessionIn]) -> None:
+    """Commit one batch of coalesced single-session upserts."""
+    seq = await _write_sessions(db, items)
+    metrics.record_session_write_batch(len(items))
+    latest = {item.id: item for item in items}
+    if len(latest) == 1:
+        feed.publish(seq, SESSION_UPSERTED, {"session": items[-1].model_dump()})
+    elif len(latest) <= MAX_EVENT_ITEMS:
+        sessions = [item.model_dump() for item in latest.values()]
+        feed.publish(seq, SESSIONS_UPSERTED, {"sessions": sessions})
+    else:
+        feed.publish(seq, REPLACE)
+
+
+session_writes = coalescer.WriteCoalescer(
+    _flush_session_writes,
+    settings.session_write_window_ms / 1000,
+    settings.session_write_batch_size,
+)
 
 
 @router.post("/sessions", status_code=200)
 async def upsert_session(body: SessionIn, db: AsyncSession = Depends(get_session)):
-    """Upsert a single session (idempotent — safe to call multiple times)."""
-    record = SessionRecord(
-        id=body.id,
-        type=body.type,
-        label=body.label,
-        started_at=body.startedAt,
-        completed_at=body.completedAt,
-        duration=body.duration,
-    )
-    await db.merge(record)
-    await db.commit()
+    """Upsert a single session (idempotent — safe to call multiple times).
+
+    Concurrent upserts are committed together (see ``app.coalescer``); the
+    response is sent once the transaction holding this one has committed.
+    """
+    await session_writes.submit(db, body)
     return {"ok": True}
 
 
@@ -98,28 +280,253 @@ async def batch_upsert_sessions(
     body: list[SessionIn], db: AsyncSession = Depends(get_session)
 ):
     """Bulk upsert sessions (used for initial migration from localStorage)."""
-    for item in body:
-        record = SessionRecord(
-            id=item.id,
-            type=item.type,
-            label=item.label,
-            started_at=item.startedAt,
-            completed_at=item.completedAt,
-            duration=item.duration,
-        )
-        await db.merge(record)
-    await db.commit()
+    seq = await _write_sessions(db, body)
+    latest = {item.id: item for item in body}
+    if len(latest) <= MAX_EVENT_ITEMS:
+        sessions = [item.model_dump() for item in latest.values()]
+        feed.publish(seq, SESSIONS_UPSERTED, {"sessions": sessions})
+    else:
+        feed.publish(seq, REPLACE)
     return {"ok": True, "count": len(body)}
 
 
 @router.delete("/sessions", status_code=200)
 async def delete_all_sessions(db: AsyncSession = Depends(get_session)):
     """Delete all sessions."""
-    await db.execute(delete(SessionRecord))
+    seq = await changes.next_seq(db)
+    await changes.tombstone_all(db, changes.SESSION, seq)
+    await changes.tombstone_ids(db, changes.SESSION, await archive.archived_ids(db), seq)
+    async with search.bulk_rewrite(db, SessionRecord):
+        await db.execute(delete(SessionRecord))
+    await archive.clear_archive(db)
+    await stats.clear_daily_stats(db)
+    await labels.clear_labels(db)
+    await db.commit()
+    feed.publish(seq, SESSIONS_CLEARED)
+    return {"ok": True}
+
+
+# ---------------------------------------------------------------------------
+# Session archive
+# ---------------------------------------------------------------------------
+
+
+class ArchiveSegmentOut(BaseModel):
+    month: str
+    sessionCount: int
+    firstCompletedAt: int
+    lastCompletedAt: int
+    bytes: int
+
+
+class ArchiveRunOut(BaseModel):
+    archivedSessions: int
+    vacuumedPages: int
+
+
+@router.get("/archive", response_model=list[ArchiveSegmentOut])
+async def list_archive(db: AsyncSession = Depends(get_read_session)):
+    """Monthly archive segments, oldest first."""
+    result = await db.execute(
+        select(
+            SessionArchive.month,
+            SessionArchive.session_count,
+            SessionArchive.first_completed_at,
+            SessionArchive.last_completed_at,
+            func.length(SessionArchive.payload),
+        ).order_by(SessionArchive.month)
+    )
+    return [
+        ArchiveSegmentOut(
+            month=month,
+            sessionCount=count,
+            firstCompletedAt=first,
+            lastCompletedAt=last,
+            bytes=size,
+        )
+        for month, count, first, last, size in result.all()
+    ]
+
+
+@router.post("/archive/run", response_model=ArchiveRunOut)
+async def run_archive(
+    older_than_days: Optional[int] = Query(default=None, ge=1, alias="olderThanDays"),
+    db: AsyncSession = Depends(get_session),
+):
+    """Archive sessions older than ``olderThanDays`` (default: the configured age)."""
+    days = older_than_days or settings.archive_after_days
+    if days <= 0:
+        raise HTTPException(status_code=422, detail="Archival is disabled")
+    result = await archive.run(db, days, settings.archive_vacuum_pages)
+    return ArchiveRunOut(
+        archivedSessions=result.archived, vacuumedPages=result.vacuumed_pages
+    )
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+
+def _export_response(
+    request: Request, chunks: AsyncIterator[bytes]
+) -> StreamingResponse:
+    # The body streams from the request's read session, which FastAPI (0.118+)
+    # closes only once the response has been sent
+    headers = {"Cache-Control": "no-store"}
+    if "gzip" in accepted_encodings(request.headers.get("accept-encoding")):
+        chunks = export.gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(chunks, media_type=export.MEDIA_TYPE, headers=headers)
+
+
+@router.get("/export/sessions")
+async def export_sessions(
+    request: Request,
+    format: export.ExportFormat = Query(default="ndjson"),
+    from_: Optional[int] = Query(default=None, alias="from", description="ms, inclusive"),
+    to: Optional[int] = Query(default=None, description="ms, exclusive"),
+    include_archived: bool = Query(default=False, alias="includeArchived"),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Stream sessions completed in ``[from, to)`` as NDJSON, oldest first.
+
+    ``format=columns`` streams one ``{key: [values]}`` object per batch of rows
+    instead of one object per row.
+    """
+    return _export_response(
+        request, export.export_sessions(db, format, from_, to, include_archived)
+    )
+
+
+@router.get("/export/tasks")
+async def export_tasks(
+    request: Request,
+    format: export.ExportFormat = Query(default="ndjson"),
+    from_: Optional[int] = Query(default=None, alias="from", description="ms, inclusive"),
+    to: Optional[int] = Query(default=None, description="ms, exclusive"),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Stream kanban tasks created in ``[from, to)`` as NDJSON, oldest first."""
+    return _export_response(request, export.export_tasks(db, format, from_, to))
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+
+class DailyStatsOut(BaseModel):
+    day: str
+    focusCount: int
+    focusSeconds: int
+    breakCount: int
+    breakSeconds: int
+
+
+class StatsOut(BaseModel):
+    fromDay: str
+    toDay: str
+    focusCount: int
+    focusSeconds: int
+    breakCount: int
+    breakSeconds: int
+    days: list[DailyStatsOut]
+
+
+@router.get("/stats", response_model=StatsOut)
+async def get_stats(
+    from_: Optional[date] = Query(default=None, alias="from"),
+    to: Optional[date] = Query(default=None),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Focus/break totals for an inclusive day range (defaults to today).
+
+    Days are bucketed using ``POMOTRACK_STATS_UTC_OFFSET_MINUTES``.
+    """
+    to_day = to.isoformat() if to else stats.today()
+    from_day = from_.isoformat() if from_ else to_day
+    if from_day > to_day:
+        raise HTTPException(status_code=422, detail="'from' must not be after 'to'")
+
+    days: dict[str, DailyStatsOut] = {}
+    for row in await stats.query_daily_stats(db, from_day, to_day):
+        out = days.setdefault(
+            row.day,
+            DailyStatsOut(
+                day=row.day, focusCount=0, focusSeconds=0, breakCount=0, breakSeconds=0
+            ),
+        )
+        if row.type == "focus":
+            out.focusCount += row.session_count
+            out.focusSeconds += row.total_seconds
+        else:
+            out.breakCount += row.session_count
+            out.breakSeconds += row.total_seconds
+
+    return StatsOut(
+        fromDay=from_day,
+        toDay=to_day,
+        focusCount=sum(d.focusCount for d in days.values()),
+        focusSeconds=sum(d.focusSeconds for d in days.values()),
+        breakCount=sum(d.breakCount for d in days.values()),
+        breakSeconds=sum(d.breakSeconds for d in days.values()),
+        days=list(days.values()),
+    )
+
+
+@router.post("/stats/rebuild", status_code=200)
+async def rebuild_stats(db: AsyncSession = Depends(get_session)):
+    """Recompute the daily rollup and the label index from the sessions table
+    and the archive."""
+    await stats.rebuild_daily_stats(db)
+    await labels.rebuild_labels(db)
     await db.commit()
     return {"ok": True}
 
 
+# ---------------------------------------------------------------------------
+# Labels
+# ---------------------------------------------------------------------------
+
+MAX_LABELS = 100
+
+
+class LabelOut(BaseModel):
+    label: str
+    sessionCount: int
+    focusSeconds: int
+    lastUsedAt: int
+
+
+@router.get("/labels", response_model=list[LabelOut])
+async def list_labels(
+    request: Request,
+    response: Response,
+    prefix: Optional[str] = Query(default=None, description="Case-insensitive label prefix"),
+    order: labels.LabelOrder = Query(default="count"),
+    limit: int = Query(default=10, ge=1, le=MAX_LABELS),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """The most used (or, with ``order=recent``, most recently used) labels.
+
+    With ``prefix`` only labels starting with it are returned, for
+    autocomplete. Served from the label index, not by scanning sessions.
+    """
+    if not_modified := await _check_data_version(request, response, db):
+        return not_modified
+    return [
+        LabelOut(
+            label=row.label,
+            sessionCount=row.session_count,
+            focusSeconds=row.focus_seconds,
+            lastUsedAt=row.last_used_at,
+        )
+        for row in await labels.query_labels(db, limit, order, prefix)
+    ]
+
+
 # ---------------------------------------------------------------------------
 # Kanban tasks
 # ---------------------------------------------------------------------------
@@ -143,6 +550,61 @@ class KanbanTaskOut(BaseModel):
     completedAt: Optional[int]
 
 
+def _task_row(t: KanbanTaskIn, seq: int) -> dict:
+    return {
+        "id": t.id,
+        "title": t.title,
+        "status": t.status,
+        "pomodoros_completed": t.pomodorosCompleted,
+        "created_at": t.createdAt,
+        "completed_at": t.completedAt,
+        "seq": seq,
+    }
+
+
+class KanbanTaskPatch(BaseModel):
+    """Partial update of one task. Omitted or null fields are left unchanged,
+    except ``completedAt`` which is cleared by an explicit null."""
+
+    id: str
+    title: Optional[str] = None
+    status: Optional[str] = None
+    completedAt: Optional[int] = None
+    pomodorosCompleted: Optional[int] = None
+    pomodorosIncrement: int = 0
+
+
+_TASK_PATCH_COLUMNS = {
+    "title": "title",
+    "status": "status",
+    "completedAt": "completed_at",
+    "pomodorosCompleted": "pomodoros_completed",
+}
+
+
+def _merge_task_patches(
+    patches: Sequence[KanbanTaskPatch], seq: int
+) -> dict[str, dict[str, Any]]:
+    """Fold patches into one column assignment per task, applied in order."""
+    merged: dict[str, dict[str, Any]] = {}
+    for patch in patches:
+        values = merged.setdefault(patch.id, {"seq": seq})
+        for field in patch.model_fields_set & _TASK_PATCH_COLUMNS.keys():
+            value = getattr(patch, field)
+            if value is not None or field == "completedAt":
+                values[_TASK_PATCH_COLUMNS[field]] = value
+        if patch.pomodorosIncrement:
+            count = values.get("pomodoros_completed")
+            if count is None:
+                count = bulk.Increment(patch.pomodorosIncrement)
+            elif isinstance(count, bulk.Increment):
+                count = bulk.Increment(count.amount + patch.pomodorosIncrement)
+            else:
+                count += patch.pomodorosIncrement
+            values["pomodoros_completed"] = count
+    return merged
+
+
 def _task_to_out(t: KanbanTask) -> KanbanTaskOut:
     return KanbanTaskOut(
         id=t.id,
@@ -155,12 +617,19 @@ def _task_to_out(t: KanbanTask) -> KanbanTaskOut:
 
 
 @router.get("/kanban/tasks", response_model=list[KanbanTaskOut])
-async def list_tasks(db: AsyncSession = Depends(get_session)):
-    """Return all kanban tasks ordered by creation time."""
+async def list_tasks(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Return all kanban tasks ordered by creation time (ETag/304 aware)."""
+    if not_modified := await _check_data_version(request, response, db):
+        return not_modified
+
     result = await db.execute(
-        select(KanbanTask).order_by(KanbanTask.created_at.asc())
+        select(*wire.TASK_COLUMNS).order_by(KanbanTask.created_at.asc())
     )
-    return [_task_to_out(t) for t in result.scalars().all()]
+    return _wire_response(result.all(), wire.TASK_KEYS, response)
 
 
 @router.post("/kanban/tasks", response_model=KanbanTaskOut, status_code=201)
@@ -173,11 +642,15 @@ async def create_task(body: KanbanTaskIn, db: AsyncSession = Depends(get_session
         pomodoros_completed=body.pomodorosCompleted,
         created_at=body.createdAt,
         completed_at=body.completedAt,
+        seq=await changes.next_seq(db),
     )
     db.add(task)
+    await changes.clear_tombstones(db, changes.TASK, [task.id])
     await db.commit()
     await db.refresh(task)
-    return _task_to_out(task)
+    out = _task_to_out(task)
+    feed.publish(task.seq, TASK_UPSERTED, {"task": out.model_dump()})
+    return out
 
 
 @router.put("/kanban/tasks/{task_id}", response_model=KanbanTaskOut)
@@ -192,9 +665,43 @@ async def update_task(
     task.status = body.status
     task.pomodoros_completed = body.pomodorosCompleted
     task.completed_at = body.completedAt
+    task.seq = await changes.next_seq(db)
     await db.commit()
     await db.refresh(task)
-    return _task_to_out(task)
+    out = _task_to_out(task)
+    feed.publish(task.seq, TASK_UPSERTED, {"task": out.model_dump()})
+    return out
+
+
+@router.patch("/kanban/tasks", response_model=list[KanbanTaskOut])
+async def patch_tasks(
+    body: list[KanbanTaskPatch],
+    response: Response,
+    db: AsyncSession = Depends(get_session),
+):
+    """Apply partial updates to many tasks in one transaction.
+
+    Updates with the same fields and values share one ``UPDATE`` statement,
+    and ``pomodorosIncrement`` is added by the database, so concurrent
+    increments are never lost. If any task does not exist nothing is applied
+    and 404 is returned. Returns the updated tasks in request order.
+    """
+    if not body:
+        return _wire_response([], wire.TASK_KEYS, response)
+    seq = await changes.next_seq(db)
+    merged = _merge_task_patches(body, seq)
+    rows = await bulk.update_tasks(db, merged)
+    if len(rows) < len(merged):
+        await db.rollback()
+        found = {row.id for row in rows}
+        missing = [task_id for task_id in merged if task_id not in found]
+        raise HTTPException(status_code=404, detail=f"Tasks not found: {missing}")
+    await db.commit()
+    by_id = {row.id: row for row in rows}
+    ordered = [by_id[task_id] for task_id in merged]
+    tasks = [wire.task_to_wire(row) for row in ordered]
+    feed.publish(seq, TASKS_UPSERTED, {"tasks": tasks})
+    return _wire_response(ordered, wire.TASK_KEYS, response)
 
 
 @router.delete("/kanban/tasks/{task_id}", status_code=200)
@@ -203,19 +710,106 @@ async def delete_task(task_id: str, db: AsyncSession = Depends(get_session)):
     task = await db.get(KanbanTask, task_id)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    seq = await changes.next_seq(db)
+    await changes.tombstone_ids(db, changes.TASK, [task_id], seq)
     await db.delete(task)
     await db.commit()
+    feed.publish(seq, TASK_DELETED, {"id": task_id})
     return {"ok": True}
 
 
 @router.delete("/kanban/tasks", status_code=200)
 async def delete_all_tasks(db: AsyncSession = Depends(get_session)):
     """Delete all kanban tasks."""
-    await db.execute(delete(KanbanTask))
+    seq = await changes.next_seq(db)
+    await changes.tombstone_all(db, changes.TASK, seq)
+    async with search.bulk_rewrite(db, KanbanTask):
+        await db.execute(delete(KanbanTask))
     await db.commit()
+    feed.publish(seq, TASKS_CLEARED)
     return {"ok": True}
 
 
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+MAX_SEARCH_PAGE = 100
+MAX_SEARCH_OFFSET = 1000
+
+
+class SearchHitOut(BaseModel):
+    kind: search.SearchKind
+    rank: float  # bm25: lower is better
+    session: Optional[SessionOut] = None
+    task: Optional[KanbanTaskOut] = None
+
+
+@router.get("/search", response_model=list[SearchHitOut], response_model_exclude_none=True)
+async def search_all(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    kind: Optional[search.SearchKind] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=MAX_SEARCH_PAGE),
+    cursor: Optional[int] = Query(
+        default=None, ge=0, le=MAX_SEARCH_OFFSET, description="From X-Next-Cursor"
+    ),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Sessions (by label) and tasks (by title) matching every word of ``q``.
+
+    Words match as prefixes, ignoring case and accents. Hits are ranked best
+    first; a full page sends the cursor for the next one in the
+    ``X-Next-Cursor`` header. Archived sessions are not searched.
+    """
+    if not_modified := await _check_data_version(request, response, db):
+        return not_modified
+    offset = cursor or 0
+    kinds = (kind,) if kind else ("session", "task")
+    hits = await search.search(db, q, kinds, limit, offset)
+    if len(hits) == limit and offset + limit <= MAX_SEARCH_OFFSET:
+        response.headers[NEXT_CURSOR_HEADER] = str(offset + limit)
+    return [SearchHitOut(kind=hit.kind, rank=hit.rank, **{hit.kind: hit.item}) for hit in hits]
+
+
+# ---------------------------------------------------------------------------
+# Change feed
+# ---------------------------------------------------------------------------
+
+
+def _resume_token(value: Optional[str]) -> Optional[int]:
+    """Parse an event id or data-version ETag (``"42"``/``W/"42"``)."""
+    if value is None:
+        return None
+    try:
+        return int(value.strip().removeprefix("W/").strip('"'))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail="Invalid resume token") from e
+
+
+@router.get("/changes")
+async def stream_changes(
+    request: Request,
+    since: Optional[str] = Query(
+        default=None, description="Data version (list ETag or event id) to resume after"
+    ),
+):
+    """Stream committed changes as server-sent events.
+
+    Each event carries the data version as its id, so a reconnecting
+    ``EventSource`` resumes via ``Last-Event-ID``. A client that fetched a list
+    can pass its ETag as ``since`` to receive every later write. A ``reset``
+    event means changes were missed and the client should refetch.
+    """
+    token = _resume_token(request.headers.get("last-event-id") or since)
+    return StreamingResponse(
+        feed.stream(token),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ---------------------------------------------------------------------------
 # Azure Blob sync
 # ---------------------------------------------------------------------------
@@ -229,162 +823,327 @@ class SyncCredentials(BaseModel):
 
 class PushResult(BaseModel):
     ok: bool
+    mode: str  # 'full' | 'delta' | 'unchanged'
     exportedSessions: int
     exportedTasks: int
+    deletedSessions: int = 0
+    deletedTasks: int = 0
     exportedAt: str
 
 
 class PullResult(BaseModel):
     ok: bool
+    mode: str = "full"  # 'full' | 'unchanged'
     importedSessions: int
     importedTasks: int
 
 
-class SyncPayload(BaseModel):
-    version: int
-    exportedAt: Optional[str] = None
-    sessions: list[SessionIn] = []
-    tasks: list[KanbanTaskIn] = []
-
-
 SYNC_BLOB_NAME = "pomotrack-sync.json"
 
 
-def _build_blob_client(creds: SyncCredentials):
-    """Build a synchronous Azure BlobClient (runs in thread pool)."""
-    try:
-        from azure.storage.blob import BlobServiceClient
-    except ImportError as e:
-        raise RuntimeError("azure-storage-blob is not installed") from e
-
-    service = BlobServiceClient(
-        account_url=f"https://{creds.accountName}.blob.core.windows.net",
-        credential=creds.accountKey,
-    )
-    return service.get_blob_client(
-        container=creds.containerName, blob=SYNC_BLOB_NAME
+def _blob_client(creds: SyncCredentials, blob_name: str = SYNC_BLOB_NAME):
+    """A blob client for ``creds`` from the shared client cache."""
+    return blobclients.blob_client(
+        creds.accountName, creds.containerName, creds.accountKey, blob_name
     )
 
 
+def _remote_key(creds: SyncCredentials) -> str:
+    return f"{creds.accountName}/{creds.containerName}"
+
+
 @router.post("/sync/push", response_model=PushResult)
+@metrics.track_sync("push")
 async def push_sync(
-    creds: SyncCredentials, db: AsyncSession = Depends(get_session)
+    creds: SyncCredentials,
+    db: AsyncSession = Depends(get_read_session),
+    writer: AsyncSession = Depends(get_session),
 ):
-    """Serialize all data to JSON and upload to Azure Blob Storage."""
-    sessions_result = await db.execute(select(SessionRecord))
-    tasks_result = await db.execute(select(KanbanTask))
-    sessions = sessions_result.scalars().all()
-    tasks = tasks_result.scalars().all()
-
-    payload = {
-        "version": 1,
-        "exportedAt": datetime.now(timezone.utc).isoformat(),
-        "sessions": [
-            {
-                "id": s.id,
-                "type": s.type,
-                "label": s.label,
-                "startedAt": s.started_at,
-                "completedAt": s.completed_at,
-                "duration": s.duration,
-            }
-            for s in sessions
-        ],
-        "tasks": [
-            {
-                "id": t.id,
-                "title": t.title,
-                "status": t.status,
-                "pomodorosCompleted": t.pomodoros_completed,
-                "createdAt": t.created_at,
-                "completedAt": t.completed_at,
-            }
-            for t in tasks
-        ],
-    }
-
-    json_bytes = json.dumps(payload, ensure_ascii=False).encode()
-
-    def _upload():
-        client = _build_blob_client(creds)
-        client.upload_blob(json_bytes, overwrite=True)
-
+    """Upload local changes to Azure Blob Storage.
+
+    The first push to a remote (or a compaction once enough segments have
+    piled up) streams a full snapshot to a new blob named after its manifest
+    generation, and removes the previous snapshot once the manifest lists the
+    new one. Later pushes
+    upload only rows changed since the last pushed data version, as an
+    append-only segment blob listed in the sync manifest. With nothing new on
+    either side, a push is a single HEAD request on the manifest. The manifest
+    is only replaced if no other machine wrote it since it was read (409
+    otherwise).
+    """
+    exported_at = datetime.now(timezone.utc).isoformat()
+    remote = _remote_key(creds)
+    upload = dict(
+        compression=settings.sync_compression, block_size=settings.sync_block_size
+    )
     try:
-        await asyncio.to_thread(_upload)
+        until = await changes.current_seq(db)
+        state = await changes.get_remote_state(db, remote)
+        manifest_client = _blob_client(creds, sync.MANIFEST_BLOB_NAME)
+        if (
+            state is not None
+            and state.manifest_etag
+            and until == state.pushed_seq
+            and await sync.manifest_etag(manifest_client) == state.manifest_etag
+        ):
+            return PushResult(
+                ok=True,
+                mode="unchanged",
+                exportedSessions=0,
+                exportedTasks=0,
+                exportedAt=exported_at,
+            )
+        manifest = await sync.read_manifest(manifest_client)
+
+        if (
+            manifest is None
+            or state is None
+            or state.manifest_generation > manifest.generation
+            or (
+                len(manifest.segments) >= settings.sync_compact_segments
+                and state.manifest_generation == manifest.generation
+            )
+        ):
+            mode = "full"
+            generation = (manifest.generation if manifest else 0) + 1
+            # A new blob, so a push losing the race leaves the remote untouched
+            name = sync.snapshot_blob_name(SYNC_BLOB_NAME, generation)
+            snapshot_client = _blob_client(creds, name)
+            counts = await sync.push_payload(
+                db, snapshot_client, exported_at, until=until, **upload
+            )
+            try:
+                written = await sync.write_manifest(
+                    manifest_client,
+                    sync.SyncManifest(generation, name, []),
+                    if_match=manifest.etag if manifest else None,
+                )
+            except sync.SyncConflictError:
+                await sync.delete_blob_quietly(snapshot_client)
+                raise
+            for stale in [manifest.base, *manifest.segments] if manifest else []:
+                await sync.delete_blob_quietly(_blob_client(creds, stale))
+        elif until == state.pushed_seq:
+            mode = "unchanged"
+            counts = sync.StreamStats()
+            generation = state.manifest_generation
+            # Only remember the manifest if it lists nothing this data lacks
+            written = manifest if generation == manifest.generation else None
+        else:
+            mode = "delta"
+            name = sync.segment_blob_name(SYNC_BLOB_NAME, manifest.generation + 1)
+            segment_client = _blob_client(creds, name)
+            counts = await sync.push_payload(
+                db,
+                segment_client,
+                exported_at,
+                since=state.pushed_seq,
+                until=until,
+                **upload,
+            )
+            try:
+                written = await sync.write_manifest(
+                    manifest_client,
+                    sync.SyncManifest(
+                        manifest.generation + 1, manifest.base, [*manifest.segments, name]
+                    ),
+                    if_match=manifest.etag,
+                )
+            except sync.SyncConflictError:
+                await sync.delete_blob_quietly(segment_client)
+                raise
+            # Only claim the new generation if nothing else was missed before it
+            if state.manifest_generation == manifest.generation:
+                generation = manifest.generation + 1
+            else:
+                generation, written = state.manifest_generation, None
+    except sync.SyncConflictError as e:
+        raise HTTPException(
+            status_code=409, detail="The remote changed during the push; pull and try again"
+        ) from e
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Azure upload failed: {e}") from e
 
+    await changes.save_remote_state(
+        writer,
+        remote,
+        pushed_seq=until,
+        manifest_generation=generation,
+        manifest_etag=written.etag if written else "",
+        manifest_digest=written.digest if written else "",
+    )
+    await changes.prune_tombstones(writer)
+    await writer.commit()
+    metrics.record_sync_bytes("push", counts.compressed_bytes, counts.raw_bytes)
+
     return PushResult(
         ok=True,
-        exportedSessions=len(sessions),
-        exportedTasks=len(tasks),
-        exportedAt=payload["exportedAt"],
+        mode=mode,
+        exportedSessions=counts.sessions,
+        exportedTasks=counts.tasks,
+        deletedSessions=counts.deleted_sessions,
+        deletedTasks=counts.deleted_tasks,
+        exportedAt=exported_at,
     )
 
 
+# Validated pull records held in memory before spilling to a temporary file
+PULL_SPOOL_MEMORY = 8 * 1024 * 1024
+
+_PULL_KEYS = ("sessions", "tasks", "deletedSessions", "deletedTasks")
+_END_OF_DOCUMENT = b"null\n"
+
+
+async def _stage_sync_document(client, spool: IO[bytes], counts: sync.StreamStats) -> None:
+    """Download and validate one snapshot or segment blob into ``spool``.
+
+    Each record becomes one ``[key, row or id]`` JSON line; session and task
+    rows get their ``seq`` when applied. A line of ``null`` ends the document.
+    """
+    version = None
+    async for key, value, is_item in sync.iter_pull_items(client, counts):
+        if key == "version" and not is_item:
+            version = value
+            if version != sync.PAYLOAD_VERSION:
+                raise sync.UnsupportedVersionError()
+        elif key in _PULL_KEYS and is_item:
+            if key == "sessions":
+                item = _session_row(SessionIn.model_validate(value), 0)
+            elif key == "tasks":
+                item = _task_row(KanbanTaskIn.model_validate(value), 0)
+            elif isinstance(value, str):
+                item = value
+            else:
+                raise sync.SyncPayloadError(f"'{key}' must contain ids")
+            spool.write(wire.dumps([key, item]) + b"\n")
+        elif key == "version" or key in _PULL_KEYS:
+            raise sync.SyncPayloadError(f"'{key}' has the wrong type")
+
+    if version is None:
+        raise sync.SyncPayloadError("missing 'version'")
+    spool.write(_END_OF_DOCUMENT)
+
+
+async def _apply_staged(db: AsyncSession, spool: IO[bytes], seq: int) -> None:
+    """Write staged records into the open transaction in fixed-size batches.
+
+    Each document's batches are flushed before the next document's records,
+    so later segments win.
+    """
+    batches: dict[str, list] = {key: [] for key in _PULL_KEYS}
+
+    async def flush(key: str) -> None:
+        batch = batches[key]
+        if key == "sessions":
+            await bulk.upsert_sessions(db, batch)
+        elif key == "tasks":
+            await bulk.upsert_tasks(db, batch)
+        elif key == "deletedSessions":
+            await db.execute(delete(SessionRecord).where(SessionRecord.id.in_(batch)))
+        else:
+            await db.execute(delete(KanbanTask).where(KanbanTask.id.in_(batch)))
+        batch.clear()
+
+    spool.seek(0)
+    for line in spool:
+        if line == _END_OF_DOCUMENT:
+            for key in _PULL_KEYS:
+                if batches[key]:
+                    await flush(key)
+            continue
+        key, item = orjson.loads(line)
+        if isinstance(item, dict):
+            item["seq"] = seq
+        batches[key].append(item)
+        if len(batches[key]) >= bulk.BULK_CHUNK_SIZE:
+            await flush(key)
+
+
 @router.post("/sync/pull", response_model=PullResult)
+@metrics.track_sync("pull")
 async def pull_sync(
     creds: SyncCredentials, db: AsyncSession = Depends(get_session)
 ):
-    """Download JSON from Azure Blob Storage and replace local data."""
-
-    def _download() -> bytes:
-        client = _build_blob_client(creds)
-        return client.download_blob().readall()
-
-    try:
-        raw = await asyncio.to_thread(_download)
-    except Exception as e:
-        raise HTTPException(
-            status_code=502, detail=f"Azure download failed: {e}"
-        ) from e
-
-    try:
-        payload = SyncPayload.model_validate(json.loads(raw))
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=422, detail="Invalid sync file format") from e
-    except Exception as e:
-        raise HTTPException(status_code=422, detail=f"Invalid sync payload: {e}") from e
-
-    if payload.version != 1:
-        raise HTTPException(status_code=422, detail="Unsupported sync payload version")
-
+    """Stream the remote snapshot and its segments and replace local data.
+
+    Every blob is downloaded and validated into a temporary spool first, so
+    no write lock is held while storage is read and a download or validation
+    error leaves local data untouched. The spool is then written in
+    fixed-size batches inside one transaction. When neither the remote
+    manifest nor local data changed since they last matched, nothing is
+    downloaded: the check is one HEAD request.
+    """
+    remote = _remote_key(creds)
+    manifest_client = _blob_client(creds, sync.MANIFEST_BLOB_NAME)
     try:
-        async with db.begin():
-            await db.execute(delete(SessionRecord))
-            await db.execute(delete(KanbanTask))
-
-            for s in payload.sessions:
-                await db.merge(
-                    SessionRecord(
-                        id=s.id,
-                        type=s.type,
-                        label=s.label,
-                        started_at=s.startedAt,
-                        completed_at=s.completedAt,
-                        duration=s.duration,
-                    )
+        state = await changes.get_remote_state(db, remote)
+        in_sync = (
+            state is not None
+            and state.manifest_etag
+            and await changes.current_seq(db) == state.pushed_seq
+        )
+        # Storage is not contacted inside a write transaction
+        await db.commit()
+        if in_sync and await sync.manifest_etag(manifest_client) == state.manifest_etag:
+            return PullResult(ok=True, mode="unchanged", importedSessions=0, importedTasks=0)
+        manifest = await sync.read_manifest(manifest_client)
+        if in_sync and manifest is not None and manifest.digest == state.manifest_digest:
+            # Rewritten with the same content: only the ETag moved
+            await changes.save_remote_state(
+                db,
+                remote,
+                pushed_seq=state.pushed_seq,
+                manifest_generation=state.manifest_generation,
+                manifest_etag=manifest.etag,
+                manifest_digest=manifest.digest,
+            )
+            await db.commit()
+            return PullResult(ok=True, mode="unchanged", importedSessions=0, importedTasks=0)
+        # Without a manifest the remote is a bare snapshot from an older version
+        names = [SYNC_BLOB_NAME] if manifest is None else [manifest.base, *manifest.segments]
+        counts = sync.StreamStats()
+        with tempfile.SpooledTemporaryFile(PULL_SPOOL_MEMORY) as spool:
+            for name in names:
+                await _stage_sync_document(_blob_client(creds, name), spool, counts)
+            async with db.begin():
+                seq = await changes.next_seq(db)
+                async with search.bulk_rewrite(db):
+                    await db.execute(delete(SessionRecord))
+                    await archive.clear_archive(db)
+                    await db.execute(delete(KanbanTask))
+                    await _apply_staged(db, spool, seq)
+                # Rebuilt rather than accumulated: the stream may repeat ids
+                await stats.rebuild_daily_stats(db)
+                await labels.rebuild_labels(db)
+                await changes.clear_all_tombstones(db)
+                await changes.save_remote_state(
+                    db,
+                    remote,
+                    pushed_seq=seq,
+                    manifest_generation=manifest.generation if manifest else 0,
+                    manifest_etag=manifest.etag if manifest else "",
+                    manifest_digest=manifest.digest if manifest else "",
                 )
-
-            for t in payload.tasks:
-                await db.merge(
-                    KanbanTask(
-                        id=t.id,
-                        title=t.title,
-                        status=t.status,
-                        pomodoros_completed=t.pomodorosCompleted,
-                        created_at=t.createdAt,
-                        completed_at=t.completedAt,
-                    )
+                imported_sessions = await db.scalar(
+                    select(func.count()).select_from(SessionRecord)
                 )
-    except HTTPException:
-        raise
+                imported_tasks = await db.scalar(select(func.count()).select_from(KanbanTask))
+    except sync.UnsupportedVersionError as e:
+        raise HTTPException(status_code=422, detail="Unsupported sync payload version") from e
+    except sync.SyncDownloadError as e:
+        raise HTTPException(status_code=502, detail=f"Azure download failed: {e}") from e
+    except sync.SyncPayloadError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid sync payload: {e}") from e
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid sync payload: {e}") from e
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to apply sync payload: {e}") from e
 
+    metrics.record_sync_bytes("pull", counts.compressed_bytes, counts.raw_bytes)
+    feed.publish(seq, REPLACE)
     return PullResult(
         ok=True,
-        importedSessions=len(payload.sessions),
-        importedTasks=len(payload.tasks),
+        importedSessions=imported_sessions,
+        importedTasks=imported_tasks,
     )
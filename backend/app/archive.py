@@ -0,0 +1,293 @@
+"""Monthly archive segments for old sessions.
+
+Sessions that completed more than ``POMOTRACK_ARCHIVE_AFTER_DAYS`` ago are
+moved out of the hot ``sessions`` table into one ``session_archive`` row per
+UTC month. Each segment holds its month's rows as a zlib-compressed JSON array
+of ``wire.SESSION_COLUMNS`` lists, sorted oldest first. The hot table, its
+indexes and everything that scans it stay proportional to recent history.
+
+Archived sessions are still part of the data: the daily stats rollup keeps
+counting them, full sync snapshots include them, and ``GET /api/sessions``
+returns them with ``includeArchived``. Writing a session whose id is archived
+moves it back into the hot table, wherever its new completion time falls:
+``session_archive_ids`` maps each archived id to its segment. Freed pages are returned to the filesystem
+with ``PRAGMA incremental_vacuum`` after each run.
+"""
+
+import zlib
+from collections.abc import AsyncIterator, Iterable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import orjson
+from sqlalchemy import Connection, delete, func, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import bulk, wire
+from app.models import SessionArchive, SessionArchiveId, SessionRecord
+
+DAY_MS = 86_400_000
+COMPRESS_LEVEL = 9
+
+# Column names of an archived row, in payload order
+ROW_KEYS = tuple(column.key for column in wire.SESSION_COLUMNS)
+_ID = ROW_KEYS.index("id")
+_TYPE = ROW_KEYS.index("type")
+_LABEL = ROW_KEYS.index("label")
+_COMPLETED_AT = ROW_KEYS.index("completed_at")
+
+
+def month_of(completed_at: int) -> str:
+    """The segment ('YYYY-MM', UTC) holding a completion timestamp (ms)."""
+    return datetime.fromtimestamp(completed_at // 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _month_start(completed_at: int) -> int:
+    moment = datetime.fromtimestamp(completed_at // 1000, tz=timezone.utc)
+    start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return int(start.timestamp()) * 1000
+
+
+def _next_month_start(month_start: int) -> int:
+    moment = datetime.fromtimestamp(month_start // 1000, tz=timezone.utc)
+    if moment.month == 12:
+        moment = moment.replace(year=moment.year + 1, month=1)
+    else:
+        moment = moment.replace(month=moment.month + 1)
+    return int(moment.timestamp()) * 1000
+
+
+def _sort_key(row: Any) -> tuple[int, str]:
+    return row[_COMPLETED_AT], row[_ID]
+
+
+def encode_rows(rows: Iterable[Any]) -> bytes:
+    """Compress rows (sequences in ``ROW_KEYS`` order) into a payload."""
+    return zlib.compress(wire.dumps([list(row) for row in rows]), COMPRESS_LEVEL)
+
+
+def decode_rows(payload: bytes) -> list[list[Any]]:
+    """The rows of a segment payload, oldest first."""
+    return orjson.loads(zlib.decompress(payload))
+
+
+async def _load(db: AsyncSession, month: str) -> list[list[Any]]:
+    payload = await db.scalar(
+        select(SessionArchive.payload).where(SessionArchive.month == month)
+    )
+    return decode_rows(payload) if payload is not None else []
+
+
+async def _store(db: AsyncSession, month: str, rows: list[Any]) -> None:
+    """Replace a segment with ``rows`` (deleting it when empty)."""
+    if not rows:
+        await db.execute(delete(SessionArchive).where(SessionArchive.month == month))
+        return
+    rows.sort(key=_sort_key)
+    values = {
+        "month": month,
+        "session_count": len(rows),
+        "first_completed_at": rows[0][_COMPLETED_AT],
+        "last_completed_at": rows[-1][_COMPLETED_AT],
+        "payload": encode_rows(rows),
+    }
+    stmt = insert(SessionArchive).values(values)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SessionArchive.month],
+            set_={k: stmt.excluded[k] for k in values if k != "month"},
+        )
+    )
+
+
+async def archive_sessions(db: AsyncSession, before: int) -> int:
+    """Move sessions completed before ``before`` (ms) into their segments.
+
+    Works one month at a time over the ``completed_at`` index. Returns the
+    number of sessions moved. Does not commit.
+    """
+    oldest = await db.scalar(
+        select(func.min(SessionRecord.completed_at)).where(
+            SessionRecord.completed_at < before
+        )
+    )
+    if oldest is None:
+        return 0
+    moved = 0
+    start = _month_start(oldest)
+    while start < before:
+        end = min(_next_month_start(start), before)
+        window = (SessionRecord.completed_at >= start, SessionRecord.completed_at < end)
+        hot = (await db.execute(select(*wire.SESSION_COLUMNS).where(*window))).all()
+        if hot:
+            month = month_of(start)
+            rows = {row[_ID]: row for row in await _load(db, month)}
+            rows.update((row[_ID], tuple(row)) for row in hot)
+            await _store(db, month, list(rows.values()))
+            await bulk.bulk_upsert(
+                db, SessionArchiveId, ({"id": row[_ID], "month": month} for row in hot)
+            )
+            await db.execute(delete(SessionRecord).where(*window))
+            moved += len(hot)
+        start = _next_month_start(start)
+    return moved
+
+
+async def unarchive_sessions(
+    db: AsyncSession, rows: Iterable[Mapping[str, Any]]
+) -> list[dict[str, Any]]:
+    """Take archived copies of sessions about to be written out of the archive.
+
+    ``rows`` are column-keyed session rows. Only the segments holding their
+    ids are read, whatever month the rows now complete in. Returns the
+    removed rows, column-keyed, so callers can treat them as the existing
+    rows being replaced. Does not commit.
+    """
+    months: dict[str, set[str]] = {}
+    for chunk in bulk.chunked({row["id"] for row in rows}, bulk.BULK_CHUNK_SIZE):
+        found = await db.execute(
+            select(SessionArchiveId.id, SessionArchiveId.month).where(
+                SessionArchiveId.id.in_(chunk)
+            )
+        )
+        for session_id, month in found:
+            months.setdefault(month, set()).add(session_id)
+    removed: list[dict[str, Any]] = []
+    for month, ids in sorted(months.items()):
+        segment = await _load(db, month)
+        removed.extend(dict(zip(ROW_KEYS, row)) for row in segment if row[_ID] in ids)
+        await _store(db, month, [row for row in segment if row[_ID] not in ids])
+        await db.execute(delete(SessionArchiveId).where(SessionArchiveId.id.in_(ids)))
+    return removed
+
+
+async def iter_rows(
+    db: AsyncSession, start: Optional[int] = None, end: Optional[int] = None
+) -> AsyncIterator[list[Any]]:
+    """Archived rows completed in ``[start, end)`` (ms), oldest first.
+
+    Only segments overlapping the range are decompressed, one at a time.
+    """
+    stmt = select(SessionArchive.month).order_by(SessionArchive.month)
+    if start is not None:
+        stmt = stmt.where(SessionArchive.last_completed_at >= start)
+    if end is not None:
+        stmt = stmt.where(SessionArchive.first_completed_at < end)
+    for month in (await db.scalars(stmt)).all():
+        for row in await _load(db, month):
+            completed_at = row[_COMPLETED_AT]
+            if (start is None or completed_at >= start) and (
+                end is None or completed_at < end
+            ):
+                yield row
+
+
+async def archived_ids(db: AsyncSession) -> list[str]:
+    """Ids of every archived session."""
+    return [row[_ID] async for row in iter_rows(db)]
+
+
+async def list_rows(
+    db: AsyncSession,
+    before: Optional[tuple[int, Optional[str]]] = None,
+    limit: Optional[int] = None,
+    *,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    type_: Optional[str] = None,
+    label: Optional[str] = None,
+) -> list[list[Any]]:
+    """Archived rows newest first, after an optional keyset cursor.
+
+    Rows can be narrowed to completion times in ``[start, end)`` (ms) and to
+    one type or label. Segments are read newest month first and reading stops
+    once ``limit`` rows are found, so a page only decompresses the months it
+    needs.
+    """
+    stmt = select(SessionArchive.month).order_by(SessionArchive.month.desc())
+    if before is not None:
+        stmt = stmt.where(SessionArchive.first_completed_at <= before[0])
+    if start is not None:
+        stmt = stmt.where(SessionArchive.last_completed_at >= start)
+    if end is not None:
+        stmt = stmt.where(SessionArchive.first_completed_at < end)
+    found: list[list[Any]] = []
+    for month in (await db.scalars(stmt)).all():
+        rows = await _load(db, month)
+        if before is not None:
+            completed_at, session_id = before
+            if session_id is None:
+                rows = [r for r in rows if r[_COMPLETED_AT] < completed_at]
+            else:
+                rows = [r for r in rows if _sort_key(r) < (completed_at, session_id)]
+        if start is not None:
+            rows = [r for r in rows if r[_COMPLETED_AT] >= start]
+        if end is not None:
+            rows = [r for r in rows if r[_COMPLETED_AT] < end]
+        if type_ is not None:
+            rows = [r for r in rows if r[_TYPE] == type_]
+        if label is not None:
+            rows = [r for r in rows if r[_LABEL] == label]
+        found.extend(reversed(rows))
+        if limit is not None and len(found) >= limit:
+            break
+    return found[:limit] if limit is not None else found
+
+
+async def clear_archive(db: AsyncSession) -> None:
+    """Drop every segment (when all sessions are deleted or replaced)."""
+    await db.execute(delete(SessionArchive))
+    await db.execute(delete(SessionArchiveId))
+
+
+def fill_id_index(connection: Connection) -> None:
+    """Index the ids of segments archived before ``session_archive_ids`` existed."""
+    for month, payload in connection.execute(
+        select(SessionArchive.month, SessionArchive.payload)
+    ).all():
+        rows = [{"id": row[_ID], "month": month} for row in decode_rows(payload)]
+        for chunk in bulk.chunked(rows, bulk.BULK_CHUNK_SIZE):
+            connection.execute(bulk.upsert_statement(SessionArchiveId), chunk)
+
+
+async def incremental_vacuum(db: AsyncSession, pages: int = 0) -> int:
+    """Release up to ``pages`` free pages (0 means all); returns pages freed.
+
+    A no-op unless the database uses ``auto_vacuum = INCREMENTAL``.
+    """
+    free = await db.scalar(text("PRAGMA freelist_count"))
+    connection = await (await db.connection()).get_raw_connection()
+    # sqlite3's execute() steps the pragma once, freeing a single page;
+    # executescript() runs it to completion
+    await connection.driver_connection.executescript(
+        f"PRAGMA incremental_vacuum({int(pages)})"
+    )
+    return free - await db.scalar(text("PRAGMA freelist_count"))
+
+
+@dataclass
+class ArchiveRun:
+    """Outcome of one archival pass."""
+
+    archived: int
+    vacuumed_pages: int
+
+
+async def run(
+    db: AsyncSession, older_than_days: int, vacuum_pages: int = 0, now: Optional[int] = None
+) -> ArchiveRun:
+    """Archive sessions older than ``older_than_days``, commit, then vacuum.
+
+    Archiving is not a change to the data: the data version stays put, so
+    delta sync has nothing to push and cached lists stay valid. Archived
+    sessions are still part of them.
+    """
+    if now is None:
+        now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    archived = await archive_sessions(db, now - older_than_days * DAY_MS)
+    await db.commit()
+    vacuumed = await incremental_vacuum(db, vacuum_pages)
+    await db.commit()
+    return ArchiveRun(archived, vacuumed)
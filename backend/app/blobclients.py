@@ -0,0 +1,160 @@
+"""Cached blob storage clients shared by sync requests.
+
+Building an Azure client for every push and pull parsed the account key and
+set up a new pipeline and HTTP session each time, so every request paid
+fresh TCP and TLS handshakes. Container clients are now cached per
+credentials (account, container and a hash of the key) with LRU eviction and
+a TTL. All of them send through one shared HTTP session, so connections are
+reused across requests and remotes. Blob clients are cheap views on a cached
+container client.
+
+With ``POMOTRACK_SYNC_ASYNC_TRANSPORT`` the ``azure.storage.blob.aio``
+clients are used over a shared aiohttp session (the ``async`` extra), and
+transfers are awaited on the event loop instead of each holding a worker
+thread. ``app.sync`` accepts either kind of client. With
+``POMOTRACK_SYNC_LOCAL_BLOB_DIR`` the same cache hands out ``app.localblob``
+clients instead.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class ClientCache(Generic[T]):
+    """LRU cache of clients that also drops entries older than a TTL.
+
+    Entries are dropped without being closed: they share the HTTP session
+    with clients that may still be in use.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, build: Callable[[], T]) -> T:
+        """The cached client for ``key``, built with ``build`` on a miss."""
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            return entry[1]
+        client = build()
+        self._entries[key] = (now, client)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return client
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache: ClientCache[Any] = ClientCache(
+    settings.sync_client_cache_size, settings.sync_client_ttl_seconds
+)
+# One HTTP session per transport kind, shared by every cached client
+_sessions: dict[str, Any] = {}
+
+
+def _requests_session() -> Any:
+    if "requests" not in _sessions:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=settings.sync_pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _sessions["requests"] = session
+    return _sessions["requests"]
+
+
+def _aiohttp_session() -> Any:
+    if "aiohttp" not in _sessions:
+        import aiohttp
+
+        _sessions["aiohttp"] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.sync_pool_size)
+        )
+    return _sessions["aiohttp"]
+
+
+def _azure_container(account: str, container: str, account_key: str) -> Any:
+    account_url = f"https://{account}.blob.core.windows.net"
+    if settings.sync_async_transport:
+        try:
+            from azure.core.pipeline.transport import AioHttpTransport
+            from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+        except ImportError as e:
+            raise RuntimeError("The async sync transport requires aiohttp") from e
+
+        transport = AioHttpTransport(session=_aiohttp_session(), session_owner=False)
+        service = AsyncBlobServiceClient(
+            account_url, credential=account_key, transport=transport
+        )
+    else:
+        try:
+            from azure.core.pipeline.transport import RequestsTransport
+            from azure.storage.blob import BlobServiceClient
+        except ImportError as e:
+            raise RuntimeError("azure-storage-blob is not installed") from e
+
+        transport = RequestsTransport(session=_requests_session(), session_owner=False)
+        service = BlobServiceClient(account_url, credential=account_key, transport=transport)
+    return service.get_container_client(container)
+
+
+def _build_container(account: str, container: str, account_key: str) -> Any:
+    if settings.sync_local_blob_dir:
+        from app.localblob import LocalContainerClient
+
+        return LocalContainerClient(
+            settings.sync_local_blob_dir,
+            container,
+            asynchronous=settings.sync_async_transport,
+        )
+    return _azure_container(account, container, account_key)
+
+
+def container_client(account: str, container: str, account_key: str) -> Any:
+    """The cached container client for these credentials."""
+    digest = hashlib.sha256(account_key.encode()).hexdigest()
+    key = (
+        account,
+        container,
+        digest,
+        settings.sync_local_blob_dir,
+        settings.sync_async_transport,
+    )
+    return _cache.get(key, lambda: _build_container(account, container, account_key))
+
+
+def blob_client(account: str, container: str, account_key: str, blob: str) -> Any:
+    """A client for one blob, sharing its container client's pipeline."""
+    return container_client(account, container, account_key).get_blob_client(blob)
+
+
+async def close() -> None:
+    """Drop every cached client and close the shared sessions (on shutdown)."""
+    _cache.clear()
+    if (session := _sessions.pop("requests", None)) is not None:
+        session.close()
+    if (session := _sessions.pop("aiohttp", None)) is not None:
+        await session.close()
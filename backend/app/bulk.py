@@ -0,0 +1,119 @@
+"""Set-based bulk writes for sessions and kanban tasks.
+
+``AsyncSession.merge`` issues a SELECT by primary key before every write. The
+helpers here send chunked ``INSERT ... ON CONFLICT DO UPDATE`` statements with
+executemany parameters instead, so a batch costs one round trip per chunk.
+Partial updates are grouped by their assignments into ``UPDATE ... WHERE pk
+IN (...)`` statements.
+"""
+
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any
+
+from sqlalchemy import ColumnElement, Row, Table, update
+from sqlalchemy.dialects.sqlite import Insert, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from app import wire
+from app.models import KanbanTask, SessionRecord
+
+BULK_CHUNK_SIZE = 1000
+
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Yield lists of at most ``size`` items from ``rows``."""
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def upsert_statement(model: type[SQLModel]) -> Insert:
+    """``INSERT ... ON CONFLICT(pk) DO UPDATE`` overwriting every other column."""
+    table: Table = model.__table__  # type: ignore[attr-defined]
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key],
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if not c.primary_key},
+    )
+
+
+async def bulk_upsert(
+    db: AsyncSession,
+    model: type[SQLModel],
+    rows: Iterable[dict[str, Any]],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> int:
+    """Upsert column-keyed ``rows`` into ``model``'s table; returns rows sent.
+
+    Does not commit. Later rows with the same primary key win.
+    """
+    stmt = upsert_statement(model)
+    count = 0
+    for chunk in chunked(rows, chunk_size):
+        await db.execute(stmt, chunk)
+        count += len(chunk)
+    return count
+
+
+async def upsert_sessions(
+    db: AsyncSession, rows: Iterable[dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """Bulk upsert rows into ``sessions``."""
+    return await bulk_upsert(db, SessionRecord, rows, chunk_size)
+
+
+async def upsert_tasks(
+    db: AsyncSession, rows: Iterable[dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """Bulk upsert rows into ``kanban_tasks``."""
+    return await bulk_upsert(db, KanbanTask, rows, chunk_size)
+
+
+@dataclass(frozen=True)
+class Increment:
+    """An update value meaning ``column + amount``, evaluated by the database."""
+
+    amount: int
+
+
+async def bulk_update(
+    db: AsyncSession,
+    model: type[SQLModel],
+    changes: Mapping[Any, Mapping[str, Any]],
+    returning: Sequence[ColumnElement[Any]],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> list[Row]:
+    """Apply column ``changes`` keyed by primary key; returns the updated rows.
+
+    Rows with identical changes share one ``UPDATE``, so moving many tasks to
+    the same column is one statement. Keys with no row are skipped. Does not
+    commit.
+    """
+    table: Table = model.__table__  # type: ignore[attr-defined]
+    (pk,) = table.primary_key.columns
+    groups: dict[tuple[tuple[str, Any], ...], list[Any]] = {}
+    for key, values in changes.items():
+        groups.setdefault(tuple(sorted(values.items())), []).append(key)
+
+    rows: list[Row] = []
+    for assignment, keys in groups.items():
+        values = {
+            name: table.c[name] + value.amount if isinstance(value, Increment) else value
+            for name, value in assignment
+        }
+        for chunk in chunked(keys, chunk_size):
+            stmt = update(table).where(pk.in_(chunk)).values(values).returning(*returning)
+            rows.extend((await db.execute(stmt)).all())
+    return rows
+
+
+async def update_tasks(
+    db: AsyncSession,
+    changes: Mapping[str, Mapping[str, Any]],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> list[Row]:
+    """Bulk partial update of ``kanban_tasks``, returning wire-ordered columns."""
+    return await bulk_update(db, KanbanTask, changes, wire.TASK_COLUMNS, chunk_size)
@@ -0,0 +1,149 @@
+"""Per-row change tracking for delta sync.
+
+Every write transaction takes the next value of the ``data_version`` counter
+and stamps it on the rows it writes (``seq`` column). Deleted rows leave a
+tombstone carrying the same sequence number. Rows and tombstones with a
+``seq`` above a remote's ``pushed_seq`` are exactly what that remote has not
+seen yet.
+"""
+
+from collections.abc import Sequence
+from typing import Optional
+
+from sqlalchemy import delete, func, literal, select, true
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from app.models import (
+    DataVersion,
+    KanbanTask,
+    SessionRecord,
+    SyncRemoteState,
+    SyncTombstone,
+)
+
+SESSION = "session"
+TASK = "task"
+ENTITY_MODELS: dict[str, type[SQLModel]] = {SESSION: SessionRecord, TASK: KanbanTask}
+
+_IN_CHUNK = 500
+
+
+async def next_seq(db: AsyncSession) -> int:
+    """Bump and return the data version for the current write transaction."""
+    stmt = (
+        insert(DataVersion)
+        .values(id=1, seq=1)
+        .on_conflict_do_update(
+            index_elements=[DataVersion.id], set_={"seq": DataVersion.seq + 1}
+        )
+        .returning(DataVersion.seq)
+    )
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def current_seq(db: AsyncSession) -> int:
+    """The data version of the last committed write (0 for a fresh database)."""
+    return await db.scalar(select(DataVersion.seq).where(DataVersion.id == 1)) or 0
+
+
+async def _tracking_deletes(db: AsyncSession) -> bool:
+    # Until a remote exists its first push is a full snapshot, so deletes
+    # need no tombstones
+    return await db.scalar(select(SyncRemoteState.remote).limit(1)) is not None
+
+
+async def tombstone_ids(
+    db: AsyncSession, entity: str, ids: Sequence[str], seq: int
+) -> None:
+    """Record deletes of ``ids`` (call before deleting the rows)."""
+    if not await _tracking_deletes(db):
+        return
+    for start in range(0, len(ids), _IN_CHUNK):
+        rows = [
+            {"entity": entity, "id": i, "seq": seq}
+            for i in ids[start : start + _IN_CHUNK]
+        ]
+        stmt = insert(SyncTombstone)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SyncTombstone.entity, SyncTombstone.id],
+                set_={"seq": stmt.excluded.seq},
+            ),
+            rows,
+        )
+
+
+async def tombstone_all(db: AsyncSession, entity: str, seq: int) -> None:
+    """Record deletes of every row of ``entity`` (call before deleting them)."""
+    if not await _tracking_deletes(db):
+        return
+    table = ENTITY_MODELS[entity].__table__  # type: ignore[attr-defined]
+    stmt = insert(SyncTombstone).from_select(
+        ["entity", "id", "seq"],
+        # SQLite needs a WHERE clause to parse ON CONFLICT after a SELECT
+        select(literal(entity), table.c.id, literal(seq)).where(true()),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SyncTombstone.entity, SyncTombstone.id],
+        set_={"seq": seq},
+    )
+    await db.execute(stmt)
+
+
+async def clear_tombstones(db: AsyncSession, entity: str, ids: Sequence[str]) -> None:
+    """Forget deletes of ``ids`` that have been written again."""
+    for start in range(0, len(ids), _IN_CHUNK):
+        await db.execute(
+            delete(SyncTombstone).where(
+                SyncTombstone.entity == entity,
+                SyncTombstone.id.in_(ids[start : start + _IN_CHUNK]),
+            )
+        )
+
+
+async def clear_all_tombstones(db: AsyncSession) -> None:
+    """Forget every delete (after local data is replaced wholesale)."""
+    await db.execute(delete(SyncTombstone))
+
+
+async def prune_tombstones(db: AsyncSession) -> None:
+    """Drop tombstones that every known remote has already received."""
+    floor = await db.scalar(select(func.min(SyncRemoteState.pushed_seq)))
+    if floor is not None:
+        await db.execute(delete(SyncTombstone).where(SyncTombstone.seq <= floor))
+
+
+async def get_remote_state(db: AsyncSession, remote: str) -> Optional[SyncRemoteState]:
+    """Sync bookkeeping for ``remote``, or None if it was never synced."""
+    return await db.get(SyncRemoteState, remote)
+
+
+async def save_remote_state(
+    db: AsyncSession,
+    remote: str,
+    *,
+    pushed_seq: int,
+    manifest_generation: int,
+    manifest_etag: str = "",
+    manifest_digest: str = "",
+) -> None:
+    """Create or update the sync bookkeeping for ``remote``.
+
+    ``manifest_etag``/``manifest_digest`` identify the remote manifest only
+    when local data at ``pushed_seq`` matches everything it lists.
+    """
+    values = {
+        "pushed_seq": pushed_seq,
+        "manifest_generation": manifest_generation,
+        "manifest_etag": manifest_etag,
+        "manifest_digest": manifest_digest,
+    }
+    stmt = insert(SyncRemoteState).values(remote=remote, **values)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SyncRemoteState.remote],
+            set_={key: stmt.excluded[key] for key in values},
+        )
+    )
@@ -0,0 +1,134 @@
+"""Group commit for small concurrent writes.
+
+Each single-session upsert used to run its own transaction and commit, so a
+burst of them queued one behind another for the write lock and paid a
+commit each. A ``WriteCoalescer`` buffers concurrent writes and commits
+them together.
+
+The first caller to arrive while no flush is running becomes the leader.
+Alone, it writes straight away; if other writes are already buffered, it
+waits up to the window for more (or until the buffer holds a full batch).
+It then writes the buffered items in one transaction on its own writer
+session. Everyone else just waits. Writes arriving during a flush collect
+into the next batch, so under load batches grow with the flush time even
+with no window. A caller returns only once the transaction holding its write has
+committed, and gets that transaction's error if it failed. A leader whose
+own write is done hands the rest of the buffer to the oldest waiting
+caller, so no request keeps flushing for others indefinitely.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Generic, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+_LEAD = object()  # a waiting caller's result when it should flush next
+
+
+@dataclass
+class _Pending(Generic[T]):
+    item: T
+    future: asyncio.Future
+
+
+class WriteCoalescer(Generic[T]):
+    """Buffers writes from concurrent callers and flushes them in batches.
+
+    ``flush(db, items)`` writes and commits one batch, in arrival order.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[AsyncSession, list[T]], Awaitable[None]],
+        window_seconds: float,
+        max_batch: int,
+    ):
+        self._flush = flush
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self._pending: list[_Pending[T]] = []
+        self._full: Optional[asyncio.Future] = None  # set once a batch is full
+        self._leading = False
+
+    async def submit(self, db: AsyncSession, item: T) -> None:
+        """Write ``item``; returns once it is committed.
+
+        ``db`` is only used if this caller ends up flushing.
+        """
+        entry = _Pending(item, asyncio.get_running_loop().create_future())
+        self._pending.append(entry)
+        if len(self._pending) >= self.max_batch and self._full and not self._full.done():
+            self._full.set_result(None)
+        waiting = entry.future
+        leading = not self._leading
+        self._leading = True
+        try:
+            if not leading:
+                leading = await waiting is _LEAD
+                if not leading:
+                    return
+            while not entry.future.done():
+                await self._wait_for_batch()
+                await self._flush_batch(db)
+        finally:
+            # Cancelled just after being made leader: the result is set regardless
+            if not leading and waiting.done() and not waiting.cancelled():
+                leading = waiting.result() is _LEAD
+            if not entry.future.done():
+                entry.future.cancel()  # never handed leadership: nobody awaits it
+            if leading:
+                self._hand_over(entry)
+        entry.future.result()
+
+    async def _wait_for_batch(self) -> None:
+        if len(self._pending) >= self.max_batch:
+            return
+        await asyncio.sleep(0)  # let callers already scheduled join
+        # A lone write is committed straight away; the window only holds
+        # back a batch that other writers have already joined
+        if self.window_seconds <= 0 or not 1 < len(self._pending) < self.max_batch:
+            return
+        self._full = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._full, self.window_seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._full = None
+
+    async def _flush_batch(self, db: AsyncSession) -> None:
+        batch = self._pending[: self.max_batch]
+        del self._pending[: self.max_batch]
+        try:
+            await self._flush(db, [entry.item for entry in batch])
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else RuntimeError("write interrupted")
+            for entry in batch:
+                if not entry.future.done():
+                    entry.future.set_exception(error)
+            await db.rollback()
+            if not isinstance(e, Exception):
+                raise
+        else:
+            for entry in batch:
+                if not entry.future.done():
+                    entry.future.set_result(None)
+
+    def _hand_over(self, current: _Pending[T]) -> None:
+        """Make the oldest waiting caller flush the rest, if anything is left.
+
+        ``current`` is the leader's own write, left pending if it was
+        cancelled before flushing it; nobody waits for it any more.
+        """
+        for entry in self._pending:
+            if entry is not current and not entry.future.done():
+                waiting = entry.future
+                entry.future = asyncio.get_running_loop().create_future()
+                waiting.set_result(_LEAD)
+                return
+        # Only writes whose callers gave up are left: the next caller flushes them
+        self._leading = False
@@ -1,5 +1,8 @@
 """Application configuration via environment variables."""
 
+import os
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -13,6 +16,68 @@ class Settings(BaseSettings):
     # CORS origins (comma-separated)
     cors_origins: str = ""
 
+    # Database
+    db_path: str = "./pomotrack.db" if os.name == "nt" else "/data/pomotrack.db"
+
+    # SQLite tuning, applied to every pooled connection on connect
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"  # 'normal' is durable under WAL
+    sqlite_mmap_size: int = 128 * 1024 * 1024  # bytes, 0 disables
+    sqlite_cache_size_kib: int = 16 * 1024  # per connection
+    sqlite_busy_timeout_ms: int = 5000
+    # Read-only connections; writes always go through one writer connection
+    sqlite_read_pool_size: int = 4
+    # Write transactions start with BEGIN IMMEDIATE. If another process still
+    # holds the write lock after busy_timeout, BEGIN is retried this many
+    # times, with exponential backoff from the base delay.
+    sqlite_write_retries: int = 5
+    sqlite_write_backoff_ms: int = 50
+
+    # Single-session upserts arriving together are committed in one
+    # transaction. Writes arriving while a commit runs form the next batch, of
+    # at most this many writes. A lone write is committed at once; a batch
+    # others have joined may wait this window for more. A batch size of 1
+    # commits every write on its own.
+    session_write_window_ms: float = 0
+    session_write_batch_size: int = 256
+
+    # Server processes sharing the database (uvicorn --workers). Above 1,
+    # each worker polls for writes made by the others to feed its clients.
+    workers: int = 1
+    worker_poll_seconds: float = 1.0
+
+    # Cloud sync
+    sync_compression: Literal["none", "gzip", "zstd"] = "gzip"  # zstd needs 'zstandard'
+    sync_block_size: int = 4 * 1024 * 1024  # bytes per staged upload block
+    # Push a full snapshot instead of another delta once this many segments exist
+    sync_compact_segments: int = 16
+    # Store sync blobs in this directory instead of Azure (offline testing)
+    sync_local_blob_dir: str = ""
+    # Blob clients are cached per credentials (LRU, rebuilt after the TTL)
+    # and share one HTTP connection pool of this many connections per host
+    sync_client_cache_size: int = 16
+    sync_client_ttl_seconds: float = 900
+    sync_pool_size: int = 10
+    # Transfer with the aiohttp-based async Azure clients instead of running
+    # the blocking ones in worker threads (needs the 'async' extra)
+    sync_async_transport: bool = False
+
+    # Archival: move sessions older than this many days into monthly archive
+    # segments (0 disables). Runs at startup and then every interval.
+    archive_after_days: int = 0
+    archive_interval_hours: float = 24
+    # Free pages released by each run's incremental vacuum (0 means all)
+    archive_vacuum_pages: int = 0
+
+    # Prometheus metrics at /api/metrics; off removes all instrumentation
+    metrics_enabled: bool = True
+
+    # Built frontend served at /; empty means backend/static
+    static_dir: str = ""
+
+    # Stats rollup: offset from UTC (minutes) used to bucket sessions into days
+    stats_utc_offset_minutes: int = 0
+
     model_config = {"env_prefix": "POMOTRACK_"}
 
     def get_cors_origins(self) -> list[str]:
@@ -1,32 +1,226 @@
-"""Async SQLite database setup via SQLModel + aiosqlite."""
+"""Async SQLite database setup via SQLModel + aiosqlite.
 
-import os
-from collections.abc import AsyncGenerator
+Two engines share the database file: a single-connection writer engine, so
+writes queue in-process instead of failing with "database is locked", and a
+pool of read-only connections that keep serving reads (WAL mode) while a sync
+pull or bulk ingest holds the writer.
+"""
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
+import random
+from collections.abc import AsyncGenerator, Iterable
+from typing import Optional
+
+from sqlalchemy import Connection, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.util import await_only
 from sqlmodel import SQLModel
 
-# Allow override via env var so tests can use :memory: or a temp path
-_default_path = "./pomotrack.db" if os.name == "nt" else "/data/pomotrack.db"
-_DB_PATH = os.environ.get("POMOTRACK_DB_PATH", _default_path)
-_DB_URL = f"sqlite+aiosqlite:///{_DB_PATH}"
+from app import metrics, models, search  # noqa: F401  (register tables and FTS)
+from app.config import Settings, settings
 
-engine = create_async_engine(
-    _DB_URL,
-    echo=False,
-    connect_args={"check_same_thread": False},
-)
+_JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+_SYNCHRONOUS_MODES = {"off", "normal", "full", "extra"}
+
+
+def is_memory(db_path: str) -> bool:
+    return db_path == ":memory:" or db_path.startswith("file::memory:")
+
+
+def connection_pragmas(cfg: Settings, *, read_only: bool) -> list[str]:
+    """PRAGMA statements run on every new connection."""
+    journal_mode = cfg.sqlite_journal_mode.lower()
+    synchronous = cfg.sqlite_synchronous.lower()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"Unsupported sqlite_journal_mode: {cfg.sqlite_journal_mode}")
+    if synchronous not in _SYNCHRONOUS_MODES:
+        raise ValueError(f"Unsupported sqlite_synchronous: {cfg.sqlite_synchronous}")
+
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(cfg.sqlite_busy_timeout_ms)}",
+        f"PRAGMA synchronous = {synchronous}",
+        f"PRAGMA cache_size = {-int(cfg.sqlite_cache_size_kib)}",
+        f"PRAGMA mmap_size = {int(cfg.sqlite_mmap_size)}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    elif not is_memory(cfg.db_path):
+        # Journal mode is persistent in the file; only the writer sets it
+        pragmas.insert(0, f"PRAGMA journal_mode = {journal_mode}")
+    return pragmas
+
+
+def build_engine(
+    cfg: Settings, *, read_only: bool = False, pool_size: int = 1
+) -> AsyncEngine:
+    """Create an aiosqlite engine whose connections are tuned on connect."""
+    pool_args = {} if is_memory(cfg.db_path) else {"pool_size": pool_size, "max_overflow": 0}
+    new_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{cfg.db_path}",
+        echo=False,
+        connect_args={"check_same_thread": False},
+        **pool_args,
+    )
+    pragmas = connection_pragmas(cfg, read_only=read_only)
+    immediate = not read_only and not is_memory(cfg.db_path)
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+        if immediate:
+            # Transactions are begun explicitly below, not by the driver
+            dbapi_connection.isolation_level = None
+
+    if immediate:
+
+        @event.listens_for(new_engine.sync_engine, "begin")
+        def _begin(conn):
+            # AUTOCOMMIT connections (VACUUM, for one) must stay outside a transaction
+            if conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+                return
+            begin_immediate(conn, cfg.sqlite_write_retries, cfg.sqlite_write_backoff_ms)
+
+    return new_engine
+
+
+def _is_busy(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+def begin_immediate(conn: Connection, retries: int, backoff_ms: float) -> None:
+    """Start a write transaction, taking the database write lock up front.
+
+    The driver would otherwise begin only at the first INSERT/UPDATE/DELETE,
+    leaving earlier reads outside the transaction, so another process could
+    write in between and its changes be overwritten. Taking the lock at BEGIN
+    makes each read-modify-write atomic across processes. Once busy_timeout
+    runs out, BEGIN is retried with jittered exponential backoff, sleeping on
+    the event loop rather than blocking the thread.
+    """
+    for attempt in range(retries + 1):
+        try:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            return
+        except OperationalError as e:
+            if attempt == retries or not _is_busy(e):
+                raise
+            metrics.DB_WRITE_RETRIES.inc()
+            delay = backoff_ms / 1000 * 2**attempt * random.uniform(0.5, 1.5)
+            await_only(asyncio.sleep(delay))
+
+
+engine = build_engine(settings)
+
+if is_memory(settings.db_path):
+    # Separate connections would each see their own empty in-memory database
+    read_engine = engine
+else:
+    read_engine = build_engine(
+        settings, read_only=True, pool_size=settings.sqlite_read_pool_size
+    )
+
+if settings.metrics_enabled:
+    metrics.instrument_engine(engine, "writer")
+    if read_engine is not engine:
+        metrics.instrument_engine(read_engine, "reader")
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+
+
+def create_tables(conn: Connection) -> None:
+    """Create missing tables and add columns missing from older tables.
+
+    ``create_all`` skips existing tables entirely, so columns added since
+    (which must carry a server default) are added here. Indexes of new tables
+    are created with them; existing tables' indexes are left to
+    ``create_indexes``.
+    """
+    SQLModel.metadata.create_all(conn)
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = (
+                f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" '
+                f"{column.type.compile(dialect=conn.dialect)}"
+            )
+            if column.server_default is not None:
+                null = "" if column.nullable else " NOT NULL"
+                ddl += f"{null} DEFAULT {column.server_default.arg}"
+            conn.exec_driver_sql(ddl)
+
+
+def create_indexes(conn: Connection, names: Optional[Iterable[str]] = None) -> None:
+    """Create the model indexes called ``names`` (default all) that are missing."""
+    # Read from sqlite_master: reflection skips expression indexes
+    existing = {
+        name
+        for (name,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+    wanted = set(names) if names is not None else None
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing and (wanted is None or index.name in wanted):
+                index.create(conn)
 
 
-async def create_db_and_tables() -> None:
-    """Create all tables on startup."""
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+def create_schema(conn: Connection) -> None:
+    """Create and upgrade everything at once (tests and benchmark datasets).
+
+    The server goes through ``app.migrations`` instead.
+    """
+    create_tables(conn)
+    create_indexes(conn)
+    search.fill_search_tables(conn)
+
+
+async def enable_incremental_vacuum() -> None:
+    """Switch the database file to ``auto_vacuum = INCREMENTAL``.
+
+    On a database created without it this rebuilds the file with ``VACUUM``
+    once; afterwards it is a single PRAGMA read.
+    """
+    if is_memory(settings.db_path):
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if await conn.scalar(text("PRAGMA auto_vacuum")) != 2:
+            await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            await conn.exec_driver_sql("VACUUM")
+            await conn.run_sync(search.rebuild)
+
+
+async def dispose_engines() -> None:
+    """Close pooled connections (on shutdown)."""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    """FastAPI dependency that yields an async DB session."""
+    """FastAPI dependency that yields an async DB session on the writer."""
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency that yields a read-only async DB session."""
+    async with ReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,141 @@
+"""In-process change feed streamed to clients as server-sent events.
+
+Write handlers publish one event per committed transaction, tagged with that
+transaction's data version (``seq``). The seq is the SSE event id and so the
+resume token. A list response's ETag is the same data version, so a client
+can fetch a list and then subscribe from its ETag without missing a write.
+
+Recent events are kept in a bounded buffer for resuming. Each subscriber has
+a bounded queue. A subscriber that falls behind, or resumes from before the
+buffer, has its backlog dropped and gets a single ``reset`` event telling it
+to refetch, so a slow client never holds unbounded memory. The feed lives in
+process memory and only sees writes made by this server process.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app import wire
+
+FEED_BUFFER = 1024  # events kept for resuming
+SUBSCRIBER_QUEUE = 256  # undelivered events per client before it is reset
+MAX_EVENT_ITEMS = 1000  # larger batches are announced as "replace"
+HEARTBEAT_SECONDS = 15.0
+RETRY_MS = 3000
+
+# Event types
+SESSION_UPSERTED = "session.upserted"  # {"session": SessionOut}
+SESSIONS_UPSERTED = "sessions.upserted"  # {"sessions": [SessionOut, ...]}
+SESSIONS_CLEARED = "sessions.cleared"  # {}
+TASK_UPSERTED = "task.upserted"  # {"task": KanbanTaskOut}
+TASKS_UPSERTED = "tasks.upserted"  # {"tasks": [KanbanTaskOut, ...]}
+TASK_DELETED = "task.deleted"  # {"id": str}
+TASKS_CLEARED = "tasks.cleared"  # {}
+REPLACE = "replace"  # local data replaced wholesale (sync pull): refetch
+RESET = "reset"  # events were missed: refetch
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    seq: int
+    type: str
+    data: dict[str, Any]
+
+    def encode(self) -> bytes:
+        """The event as one SSE frame."""
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+            self.seq,
+            self.type.encode(),
+            wire.dumps(self.data),
+        )
+
+
+class Subscription:
+    """One client's bounded queue of undelivered events."""
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue[ChangeEvent] = asyncio.Queue(maxsize)
+
+    def offer(self, event: ChangeEvent) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and tell it to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(ChangeEvent(event.seq, RESET, {}))
+
+    async def get(self) -> ChangeEvent:
+        return await self.queue.get()
+
+
+class ChangeFeed:
+    """Fan-out of committed changes to subscribers, with a resume buffer."""
+
+    def __init__(self, buffer_size: int = FEED_BUFFER, queue_size: int = SUBSCRIBER_QUEUE):
+        self.queue_size = queue_size
+        self._recent: deque[ChangeEvent] = deque(maxlen=buffer_size)
+        # Events with seq <= floor may be missing from the buffer
+        self._floor = 0
+        self._subscribers: set[Subscription] = set()
+
+    def start(self, seq: int) -> None:
+        """Begin at data version ``seq`` (earlier events were never seen)."""
+        self._recent.clear()
+        self._floor = seq
+
+    @property
+    def latest_seq(self) -> int:
+        return self._recent[-1].seq if self._recent else self._floor
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, seq: int, type_: str, data: Optional[dict[str, Any]] = None) -> None:
+        """Announce a committed write. Call right after ``commit()``."""
+        event = ChangeEvent(seq, type_, data or {})
+        if len(self._recent) == self._recent.maxlen:
+            self._floor = self._recent[0].seq
+        self._recent.append(event)
+        for subscription in self._subscribers:
+            subscription.offer(event)
+
+    def subscribe(self, since: Optional[int] = None) -> Subscription:
+        """Subscribe to new events, first replaying those after ``since``."""
+        subscription = Subscription(self.queue_size)
+        if since is not None:
+            if since < self._floor:
+                subscription.offer(ChangeEvent(self.latest_seq, RESET, {}))
+            else:
+                for event in self._recent:
+                    if event.seq > since:
+                        subscription.offer(event)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def stream(
+        self, since: Optional[int] = None, heartbeat: float = HEARTBEAT_SECONDS
+    ) -> AsyncIterator[bytes]:
+        """SSE frames for a subscription that ends when the client goes away."""
+        subscription = self.subscribe(since)
+        try:
+            yield b"retry: %d\n\n" % RETRY_MS
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            self.unsubscribe(subscription)
+
+
+feed = ChangeFeed()
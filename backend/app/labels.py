@@ -0,0 +1,185 @@
+"""Label index maintained alongside the sessions table.
+
+Each row of ``session_label_stats`` holds one distinct non-empty label with
+the number of sessions using it, their summed focus time and when it was last
+used. Write paths report the rows they remove and add, as for the daily stats
+rollup, so label lookups read a few index entries instead of every session.
+
+Archived sessions keep counting towards their labels, like they do for stats.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from typing import Any, Literal, Optional
+
+from sqlalchemy import case, delete, func, literal, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import archive
+from app.models import SessionArchive, SessionLabelStat, SessionRecord
+
+LabelOrder = Literal["count", "recent"]
+
+# Archived rows folded into the index per statement during a rebuild
+_REBUILD_BATCH = 5000
+# Sorts after every character a label can contain, closing a prefix range
+_PREFIX_END = "\U0010ffff"
+
+
+async def _upsert(db: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    stmt = insert(SessionLabelStat)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SessionLabelStat.label],
+        set_={
+            "session_count": SessionLabelStat.session_count
+            + stmt.excluded.session_count,
+            "focus_seconds": SessionLabelStat.focus_seconds
+            + stmt.excluded.focus_seconds,
+            "last_used_at": func.max(
+                SessionLabelStat.last_used_at, stmt.excluded.last_used_at
+            ),
+        },
+    )
+    await db.execute(stmt, rows)
+
+
+async def _latest_use(db: AsyncSession, label: str) -> Optional[int]:
+    """When ``label`` was last used, from the hot table or else the archive."""
+    latest = await db.scalar(
+        select(func.max(SessionRecord.completed_at)).where(SessionRecord.label == label)
+    )
+    if latest is None:
+        rows = await archive.list_rows(db, limit=1, label=label)
+        latest = rows[0][archive.ROW_KEYS.index("completed_at")] if rows else None
+    return latest
+
+
+async def apply_session_changes(
+    db: AsyncSession,
+    removed: Iterable[Mapping[str, Any]],
+    added: Iterable[Mapping[str, Any]],
+) -> None:
+    """Fold replaced/removed and newly written sessions into the index.
+
+    Rows are column-keyed mappings with ``type``, ``label``, ``completed_at``
+    and ``duration``. Must run in the same transaction as the session writes
+    it describes, after them: a label whose latest session was replaced has
+    its last use looked up again.
+    """
+    deltas: dict[str, list[int]] = defaultdict(lambda: [0, 0, 0])
+    latest_removed: dict[str, int] = {}
+    for r in removed:
+        if not r["label"]:
+            continue
+        delta = deltas[r["label"]]
+        delta[0] -= 1
+        delta[1] -= r["duration"] if r["type"] == "focus" else 0
+        latest_removed[r["label"]] = max(
+            latest_removed.get(r["label"], 0), r["completed_at"]
+        )
+    for r in added:
+        if not r["label"]:
+            continue
+        delta = deltas[r["label"]]
+        delta[0] += 1
+        delta[1] += r["duration"] if r["type"] == "focus" else 0
+        delta[2] = max(delta[2], r["completed_at"])
+
+    rows = [
+        {"label": label, "session_count": count, "focus_seconds": secs, "last_used_at": last}
+        for label, (count, secs, last) in deltas.items()
+        if count or secs or last
+    ]
+    if not rows:
+        return
+    await _upsert(db, rows)
+    if not latest_removed:
+        return
+
+    await db.execute(delete(SessionLabelStat).where(SessionLabelStat.session_count <= 0))
+    # A removed row may have been the label's latest use; re-added rows at or
+    # after it already moved last_used_at forward
+    stale = [
+        label
+        for label, completed_at in latest_removed.items()
+        if deltas[label][2] < completed_at
+    ]
+    for label in stale:
+        latest = await _latest_use(db, label)
+        if latest is not None:
+            await db.execute(
+                update(SessionLabelStat)
+                .where(SessionLabelStat.label == label)
+                .values(last_used_at=latest)
+            )
+
+
+async def clear_labels(db: AsyncSession) -> None:
+    """Drop every label (used when all sessions are deleted)."""
+    await db.execute(delete(SessionLabelStat))
+
+
+async def rebuild_labels(db: AsyncSession) -> None:
+    """Recompute the whole index from ``sessions`` with one INSERT ... SELECT,
+    then fold in archived sessions one segment at a time."""
+    await clear_labels(db)
+    focus = case((SessionRecord.type == "focus", SessionRecord.duration), else_=0)
+    totals = (
+        select(
+            SessionRecord.label,
+            func.count(),
+            func.sum(focus),
+            func.max(SessionRecord.completed_at),
+        )
+        .where(SessionRecord.label != "")
+        .group_by(SessionRecord.label)
+    )
+    await db.execute(
+        insert(SessionLabelStat).from_select(
+            ["label", "session_count", "focus_seconds", "last_used_at"], totals
+        )
+    )
+    batch: list[dict[str, Any]] = []
+    async for row in archive.iter_rows(db):
+        batch.append(dict(zip(archive.ROW_KEYS, row)))
+        if len(batch) >= _REBUILD_BATCH:
+            await apply_session_changes(db, (), batch)
+            batch.clear()
+    await apply_session_changes(db, (), batch)
+
+
+async def ensure_labels(db: AsyncSession) -> None:
+    """Build the index once for databases created before it existed."""
+    has_labels = await db.scalar(select(SessionLabelStat.label).limit(1))
+    has_sessions = await db.scalar(
+        select(SessionRecord.id).limit(1)
+    ) or await db.scalar(select(SessionArchive.month).limit(1))
+    if has_labels is None and has_sessions is not None:
+        await rebuild_labels(db)
+        await db.commit()
+
+
+async def query_labels(
+    db: AsyncSession,
+    limit: int,
+    order: LabelOrder = "count",
+    prefix: Optional[str] = None,
+) -> list[SessionLabelStat]:
+    """The top ``limit`` labels, optionally starting with ``prefix``.
+
+    Labels are ordered by usage or by last use, most first. The prefix match
+    ignores ASCII case and is a range seek on the ``lower(label)`` index.
+    """
+    if order == "count":
+        ordering = (SessionLabelStat.session_count.desc(), SessionLabelStat.last_used_at.desc())
+    else:
+        ordering = (SessionLabelStat.last_used_at.desc(),)
+    stmt = select(SessionLabelStat).order_by(*ordering).limit(limit)
+    if prefix:
+        lowered = func.lower(literal(prefix))
+        stmt = stmt.where(
+            func.lower(SessionLabelStat.label) >= lowered,
+            func.lower(SessionLabelStat.label) < lowered + _PREFIX_END,
+        )
+    return list((await db.scalars(stmt)).all())
@@ -0,0 +1,215 @@
+"""Directory-backed stand-in for the Azure blob clients used by sync.
+
+Implements the subset of the ``azure.storage.blob`` ``ContainerClient`` and
+``BlobClient`` APIs that the sync routes call, storing each container as a
+directory under ``root``. ``AsyncLocalBlobClient`` mirrors the coroutine API
+of ``azure.storage.blob.aio``. Set ``POMOTRACK_SYNC_LOCAL_BLOB_DIR`` to sync
+against it instead of Azure, e.g. for offline tests and benchmarks.
+"""
+
+import shutil
+from collections.abc import AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Optional, Union
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+BlobData = Union[bytes, Iterable[bytes], IO[bytes]]
+
+_COPY_CHUNK = 1024 * 1024
+
+
+def _write_data(path: Path, data: BlobData) -> None:
+    with path.open("wb") as fh:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            fh.write(data)
+        elif hasattr(data, "read"):
+            shutil.copyfileobj(data, fh, _COPY_CHUNK)  # type: ignore[arg-type]
+        else:
+            for piece in data:
+                fh.write(piece)
+
+
+def _etag(path: Path) -> str:
+    # Each write replaces the file, so inode and mtime change together
+    stat = path.stat()
+    return f'"0x{stat.st_mtime_ns:X}{stat.st_ino:X}"'
+
+
+@dataclass
+class LocalBlobProperties:
+    """The ``BlobProperties`` fields sync reads."""
+
+    etag: str
+    size: int
+
+
+class LocalBlobDownloader:
+    """Mirrors ``StorageStreamDownloader`` for a local file."""
+
+    def __init__(self, path: Path, chunk_size: int = _COPY_CHUNK):
+        self._path = path
+        self._chunk_size = chunk_size
+        self.size = path.stat().st_size
+        self.properties = LocalBlobProperties(_etag(path), self.size)
+
+    def readall(self) -> bytes:
+        return self._path.read_bytes()
+
+    def chunks(self) -> Iterator[bytes]:
+        with self._path.open("rb") as fh:
+            while piece := fh.read(self._chunk_size):
+                yield piece
+
+
+class LocalBlobClient:
+    """A single blob stored at ``root/<container>/<blob>``."""
+
+    def __init__(self, root: Union[str, Path], container: str, blob: str):
+        self.root = Path(root)
+        self.container_name = container
+        self.blob_name = blob
+        self._dir = self.root / container
+        self._path = self._dir / blob
+        self._blocks = self._dir / ".blocks" / blob
+
+    def exists(self) -> bool:
+        return self._path.is_file()
+
+    def _check_conditions(
+        self, etag: Optional[str], match_condition: Optional[MatchConditions]
+    ) -> None:
+        """Apply ``If-Match``/``If-None-Match`` semantics like the service does."""
+        current = _etag(self._path) if self.exists() else None
+        if match_condition == MatchConditions.IfNotModified and current != etag:
+            raise ResourceModifiedError("The condition specified was not met.")
+        if match_condition == MatchConditions.IfModified and current == etag:
+            raise ResourceNotModifiedError("The blob has not been modified.")
+        if match_condition == MatchConditions.IfMissing and current is not None:
+            raise ResourceExistsError("The specified blob already exists.")
+
+    def get_blob_properties(self, **kwargs: Any) -> LocalBlobProperties:
+        if not self.exists():
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        return LocalBlobProperties(_etag(self._path), self._path.stat().st_size)
+
+    def upload_blob(
+        self,
+        data: BlobData,
+        overwrite: bool = False,
+        etag: Optional[str] = None,
+        match_condition: Optional[MatchConditions] = None,
+        **kwargs: Any,
+    ) -> dict:
+        if self.exists() and not overwrite:
+            raise ResourceExistsError("The specified blob already exists.")
+        self._check_conditions(etag, match_condition)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        _write_data(tmp, data)
+        tmp.replace(self._path)
+        return {"etag": _etag(self._path)}
+
+    def stage_block(self, block_id: str, data: BlobData, **kwargs: Any) -> dict:
+        self._blocks.mkdir(parents=True, exist_ok=True)
+        _write_data(self._blocks / block_id, data)
+        return {}
+
+    def commit_block_list(self, block_list: list[Any], **kwargs: Any) -> dict:
+        """Concatenate staged blocks (ids or objects with ``.id``) into the blob."""
+        ids = [getattr(block, "id", block) for block in block_list]
+        missing = [i for i in ids if not (self._blocks / i).is_file()]
+        if missing:
+            raise ResourceNotFoundError(f"Uncommitted blocks not found: {missing}")
+        self._dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        with tmp.open("wb") as out:
+            for block_id in ids:
+                with (self._blocks / block_id).open("rb") as fh:
+                    shutil.copyfileobj(fh, out, _COPY_CHUNK)
+        tmp.replace(self._path)
+        shutil.rmtree(self._blocks, ignore_errors=True)
+        return {"etag": _etag(self._path)}
+
+    def download_blob(
+        self,
+        etag: Optional[str] = None,
+        match_condition: Optional[MatchConditions] = None,
+        **kwargs: Any,
+    ) -> LocalBlobDownloader:
+        if not self.exists():
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        self._check_conditions(etag, match_condition)
+        return LocalBlobDownloader(self._path)
+
+    def delete_blob(self, **kwargs: Any) -> None:
+        if not self.exists():
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        self._path.unlink()
+
+
+class AsyncLocalBlobDownloader:
+    """Mirrors the ``aio`` ``StorageStreamDownloader`` for a local file."""
+
+    def __init__(self, downloader: LocalBlobDownloader):
+        self._downloader = downloader
+        self.size = downloader.size
+        self.properties = downloader.properties
+
+    async def readall(self) -> bytes:
+        return self._downloader.readall()
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        for piece in self._downloader.chunks():
+            yield piece
+
+
+class AsyncLocalBlobClient:
+    """``LocalBlobClient`` with the coroutine methods of the ``aio`` client."""
+
+    def __init__(self, root: Union[str, Path], container: str, blob: str):
+        self._blob = LocalBlobClient(root, container, blob)
+        self.root = self._blob.root
+        self.container_name = container
+        self.blob_name = blob
+
+    async def exists(self) -> bool:
+        return self._blob.exists()
+
+    async def get_blob_properties(self, **kwargs: Any) -> LocalBlobProperties:
+        return self._blob.get_blob_properties(**kwargs)
+
+    async def upload_blob(self, data: BlobData, overwrite: bool = False, **kwargs: Any) -> dict:
+        return self._blob.upload_blob(data, overwrite, **kwargs)
+
+    async def stage_block(self, block_id: str, data: BlobData, **kwargs: Any) -> dict:
+        return self._blob.stage_block(block_id, data, **kwargs)
+
+    async def commit_block_list(self, block_list: list[Any], **kwargs: Any) -> dict:
+        return self._blob.commit_block_list(block_list, **kwargs)
+
+    async def download_blob(self, **kwargs: Any) -> AsyncLocalBlobDownloader:
+        return AsyncLocalBlobDownloader(self._blob.download_blob(**kwargs))
+
+    async def delete_blob(self, **kwargs: Any) -> None:
+        self._blob.delete_blob(**kwargs)
+
+
+class LocalContainerClient:
+    """A container directory handing out blob clients, like ``ContainerClient``."""
+
+    def __init__(self, root: Union[str, Path], container: str, asynchronous: bool = False):
+        self.root = Path(root)
+        self.container_name = container
+        self.asynchronous = asynchronous
+
+    def get_blob_client(self, blob: str) -> Union[LocalBlobClient, AsyncLocalBlobClient]:
+        client = AsyncLocalBlobClient if self.asynchronous else LocalBlobClient
+        return client(self.root, self.container_name, blob)
@@ -0,0 +1,75 @@
+"""Cross-process locks for several workers sharing one database file.
+
+Each lock is an ``flock`` on a file next to the database
+(``<db_path>.<name>.lock``). The kernel releases it when its holder exits,
+so a crashed worker never leaves it stuck. With an in-memory database, or
+on platforms without ``fcntl``, only one process can use the database, and
+the locks always succeed at once.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import IO, Optional
+
+from app.config import settings
+from app.database import is_memory
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+class FileLock:
+    """An exclusive lock shared by every process using ``db_path``."""
+
+    def __init__(self, name: str, db_path: Optional[str] = None):
+        db_path = db_path or settings.db_path
+        shared = fcntl is not None and not is_memory(db_path)
+        self.path = f"{db_path}.{name}.lock" if shared else None
+        self.held = False
+        self._file: Optional[IO[bytes]] = None
+
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free; never waits."""
+        if self.path is not None:
+            file = open(self.path, "a+b")  # noqa: SIM115 - open while held
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                return False
+            self._file = file
+        self.held = True
+        return True
+
+    async def acquire(self) -> None:
+        """Wait for the lock without blocking the event loop."""
+        if self.path is not None:
+            file = open(self.path, "a+b")  # noqa: SIM115 - open while held
+            try:
+                await asyncio.to_thread(fcntl.flock, file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                file.close()
+                raise
+            self._file = file
+        self.held = True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.held = False
+
+
+@asynccontextmanager
+async def exclusive(name: str) -> AsyncIterator[None]:
+    """Hold the ``name`` lock for the block, waiting for other processes."""
+    lock = FileLock(name)
+    await lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
@@ -1,50 +1,172 @@
 """FastAPI application entry point."""
 
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
-from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app import archive, blobclients, changes, locks, migrations
 from app.api.routes import router as api_router
 from app.config import settings
-from app.database import create_db_and_tables
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses."""
-
-    async def dispatch(self, request: Request, call_next):
-        response: Response = await call_next(request)
-        # Prevent MIME type sniffing
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        # Prevent clickjacking
-        response.headers["X-Frame-Options"] = "DENY"
-        # Control referrer information
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        # Prevent XSS attacks (legacy, but still useful)
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        # Content Security Policy
-        response.headers["Content-Security-Policy"] = (
-            "default-src 'self'; "
-            "script-src 'self'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data:; "
-            "font-src 'self'; "
-            "connect-src 'self'; "
-            "media-src 'self'"
-        )
-        return response
+from app.database import (
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    dispose_engines,
+    enable_incremental_vacuum,
+)
+from app.feed import RESET, feed
+from app.labels import ensure_labels
+from app.locks import FileLock
+from app.metrics import MetricsMiddleware
+from app.static import StaticSite
+from app.stats import ensure_daily_stats
+
+logger = logging.getLogger(__name__)
+
+SECURITY_HEADERS: list[tuple[bytes, bytes]] = [
+    # Prevent MIME type sniffing
+    (b"x-content-type-options", b"nosniff"),
+    # Prevent clickjacking
+    (b"x-frame-options", b"DENY"),
+    # Control referrer information
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    # Prevent XSS attacks (legacy, but still useful)
+    (b"x-xss-protection", b"1; mode=block"),
+    # Content Security Policy
+    (
+        b"content-security-policy",
+        b"default-src 'self'; "
+        b"script-src 'self'; "
+        b"style-src 'self' 'unsafe-inline'; "
+        b"img-src 'self' data:; "
+        b"font-src 'self'; "
+        b"connect-src 'self'; "
+        b"media-src 'self'",
+    ),
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
+
+
+class SecurityHeadersMiddleware:
+    """Add security headers to all responses.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware``: the precomputed headers are
+    appended to ``http.response.start`` without wrapping the response body, so
+    file and streaming responses pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [
+                    (name, value)
+                    for name, value in message.get("headers", ())
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+async def archive_periodically() -> None:
+    """Archive old sessions now and then every ``archive_interval_hours``.
+
+    With several workers only the one holding the archiver lock archives;
+    the others take over if it exits.
+    """
+    leader = FileLock("archiver")
+    try:
+        while True:
+            try:
+                if leader.held or leader.try_acquire():
+                    async with AsyncSessionLocal() as db:
+                        result = await archive.run(
+                            db, settings.archive_after_days, settings.archive_vacuum_pages
+                        )
+                    if result.archived:
+                        logger.info("Archived %d sessions", result.archived)
+            except Exception:
+                logger.exception("Session archival failed")
+            await asyncio.sleep(settings.archive_interval_hours * 3600)
+    finally:
+        leader.release()
+
+
+async def watch_other_workers() -> None:
+    """Tell this worker's feed subscribers about writes made by other workers.
+
+    Their events never reach this process, so a newer data version than the
+    feed has seen is announced as a ``reset``.
+    """
+    while True:
+        await asyncio.sleep(settings.worker_poll_seconds)
+        try:
+            async with ReadSessionLocal() as db:
+                seq = await changes.current_seq(db)
+            if seq > feed.latest_seq:
+                feed.publish(seq, RESET)
+        except Exception:
+            logger.exception("Polling for other workers' writes failed")
+
+
+async def prepare_database() -> bool:
+    """Migrate the schema and fill derived tables; True if steps are deferred.
+
+    Workers starting together take turns, so the work is done by the first
+    and the rest find everything in place.
+    """
+    async with locks.exclusive("schema"):
+        if settings.archive_after_days > 0:
+            await enable_incremental_vacuum()
+        deferred = await migrations.migrate()
+        async with AsyncSessionLocal() as db:
+            await ensure_daily_stats(db)
+            await ensure_labels(db)
+    return bool(deferred)
+
+
+async def run_deferred_migrations() -> None:
+    """Build deferred indexes in the background once the server is up."""
+    try:
+        async with locks.exclusive("schema"):
+            await migrations.run_deferred()
+    except Exception:
+        logger.exception("Deferred migration failed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialise database tables on startup."""
-    await create_db_and_tables()
+    """Initialise database tables on startup and close pools on shutdown."""
+    deferred = await prepare_database()
+    async with AsyncSessionLocal() as db:
+        feed.start(await changes.current_seq(db))
+    tasks = []
+    if deferred:
+        tasks.append(asyncio.create_task(run_deferred_migrations()))
+    if settings.archive_after_days > 0:
+        tasks.append(asyncio.create_task(archive_periodically()))
+    if settings.workers > 1:
+        tasks.append(asyncio.create_task(watch_other_workers()))
     yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await blobclients.close()
+    await dispose_engines()
 
 
 app = FastAPI(
@@ -62,43 +184,32 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.get_cors_origins(),
     allow_credentials=False,  # Not needed for this app
-    allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["Content-Type"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
+    allow_headers=["Content-Type", "Last-Event-ID"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# Request metrics - outermost, so timings include the other middleware
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, prefixes={"/api": api_router})
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
 # Static files and SPA serving
-static_path = Path(__file__).parent.parent / "static"
-static_path_resolved = static_path.resolve()
+static_path = (
+    Path(settings.static_dir)
+    if settings.static_dir
+    else Path(__file__).parent.parent / "static"
+)
 
 if static_path.exists():
-    # Serve static assets (JS, CSS, images)
-    assets_path = static_path / "assets"
-    if assets_path.exists():
-        app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
-
-    # Serve sounds directory
-    sounds_path = static_path / "sounds"
-    if sounds_path.exists():
-        app.mount("/sounds", StaticFiles(directory=sounds_path), name="sounds")
-
-    # SPA fallback - serve index.html for all non-API routes
-    @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str):
-        """Serve the SPA for all non-API routes."""
-        # Resolve the requested path
-        file_path = (static_path / full_path).resolve()
-
-        # Security: Prevent path traversal attacks
-        # Ensure the resolved path is within the static directory
-        try:
-            file_path.relative_to(static_path_resolved)
-        except ValueError:
-            # Path is outside static directory - return index.html
-            return FileResponse(static_path / "index.html")
-
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        return FileResponse(static_path / "index.html")
+    # Indexed once at startup; serves assets, sounds and the SPA fallback
+    static_site = StaticSite(static_path)
+
+    @app.api_route(
+        "/{full_path:path}", methods=["GET", "HEAD"], include_in_schema=False
+    )
+    async def serve_spa(full_path: str, request: Request):
+        """Serve built files, or index.html for client-side routes."""
+        return static_site.response(full_path, request.headers)
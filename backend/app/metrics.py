@@ -0,0 +1,307 @@
+"""In-process Prometheus metrics for ``GET /api/metrics``.
+
+Counters, gauges and histograms are plain dicts keyed by label values and
+are only touched from the event loop thread (SQLAlchemy runs its cursor events
+there too), so recording a sample is a dict lookup and an add with no
+locking. Nothing is recorded when ``settings.metrics_enabled`` is off: the
+middleware and engine listeners are not installed and sync timing is skipped.
+"""
+
+import functools
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+from typing import Any, Optional
+
+from fastapi import APIRouter
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.5, 2.5)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+SYNC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_STATEMENT_KINDS = frozenset(
+    {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "CREATE", "ALTER", "DROP"}
+)
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple[str, ...], Any] = {}
+        REGISTRY.append(self)
+
+    def _labels(self, values: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{self._labels(labels)} {_format(value)}"
+            for labels, value in self.values.items()
+        ]
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = HTTP_BUCKETS,
+    ):
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        state = self.values.get(labels)
+        if state is None:
+            # Per-bucket (non-cumulative) counts with +Inf last, then the sum
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self.values.items():
+            running = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                running += count
+                le = f'le="{_format(bound)}"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {running}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {running}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+HTTP_REQUESTS = Counter(
+    "pomotrack_http_requests_total",
+    "HTTP requests by route template and status code.",
+    ("method", "route", "status"),
+)
+HTTP_DURATION = Histogram(
+    "pomotrack_http_request_duration_seconds",
+    "Time from receiving a request to sending the last response byte.",
+    ("method", "route"),
+    HTTP_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "pomotrack_http_requests_in_flight",
+    "Requests currently being handled.",
+    ("method",),
+)
+DB_QUERY_DURATION = Histogram(
+    "pomotrack_db_query_duration_seconds",
+    "SQL statement execution time by engine and statement kind.",
+    ("engine", "statement"),
+    QUERY_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter(
+    "pomotrack_db_query_errors_total",
+    "SQL statements that raised.",
+    ("engine", "statement"),
+)
+DB_WRITE_RETRIES = Counter(
+    "pomotrack_db_write_retries_total",
+    "Write transactions retried because another process held the write lock.",
+    (),
+)
+SESSION_WRITE_BATCH = Histogram(
+    "pomotrack_session_write_batch_size",
+    "Single-session upserts committed together in one transaction.",
+    (),
+    BATCH_BUCKETS,
+)
+SYNC_DURATION = Histogram(
+    "pomotrack_sync_duration_seconds",
+    "Sync push/pull duration by outcome.",
+    ("direction", "outcome"),
+    SYNC_BUCKETS,
+)
+SYNC_BYTES = Counter(
+    "pomotrack_sync_bytes_total",
+    "Sync payload bytes, as transferred (compressed) and as JSON (uncompressed).",
+    ("direction", "form"),
+)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Drop every recorded sample (for tests)."""
+    for metric in REGISTRY:
+        metric.values.clear()
+
+
+class MetricsMiddleware:
+    """Record request counts, latency and in-flight requests per route.
+
+    Routes are labelled by their template (``/api/kanban/tasks/{task_id}``),
+    read from the scope after routing, so label cardinality stays bounded.
+    Depending on the FastAPI version the scope holds either the prefixed copy
+    of an included route or the router's own route, so ``prefixes`` maps
+    include prefixes to routers to restore the full template.
+    """
+
+    def __init__(self, app: ASGIApp, prefixes: Optional[dict[str, APIRouter]] = None):
+        self.app = app
+        # Keyed by id(): routes define __eq__ without __hash__
+        self._prefix_of = {
+            id(route): prefix
+            for prefix, router in (prefixes or {}).items()
+            for route in router.routes
+        }
+
+    def _route_label(self, scope: Scope) -> str:
+        route = scope.get("route")
+        template = getattr(route, "path", None)
+        if template is None:
+            return "unmatched"
+        return self._prefix_of.get(id(route), "") + template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            route = self._route_label(scope)
+            HTTP_DURATION.observe(elapsed, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
+
+
+def _statement_kind(statement: str) -> str:
+    words = statement.split(None, 1)
+    word = words[0].upper() if words else ""
+    return word if word in _STATEMENT_KINDS else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Time every statement ``engine`` executes, labelled ``engine=name``."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, _cursor, _statement, _parameters, _context, _executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, _cursor, statement, _parameters, _context, _executemany):
+        start = conn.info["metrics_query_start"].pop()
+        DB_QUERY_DURATION.observe(
+            time.perf_counter() - start, name, _statement_kind(statement)
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None:
+            starts = context.connection.info.get("metrics_query_start")
+            if starts:
+                starts.pop()
+        DB_QUERY_ERRORS.inc(name, _statement_kind(context.statement or ""))
+
+
+def track_sync(direction: str) -> Callable:
+    """Decorate a sync endpoint to record its duration and outcome."""
+
+    def decorator(endpoint: Callable) -> Callable:
+        @functools.wraps(endpoint)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not settings.metrics_enabled:
+                return await endpoint(*args, **kwargs)
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await endpoint(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                SYNC_DURATION.observe(time.perf_counter() - start, direction, outcome)
+
+        return wrapper
+
+    return decorator
+
+
+def record_session_write_batch(size: int) -> None:
+    """Record how many coalesced session upserts one commit carried."""
+    if settings.metrics_enabled:
+        SESSION_WRITE_BATCH.observe(size)
+
+
+def record_sync_bytes(direction: str, compressed: int, uncompressed: int) -> None:
+    """Count payload bytes moved by one push or pull."""
+    if settings.metrics_enabled:
+        SYNC_BYTES.inc(direction, "compressed", amount=compressed)
+        SYNC_BYTES.inc(direction, "uncompressed", amount=uncompressed)
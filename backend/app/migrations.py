@@ -0,0 +1,153 @@
+"""Versioned schema migrations applied at startup.
+
+Each step has a version number and runs once per database, recorded in the
+``schema_version`` table. Steps run in version order at startup, all in one
+transaction, except deferred ones: index builds on tables that may already
+hold many rows. Those run in the background once the server is serving,
+one transaction each, so a large existing database starts as fast as a new
+one and its queries speed up when the indexes land. Nothing may depend on a
+deferred step having run, except that search misses existing rows until
+their text is indexed.
+
+When every step is recorded, startup costs two small reads and no DDL, and
+does not wait for the write lock: the versions are checked outside a
+transaction first, and the lock is only taken when a startup step is pending.
+
+New tables and their indexes come from the first step (``create_all`` is
+cheap for tables that do not exist yet), as do empty search tables for
+existing ones. An index added to an existing table needs a new deferred step;
+a column needs a new step re-running ``create_tables``.
+"""
+
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import Connection, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import archive, database, search
+from app.database import create_indexes, create_tables
+from app.models import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    deferred: bool = False  # may run after the server starts serving
+
+
+def _indexes(*names: str) -> Callable[[Connection], None]:
+    return lambda conn: create_indexes(conn, names)
+
+
+def _archive_id_index(conn: Connection) -> None:
+    create_tables(conn)
+    archive.fill_id_index(conn)
+
+
+MIGRATIONS = (
+    Migration(1, "create tables", create_tables),
+    Migration(
+        2,
+        "index change sequence numbers",
+        _indexes("ix_sessions_seq", "ix_kanban_tasks_seq"),
+        deferred=True,
+    ),
+    Migration(
+        3, "index session history", _indexes("ix_sessions_completed_at_id"), deferred=True
+    ),
+    Migration(
+        4,
+        "index session filters",
+        _indexes("ix_sessions_type_completed_at_id", "ix_sessions_label_completed_at_id"),
+        deferred=True,
+    ),
+    Migration(5, "index text for search", search.fill_search_tables, deferred=True),
+    Migration(6, "add sync manifest versions", create_tables),
+    Migration(7, "index archived session ids", _archive_id_index),
+)
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    """Versions recorded in ``schema_version`` (none before the first step)."""
+    has_table = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).first()
+    if has_table is None:
+        return set()
+    return set(conn.scalars(select(SchemaVersion.version)))
+
+
+def _apply(conn: Connection, migration: Migration) -> None:
+    started = time.perf_counter()
+    migration.apply(conn)
+    conn.execute(
+        insert(SchemaVersion)
+        .values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=int(time.time() * 1000),
+        )
+        .on_conflict_do_nothing()
+    )
+    logger.info(
+        "Applied migration %d (%s) in %.2fs",
+        migration.version,
+        migration.name,
+        time.perf_counter() - started,
+    )
+
+
+def _pending(conn: Connection) -> list[Migration]:
+    applied = applied_versions(conn)
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def _migrate(conn: Connection) -> list[Migration]:
+    # Re-read under the write lock: another worker may have migrated meanwhile
+    pending = _pending(conn)
+    for migration in pending:
+        if not migration.deferred:
+            _apply(conn, migration)
+    return [m for m in pending if m.deferred]
+
+
+async def migrate(engine: Optional[AsyncEngine] = None) -> list[Migration]:
+    """Apply pending startup steps; returns the deferred steps still pending."""
+    engine = engine or database.engine
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        pending = await conn.run_sync(_pending)
+    if all(m.deferred for m in pending):
+        return pending
+    async with engine.begin() as conn:
+        return await conn.run_sync(_migrate)
+
+
+def _apply_if_pending(conn: Connection, migration: Migration) -> bool:
+    if migration.version in applied_versions(conn):
+        return False
+    _apply(conn, migration)
+    return True
+
+
+async def run_deferred(engine: Optional[AsyncEngine] = None) -> int:
+    """Apply pending deferred steps, one transaction each; returns how many.
+
+    Steps another worker applied meanwhile are skipped. Each index build
+    holds the write lock while it runs; reads carry on.
+    """
+    applied = 0
+    for migration in MIGRATIONS:
+        if migration.deferred:
+            async with (engine or database.engine).begin() as conn:
+                applied += await conn.run_sync(_apply_if_pending, migration)
+    return applied
@@ -1,7 +1,8 @@
-"""SQLModel table models for sessions and kanban tasks."""
+"""SQLModel table models for sessions, kanban tasks and their bookkeeping."""
 
 from typing import Optional
 
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
 
@@ -9,6 +10,13 @@ class SessionRecord(SQLModel, table=True):
     """A completed Pomodoro session."""
 
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Covers the keyset-paginated history listing (newest first)
+        Index("ix_sessions_completed_at_id", "completed_at", "id"),
+        # Serve the same listing filtered by type or label without a sort
+        Index("ix_sessions_type_completed_at_id", "type", "completed_at", "id"),
+        Index("ix_sessions_label_completed_at_id", "label", "completed_at", "id"),
+    )
 
     id: str = Field(primary_key=True)
     type: str  # 'focus' | 'short-break' | 'long-break'
@@ -16,6 +24,9 @@ class SessionRecord(SQLModel, table=True):
     started_at: int  # Unix timestamp ms
     completed_at: int  # Unix timestamp ms
     duration: int  # seconds
+    seq: int = Field(
+        default=0, index=True, sa_column_kwargs={"server_default": "0"}
+    )  # DataVersion.seq of the last write
 
 
 class KanbanTask(SQLModel, table=True):
@@ -29,3 +40,98 @@ class KanbanTask(SQLModel, table=True):
     pomodoros_completed: int = Field(default=0)
     created_at: int  # Unix timestamp ms
     completed_at: Optional[int] = Field(default=None)
+    seq: int = Field(
+        default=0, index=True, sa_column_kwargs={"server_default": "0"}
+    )  # DataVersion.seq of the last write
+
+
+class SessionArchive(SQLModel, table=True):
+    """One UTC month of sessions moved out of the hot table, compressed."""
+
+    __tablename__ = "session_archive"
+
+    month: str = Field(primary_key=True)  # 'YYYY-MM' of completed_at (UTC)
+    session_count: int
+    first_completed_at: int  # Unix timestamp ms
+    last_completed_at: int  # Unix timestamp ms
+    payload: bytes  # zlib-compressed JSON array of rows (see app.archive)
+
+
+class SessionArchiveId(SQLModel, table=True):
+    """The archive segment holding an archived session, by session id."""
+
+    __tablename__ = "session_archive_ids"
+
+    id: str = Field(primary_key=True)  # same as SessionRecord.id
+    month: str  # SessionArchive.month
+
+
+class SessionDailyStat(SQLModel, table=True):
+    """Per-day, per-type rollup of completed sessions."""
+
+    __tablename__ = "session_daily_stats"
+
+    day: str = Field(primary_key=True)  # 'YYYY-MM-DD' in the stats timezone
+    type: str = Field(primary_key=True)  # same values as SessionRecord.type
+    session_count: int = Field(default=0)
+    total_seconds: int = Field(default=0)
+
+
+class SessionLabelStat(SQLModel, table=True):
+    """Usage totals for one distinct, non-empty session label."""
+
+    __tablename__ = "session_label_stats"
+    __table_args__ = (
+        # Top-N by usage or recency, and case-insensitive prefix lookups
+        Index("ix_session_label_stats_count", "session_count", "last_used_at"),
+        Index("ix_session_label_stats_last_used_at", "last_used_at"),
+        Index("ix_session_label_stats_label_lower", text("lower(label)")),
+    )
+
+    label: str = Field(primary_key=True)
+    session_count: int = Field(default=0)
+    focus_seconds: int = Field(default=0)  # summed duration of focus sessions
+    last_used_at: int = Field(default=0)  # latest completed_at, Unix timestamp ms
+
+
+class DataVersion(SQLModel, table=True):
+    """Single-row counter bumped once by every write transaction."""
+
+    __tablename__ = "data_version"
+
+    id: int = Field(default=1, primary_key=True)
+    seq: int = Field(default=0)
+
+
+class SyncTombstone(SQLModel, table=True):
+    """A deleted session or task, kept until every sync remote has seen it."""
+
+    __tablename__ = "sync_tombstones"
+
+    entity: str = Field(primary_key=True)  # 'session' | 'task'
+    id: str = Field(primary_key=True)
+    seq: int = Field(index=True)
+
+
+class SyncRemoteState(SQLModel, table=True):
+    """How far local changes have been pushed to one sync remote."""
+
+    __tablename__ = "sync_remote_state"
+
+    remote: str = Field(primary_key=True)  # '<account>/<container>'
+    pushed_seq: int = Field(default=0)  # changes up to this seq are uploaded
+    manifest_generation: int = Field(default=0)  # last manifest applied or written
+    # The manifest as it was when local data last matched the remote: its
+    # blob ETag and SHA-256 of its content ('' when not known to match)
+    manifest_etag: str = Field(default="", sa_column_kwargs={"server_default": text("''")})
+    manifest_digest: str = Field(default="", sa_column_kwargs={"server_default": text("''")})
+
+
+class SchemaVersion(SQLModel, table=True):
+    """A schema migration step applied to this database (see app.migrations)."""
+
+    __tablename__ = "schema_version"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: int  # Unix timestamp ms
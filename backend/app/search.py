@@ -0,0 +1,258 @@
+"""Full-text search over session labels and kanban task titles.
+
+Two FTS5 tables index the text columns of ``sessions`` and ``kanban_tasks``
+as external content: they store only the inverted index and point back at
+their table's rowid. Triggers on both tables keep them in step with every
+write path, including bulk upserts, the delete and reinsert of a sync pull,
+and archival (archived sessions leave the index with the hot table).
+
+The tables are created after ``create_all``. Alongside a new source table
+they are ready at once; for a table that already holds rows they start out
+empty, without triggers, until ``fill_search_tables`` indexes the existing
+rows (a deferred migration, so older databases start without waiting).
+``VACUUM`` may renumber rowids, so it must be followed by ``rebuild``.
+Rewrites of most rows suspend the triggers and re-index once instead.
+"""
+
+import re
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from sqlalchemy import (
+    ColumnElement,
+    Connection,
+    column,
+    event,
+    func,
+    literal_column,
+    select,
+    table,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from app import wire
+from app.models import KanbanTask, SessionRecord
+
+SearchKind = Literal["session", "task"]
+
+# Term prefixes indexed for fast prefix queries ("cod" -> "coding")
+_PREFIXES = "2 3"
+_TOKENIZER = "unicode61 remove_diacritics 2"
+_WORD = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class _Index:
+    kind: SearchKind
+    model: type[SQLModel]
+    text: str  # indexed column
+    columns: tuple[ColumnElement[Any], ...]  # selected for hits
+    keys: tuple[str, ...]  # wire keys of ``columns``
+    recency: ColumnElement[int]  # orders equally ranked hits, newest first
+
+    @property
+    def source(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def fts(self) -> str:
+        return f"{self.source}_fts"
+
+    @property
+    def triggers(self) -> dict[str, str]:
+        fts, source, text = self.fts, self.source, self.text
+        insert = f"INSERT INTO {fts}(rowid, {text}) VALUES (new.rowid, new.{text});"
+        remove = (
+            f"INSERT INTO {fts}({fts}, rowid, {text}) "
+            f"VALUES ('delete', old.rowid, old.{text});"
+        )
+        return {
+            f"{fts}_ai": f"AFTER INSERT ON {source} BEGIN {insert} END",
+            f"{fts}_ad": f"AFTER DELETE ON {source} BEGIN {remove} END",
+            f"{fts}_au": (
+                f"AFTER UPDATE OF {text} ON {source} "
+                f"WHEN old.{text} IS NOT new.{text} BEGIN {remove} {insert} END"
+            ),
+        }
+
+    def create(self, connection: Connection) -> None:
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {self.fts} USING fts5({self.text}, "
+            f"content='{self.source}', prefix='{_PREFIXES}', tokenize='{_TOKENIZER}')"
+        )
+
+    def fill(self, connection: Connection) -> None:
+        self.create_triggers(connection)
+        self.rebuild(connection)
+
+    def create_triggers(self, connection: Connection) -> None:
+        for name, body in self.triggers.items():
+            connection.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+
+    def drop_triggers(self, connection: Connection) -> None:
+        for name in self.triggers:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+    def rebuild(self, connection: Connection) -> None:
+        connection.exec_driver_sql(f"INSERT INTO {self.fts}({self.fts}) VALUES ('rebuild')")
+
+
+INDEXES = (
+    _Index(
+        "session",
+        SessionRecord,
+        "label",
+        wire.SESSION_COLUMNS,
+        wire.SESSION_KEYS,
+        SessionRecord.completed_at,
+    ),
+    _Index(
+        "task",
+        KanbanTask,
+        "title",
+        wire.TASK_COLUMNS,
+        wire.TASK_KEYS,
+        KanbanTask.created_at,
+    ),
+)
+
+
+def _tables(connection: Connection, kind: str = "table") -> set[str]:
+    return {
+        name
+        for (name,) in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = ?", (kind,)
+        )
+    }
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_search_tables(
+    _target: Any, connection: Connection, tables: Iterable[Any] = (), **_kw: Any
+) -> None:
+    """Create missing FTS tables, filling those of tables created just now.
+
+    Runs after every ``create_all``, including on existing databases.
+    """
+    created = {table.name for table in tables}
+    existing = _tables(connection)
+    for index in INDEXES:
+        if index.fts not in existing and index.source in existing:
+            index.create(connection)
+            if index.source in created:
+                index.fill(connection)
+
+
+def fill_search_tables(connection: Connection) -> None:
+    """Index the existing rows of FTS tables created empty, and add triggers."""
+    existing, triggers = _tables(connection), _tables(connection, "trigger")
+    for index in INDEXES:
+        if index.fts in existing and not triggers.issuperset(index.triggers):
+            index.drop_triggers(connection)
+            index.fill(connection)
+
+
+def rebuild(connection: Connection) -> None:
+    """Re-index every row, e.g. after ``VACUUM`` renumbered rowids."""
+    existing = _tables(connection)
+    for index in INDEXES:
+        if index.fts in existing:
+            index.rebuild(connection)
+
+
+def _rewritten(connection: Connection, models: tuple[type[SQLModel], ...]) -> list[_Index]:
+    existing = _tables(connection)
+    return [
+        index
+        for index in INDEXES
+        if index.fts in existing and (not models or index.model in models)
+    ]
+
+
+def _suspend(connection: Connection, models: tuple[type[SQLModel], ...]) -> None:
+    for index in _rewritten(connection, models):
+        index.drop_triggers(connection)
+
+
+def _resume(connection: Connection, models: tuple[type[SQLModel], ...]) -> None:
+    for index in _rewritten(connection, models):
+        index.rebuild(connection)
+        index.create_triggers(connection)
+
+
+@asynccontextmanager
+async def bulk_rewrite(db: AsyncSession, *models: type[SQLModel]) -> AsyncIterator[None]:
+    """Stop per-row index updates while replacing most rows, re-index after.
+
+    Only the indexes of ``models`` are suspended and rebuilt (all of them
+    when none are given), so clearing one table does not re-index another.
+    The triggers cost one index update per row, far more than a single
+    rebuild when a sync pull or delete-all touches every row. Must run inside
+    the rewrite's transaction: DDL is transactional in SQLite, so a rollback
+    restores the triggers along with the rows.
+    """
+    connection = await db.connection()
+    await connection.run_sync(_suspend, models)
+    yield
+    await connection.run_sync(_resume, models)
+
+
+def match_query(text: str) -> str:
+    """An FTS5 query matching every word of ``text`` as a prefix.
+
+    User input is reduced to words, so FTS5 syntax in it is never
+    interpreted. Returns '' when there is nothing to search for.
+    """
+    return " ".join(f'"{word}"*' for word in _WORD.findall(text))
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    kind: SearchKind
+    rank: float  # bm25 score: lower is a better match
+    item: dict[str, Any]  # the session or task in wire format
+    recency: int
+
+
+async def _search(db: AsyncSession, index: _Index, match: str, limit: int) -> list[SearchHit]:
+    fts = table(index.fts, column("rowid"))
+    rank = func.bm25(literal_column(index.fts))
+    stmt = (
+        select(*index.columns, rank, index.recency)
+        .select_from(fts)
+        .join(index.model, literal_column(f"{index.source}.rowid") == fts.c.rowid)
+        .where(literal_column(index.fts).op("MATCH")(match))
+        .order_by(rank, index.recency.desc())
+        .limit(limit)
+    )
+    return [
+        SearchHit(index.kind, row[-2], dict(zip(index.keys, row[:-2])), row[-1])
+        for row in (await db.execute(stmt)).all()
+    ]
+
+
+async def search(
+    db: AsyncSession,
+    text: str,
+    kinds: Iterable[SearchKind] = ("session", "task"),
+    limit: int = 20,
+    offset: int = 0,
+) -> list[SearchHit]:
+    """Sessions and tasks matching ``text``, best match first.
+
+    Each index returns its best ``offset + limit`` hits, which are merged by
+    rank; ties go to the newer row.
+    """
+    match = match_query(text)
+    if not match:
+        return []
+    kinds = set(kinds)
+    hits: list[SearchHit] = []
+    for index in INDEXES:
+        if index.kind in kinds:
+            hits += await _search(db, index, match, offset + limit)
+    hits.sort(key=lambda hit: (hit.rank, -hit.recency))
+    return hits[offset : offset + limit]
@@ -0,0 +1,166 @@
+"""In-memory index of the built frontend for serving assets and the SPA.
+
+The ``static/`` tree is scanned once at startup, so request paths are dict
+lookups and never touch the filesystem unless they name a file that existed
+then; ``index.html`` is held in memory. Precompressed ``.br``/``.gz``
+siblings are picked via ``Accept-Encoding``, every response carries an ETag
+answered with 304, and content-hashed Vite assets are cached as immutable.
+"""
+
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+INDEX_HTML = "index.html"
+
+# Precompressed siblings, most preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Vite emits assets/<name>-<hash>.<ext> with an 8 character base64url hash
+_HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+
+@dataclass
+class StaticVariant:
+    """One representation of a file: identity or a precompressed sibling."""
+
+    path: Path
+    stat: os.stat_result
+    encoding: Optional[str] = None
+    body: Optional[bytes] = None  # kept in memory for index.html only
+
+    @property
+    def etag(self) -> str:
+        tag = f"{self.stat.st_size:x}-{self.stat.st_mtime_ns:x}"
+        if self.encoding:
+            tag += f"-{self.encoding}"
+        return f'"{tag}"'
+
+
+@dataclass
+class StaticEntry:
+    """A servable file and its precompressed variants."""
+
+    media_type: str
+    cache_control: str
+    identity: StaticVariant
+    encoded: dict[str, StaticVariant] = field(default_factory=dict)
+
+    def select(self, accepted: set[str]) -> StaticVariant:
+        for encoding, _suffix in ENCODINGS:
+            variant = self.encoded.get(encoding)
+            if variant is not None and (encoding in accepted or "*" in accepted):
+                return variant
+        return self.identity
+
+
+def accepted_encodings(header: Optional[str]) -> set[str]:
+    """Content codings an ``Accept-Encoding`` header allows (q > 0)."""
+    accepted: set[str] = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding.strip() and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against ``etag``."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (c.removeprefix("W/") for c in candidates)
+
+
+class StaticSite:
+    """Serves the built SPA under ``root`` from an index made at startup.
+
+    Unknown paths fall back to ``index.html`` so client-side routes work,
+    except under top-level directories (``assets/``, ``sounds/``) where a
+    missing file is a 404.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.entries: dict[str, StaticEntry] = {}
+        self.directories: set[str] = set()
+        self._scan()
+
+    def _scan(self) -> None:
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            names = set(filenames)
+            for name in filenames:
+                if name.endswith(tuple(s for _, s in ENCODINGS)) and (
+                    name.rsplit(".", 1)[0] in names
+                ):
+                    continue  # served as a variant of its base file
+                path = Path(dirpath) / name
+                key = path.relative_to(self.root).as_posix()
+                self.entries[key] = self._entry(key, path, names)
+                if "/" in key:
+                    self.directories.add(key.split("/", 1)[0])
+
+        index = self.entries.get(INDEX_HTML)
+        if index is not None:
+            for variant in (index.identity, *index.encoded.values()):
+                variant.body = variant.path.read_bytes()
+
+    def _entry(self, key: str, path: Path, siblings: set[str]) -> StaticEntry:
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        cache_control = IMMUTABLE if _HASHED_ASSET.match(key) else REVALIDATE
+        entry = StaticEntry(media_type, cache_control, StaticVariant(path, path.stat()))
+        for encoding, suffix in ENCODINGS:
+            if path.name + suffix in siblings:
+                encoded = path.with_name(path.name + suffix)
+                entry.encoded[encoding] = StaticVariant(encoded, encoded.stat(), encoding)
+        return entry
+
+    def lookup(self, path: str) -> Optional[StaticEntry]:
+        """The entry for a request path, falling back to ``index.html``."""
+        key = path.strip("/")
+        entry = self.entries.get(key)
+        if entry is None and key.split("/", 1)[0] not in self.directories:
+            entry = self.entries.get(INDEX_HTML)
+        return entry
+
+    def response(self, path: str, headers: Headers) -> Response:
+        """Response for a GET/HEAD of ``path`` honouring the request headers."""
+        entry = self.lookup(path)
+        if entry is None:
+            return Response(status_code=404)
+
+        variant = entry.select(accepted_encodings(headers.get("accept-encoding")))
+        response_headers = {"ETag": variant.etag, "Cache-Control": entry.cache_control}
+        if entry.encoded:
+            response_headers["Vary"] = "Accept-Encoding"
+        if variant.encoding:
+            response_headers["Content-Encoding"] = variant.encoding
+
+        if etag_matches(headers.get("if-none-match"), variant.etag):
+            return Response(status_code=304, headers=response_headers)
+        if variant.body is not None:
+            return Response(
+                variant.body, media_type=entry.media_type, headers=response_headers
+            )
+        return FileResponse(
+            variant.path,
+            media_type=entry.media_type,
+            headers=response_headers,
+            stat_result=variant.stat,
+        )
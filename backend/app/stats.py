@@ -0,0 +1,166 @@
+"""Daily session rollup maintained alongside the sessions table.
+
+Each row of ``session_daily_stats`` holds the number of sessions and their
+summed duration for one (day, type) bucket. Write paths report the rows they
+remove and add so the rollup is updated by delta, and summary queries read
+O(days) rows instead of scanning every session.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import archive
+from app.config import settings
+from app.models import SessionArchive, SessionDailyStat, SessionRecord
+
+# SQLite caps bound parameters per statement; stay well below it.
+_IN_CHUNK = 500
+# Archived rows folded into the rollup per statement during a rebuild
+_REBUILD_BATCH = 5000
+
+
+def _offset_ms() -> int:
+    return settings.stats_utc_offset_minutes * 60_000
+
+
+def stats_day(completed_at: int) -> str:
+    """Return the rollup day ('YYYY-MM-DD') for a completion timestamp (ms)."""
+    seconds = (completed_at + _offset_ms()) // 1000
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+
+
+def today() -> str:
+    """Return the current rollup day."""
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    return stats_day(now_ms)
+
+
+async def fetch_existing_sessions(
+    db: AsyncSession, ids: Sequence[str]
+) -> list[Mapping[str, Any]]:
+    """Load the rollup- and label-relevant columns of stored rows for ``ids``.
+
+    Missing ids are skipped.
+    """
+    found: list[Mapping[str, Any]] = []
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start : start + _IN_CHUNK]
+        result = await db.execute(
+            select(
+                SessionRecord.type,
+                SessionRecord.label,
+                SessionRecord.completed_at,
+                SessionRecord.duration,
+            ).where(SessionRecord.id.in_(chunk))
+        )
+        found.extend(result.mappings().all())
+    return found
+
+
+async def apply_session_changes(
+    db: AsyncSession,
+    removed: Iterable[Mapping[str, Any]],
+    added: Iterable[Mapping[str, Any]],
+) -> None:
+    """Fold replaced/removed and newly written sessions into the rollup.
+
+    Rows are column-keyed mappings with at least ``type``, ``completed_at``
+    and ``duration``. Must run in the same transaction as the session writes
+    it describes.
+    """
+    deltas: dict[tuple[str, str], list[int]] = defaultdict(lambda: [0, 0])
+    shrinking = False
+    for r in removed:
+        bucket = deltas[(stats_day(r["completed_at"]), r["type"])]
+        bucket[0] -= 1
+        bucket[1] -= r["duration"]
+        shrinking = True
+    for r in added:
+        bucket = deltas[(stats_day(r["completed_at"]), r["type"])]
+        bucket[0] += 1
+        bucket[1] += r["duration"]
+
+    rows = [
+        {"day": day, "type": type_, "session_count": count, "total_seconds": secs}
+        for (day, type_), (count, secs) in deltas.items()
+        if count or secs
+    ]
+    if not rows:
+        return
+
+    stmt = insert(SessionDailyStat)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SessionDailyStat.day, SessionDailyStat.type],
+        set_={
+            "session_count": SessionDailyStat.session_count
+            + stmt.excluded.session_count,
+            "total_seconds": SessionDailyStat.total_seconds
+            + stmt.excluded.total_seconds,
+        },
+    )
+    await db.execute(stmt, rows)
+    if shrinking:
+        await db.execute(
+            delete(SessionDailyStat).where(SessionDailyStat.session_count <= 0)
+        )
+
+
+async def clear_daily_stats(db: AsyncSession) -> None:
+    """Drop every rollup row (used when all sessions are deleted)."""
+    await db.execute(delete(SessionDailyStat))
+
+
+async def rebuild_daily_stats(db: AsyncSession) -> None:
+    """Recompute the whole rollup from ``sessions`` with one INSERT ... SELECT,
+    then fold in archived sessions one segment at a time."""
+    await clear_daily_stats(db)
+    day = func.date(
+        (SessionRecord.completed_at + _offset_ms()) // 1000, "unixepoch"
+    )
+    totals = select(
+        day,
+        SessionRecord.type,
+        func.count(),
+        func.coalesce(func.sum(SessionRecord.duration), 0),
+    ).group_by(day, SessionRecord.type)
+    await db.execute(
+        insert(SessionDailyStat).from_select(
+            ["day", "type", "session_count", "total_seconds"], totals
+        )
+    )
+    batch: list[dict[str, Any]] = []
+    async for row in archive.iter_rows(db):
+        batch.append(dict(zip(archive.ROW_KEYS, row)))
+        if len(batch) >= _REBUILD_BATCH:
+            await apply_session_changes(db, (), batch)
+            batch.clear()
+    await apply_session_changes(db, (), batch)
+
+
+async def ensure_daily_stats(db: AsyncSession) -> None:
+    """Build the rollup once for databases created before it existed."""
+    has_stats = await db.scalar(select(SessionDailyStat.day).limit(1))
+    has_sessions = await db.scalar(
+        select(SessionRecord.id).limit(1)
+    ) or await db.scalar(select(SessionArchive.month).limit(1))
+    if has_stats is None and has_sessions is not None:
+        await rebuild_daily_stats(db)
+        await db.commit()
+
+
+async def query_daily_stats(
+    db: AsyncSession, from_day: str, to_day: str
+) -> list[SessionDailyStat]:
+    """Return rollup rows for the inclusive day range, oldest first."""
+    result = await db.execute(
+        select(SessionDailyStat)
+        .where(SessionDailyStat.day >= from_day, SessionDailyStat.day <= to_day)
+        .order_by(SessionDailyStat.day.asc(), SessionDailyStat.type.asc())
+    )
+    return list(result.scalars().all())
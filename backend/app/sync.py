@@ -0,0 +1,606 @@
+"""Streaming encode/compress/upload and download/decode pipelines for sync.
+
+Push never materialises the whole dataset: rows are read with a server-side
+cursor, encoded to JSON a row at a time, compressed on the fly and uploaded as
+staged blocks, so peak memory is about one block plus one cursor batch.
+
+Pull mirrors it: the blob is downloaded in chunks, decompressed and decoded
+incrementally, and the document is parsed one array element at a time so the
+caller can validate and write records in fixed-size batches.
+
+A remote is a full snapshot plus append-only delta segments. A small manifest
+blob lists them in apply order; its generation increases on every change.
+Manifest writes are conditional on the ETag read before them, so two machines
+pushing at once cannot overwrite each other's segments unnoticed. Callers
+remember the ETag of the manifest their data matches: one HEAD request then
+tells whether a push or pull has anything to do.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import inspect
+import json
+import logging
+import secrets
+import zlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field, replace
+from typing import Any, Optional, Protocol
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import archive, wire
+from app.models import KanbanTask, SessionRecord, SyncTombstone
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_VERSION = 1
+MANIFEST_BLOB_NAME = "pomotrack-sync.manifest.json"
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+# Rows fetched per cursor round trip while streaming
+STREAM_BATCH = 1000
+# Encoded JSON is handed to the compressor in pieces of roughly this size
+_ENCODE_FLUSH = 64 * 1024
+# Compressed input is fed to the decompressor in slices of this size, which
+# bounds each decompressed piece to about slice * compression ratio
+_DECODE_SLICE = 64 * 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _row_id(row: Any) -> str:
+    return row.id
+
+
+@dataclass
+class StreamStats:
+    """Counters collected while a payload is streamed."""
+
+    sessions: int = 0
+    tasks: int = 0
+    deleted_sessions: int = 0
+    deleted_tasks: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    blocks: int = 0
+
+
+def _tombstone_ids(entity: str, since: int, until: Optional[int]):
+    stmt = select(SyncTombstone.id).where(
+        SyncTombstone.entity == entity, SyncTombstone.seq > since
+    )
+    if until is not None:
+        stmt = stmt.where(SyncTombstone.seq <= until)
+    return stmt
+
+
+def _changed_rows(columns: tuple, seq_column, since: Optional[int], until: Optional[int]):
+    stmt = select(*columns)
+    if since is not None:
+        stmt = stmt.where(seq_column > since)
+    if until is not None:
+        stmt = stmt.where(seq_column <= until)
+    return stmt
+
+
+async def _stream_rows(db: AsyncSession, stmt) -> AsyncIterator[Any]:
+    result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH))
+    async for row in result:
+        yield row
+
+
+async def _chain(*iterators: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    for iterator in iterators:
+        async for item in iterator:
+            yield item
+
+
+async def encode_payload(
+    db: AsyncSession,
+    exported_at: str,
+    counts: StreamStats,
+    *,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Yield the sync JSON document in pieces, reading rows from a cursor.
+
+    With ``since`` the document is a delta segment: only rows written after
+    that data version, plus ``deletedSessions``/``deletedTasks`` id lists.
+    ``until`` caps both at a data version read before streaming started.
+    A full snapshot also carries every archived session; archiving does not
+    change a row, so deltas never need them.
+    """
+    sessions = _stream_rows(
+        db, _changed_rows(wire.SESSION_COLUMNS, SessionRecord.seq, since, until)
+    )
+    if since is None:
+        sessions = _chain(sessions, archive.iter_rows(db))
+    sections = [
+        (b',"sessions":[', sessions, wire.session_to_wire, "sessions"),
+        (
+            b'],"tasks":[',
+            _stream_rows(
+                db, _changed_rows(wire.TASK_COLUMNS, KanbanTask.seq, since, until)
+            ),
+            wire.task_to_wire,
+            "tasks",
+        ),
+    ]
+    if since is not None:
+        sections += [
+            (
+                b'],"deletedSessions":[',
+                _stream_rows(db, _tombstone_ids("session", since, until)),
+                _row_id,
+                "deleted_sessions",
+            ),
+            (
+                b'],"deletedTasks":[',
+                _stream_rows(db, _tombstone_ids("task", since, until)),
+                _row_id,
+                "deleted_tasks",
+            ),
+        ]
+
+    buf = bytearray(
+        b'{"version":%d,"exportedAt":%s' % (PAYLOAD_VERSION, wire.dumps(exported_at))
+    )
+    for prefix, rows, to_wire, attr in sections:
+        buf += prefix
+        n = 0
+        async for row in rows:
+            if n:
+                buf += b","
+            buf += wire.dumps(to_wire(row))
+            n += 1
+            if len(buf) >= _ENCODE_FLUSH:
+                yield bytes(buf)
+                buf.clear()
+        setattr(counts, attr, n)
+    buf += b"]}"
+    yield bytes(buf)
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _NoCompression:
+    """Identity stand-in for both compressor and decompressor objects."""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def make_compressor(compression: str) -> Compressor:
+    """Return a streaming compressor; raises ``RuntimeError`` if unavailable."""
+    if compression == "none":
+        return _NoCompression()
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstd sync compression requires the zstandard package") from e
+        return zstandard.ZstdCompressor().compressobj()
+    raise RuntimeError(f"Unknown sync compression: {compression}")
+
+
+async def compress_stream(
+    chunks: AsyncIterator[bytes], compressor: Compressor, counts: StreamStats
+) -> AsyncIterator[bytes]:
+    """Compress ``chunks`` on the fly."""
+    async for chunk in chunks:
+        counts.raw_bytes += len(chunk)
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+async def _call(method: Any, *args: Any, **kwargs: Any) -> Any:
+    """Run a blob client method without blocking the event loop.
+
+    Methods of the async clients are awaited; blocking ones run in a thread.
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await asyncio.to_thread(method, *args, **kwargs)
+
+
+class BlockBlobClient(Protocol):
+    def stage_block(self, block_id: str, data: bytes, **kwargs: Any) -> Any: ...
+
+    def commit_block_list(self, block_list: list[Any], **kwargs: Any) -> Any: ...
+
+
+async def upload_blocks(
+    client: BlockBlobClient,
+    chunks: AsyncIterator[bytes],
+    block_size: int,
+    counts: StreamStats,
+) -> None:
+    """Stage ``chunks`` as blocks of about ``block_size`` bytes, then commit."""
+    block_ids: list[str] = []
+    buf = bytearray()
+
+    async def stage() -> None:
+        block_id = f"{len(block_ids):08d}"
+        data = bytes(buf)
+        buf.clear()
+        await _call(client.stage_block, block_id, data)
+        block_ids.append(block_id)
+        counts.compressed_bytes += len(data)
+
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf) >= block_size:
+            await stage()
+    if buf or not block_ids:
+        await stage()
+    counts.blocks = len(block_ids)
+    await _call(client.commit_block_list, block_ids)
+
+
+async def push_payload(
+    db: AsyncSession,
+    client: BlockBlobClient,
+    exported_at: str,
+    *,
+    compression: str,
+    block_size: int,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+) -> StreamStats:
+    """Stream sessions and tasks to ``client`` as one sync document.
+
+    Without ``since`` this is a full snapshot; see ``encode_payload``.
+    """
+    counts = StreamStats()
+    compressor = make_compressor(compression)
+    encoded = encode_payload(db, exported_at, counts, since=since, until=until)
+    await upload_blocks(
+        client, compress_stream(encoded, compressor, counts), block_size, counts
+    )
+    return counts
+
+
+class SyncPayloadError(ValueError):
+    """The downloaded blob is not a well-formed sync document."""
+
+
+class UnsupportedVersionError(SyncPayloadError):
+    """The sync document declares a version this server cannot read."""
+
+
+class SyncDownloadError(RuntimeError):
+    """Fetching the sync blob from storage failed."""
+
+
+class SyncConflictError(RuntimeError):
+    """Another machine changed the remote manifest while this one wrote it."""
+
+
+class Decompressor(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def _make_decompressor(head: bytes) -> Decompressor:
+    """Pick a decompressor from the payload's leading magic bytes."""
+    if head.startswith(_GZIP_MAGIC):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if head.startswith(_ZSTD_MAGIC):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise SyncPayloadError(
+                "zstd sync payloads require the zstandard package"
+            ) from e
+        return zstandard.ZstdDecompressor().decompressobj()
+    return _NoCompression()
+
+
+async def iter_blob_chunks(
+    client: Any, counts: Optional[StreamStats] = None
+) -> AsyncIterator[bytes]:
+    """Download a blob chunk by chunk without blocking the event loop."""
+    try:
+        downloader = await _call(client.download_blob, max_concurrency=1)
+        chunks = downloader.chunks()
+        if hasattr(chunks, "__anext__"):
+            async for chunk in chunks:
+                if counts is not None:
+                    counts.compressed_bytes += len(chunk)
+                yield chunk
+            return
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            if counts is not None:
+                counts.compressed_bytes += len(chunk)
+            yield chunk
+    except Exception as e:
+        raise SyncDownloadError(str(e)) from e
+
+
+def _decompress(decompressor: Decompressor, data: bytes | None) -> bytes:
+    try:
+        return decompressor.flush() if data is None else decompressor.decompress(data)
+    except Exception as e:  # zlib.error, zstandard.ZstdError, ...
+        raise SyncPayloadError("malformed sync document") from e
+
+
+async def decompress_stream(
+    chunks: AsyncIterator[bytes], counts: Optional[StreamStats] = None
+) -> AsyncIterator[bytes]:
+    """Undo push-side compression incrementally (plain JSON passes through)."""
+    decompressor: Decompressor | None = None
+    head = b""
+    async for chunk in chunks:
+        if decompressor is None:
+            head += chunk
+            if len(head) < len(_ZSTD_MAGIC):
+                continue
+            decompressor, chunk = _make_decompressor(head), head
+        for start in range(0, len(chunk), _DECODE_SLICE):
+            out = _decompress(decompressor, chunk[start : start + _DECODE_SLICE])
+            if out:
+                if counts is not None:
+                    counts.raw_bytes += len(out)
+                yield out
+    if decompressor is None:
+        decompressor = _make_decompressor(head)
+        head = _decompress(decompressor, head) if head else b""
+    else:
+        head = b""
+    tail = head + _decompress(decompressor, None)
+    if tail:
+        if counts is not None:
+            counts.raw_bytes += len(tail)
+        yield tail
+
+
+async def decode_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode UTF-8 incrementally, keeping split multi-byte characters intact."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        async for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise SyncPayloadError("malformed sync document") from e
+    if tail:
+        yield tail
+
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _TextCursor:
+    """Position in a growing text buffer fed from an async chunk iterator."""
+
+    def __init__(self, chunks: AsyncIterator[str]):
+        self._chunks = chunks
+        self._eof = False
+        self.buf = ""
+        self.pos = 0
+
+    async def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = await anext(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            return False
+        # Drop consumed text so the buffer holds at most one chunk plus a value
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    async def peek(self) -> str:
+        """Next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not await self._fill():
+                return ""
+
+    async def take(self, expected: str) -> str:
+        """Consume the next character, which must be one of ``expected``."""
+        ch = await self.peek()
+        if not ch or ch not in expected:
+            raise SyncPayloadError("malformed sync document")
+        self.pos += 1
+        return ch
+
+    async def value(self) -> Any:
+        """Decode one complete JSON value, reading more text as needed."""
+        await self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if await self._fill():
+                    continue
+                raise SyncPayloadError("malformed sync document") from e
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self.buf) and isinstance(value, (int, float)):
+                if await self._fill():
+                    continue
+            self.pos = end
+            return value
+
+
+async def iter_document(
+    chunks: AsyncIterator[str],
+) -> AsyncIterator[tuple[str, Any, bool]]:
+    """Parse a top-level JSON object incrementally.
+
+    Yields ``(key, value, False)`` for scalar members and
+    ``(key, element, True)`` for each element of an array member, so arrays
+    are never held in memory as a whole.
+    """
+    cur = _TextCursor(chunks)
+    await cur.take("{")
+    if await cur.peek() == "}":
+        cur.pos += 1
+    else:
+        while True:
+            key = await cur.value()
+            if not isinstance(key, str):
+                raise SyncPayloadError("malformed sync document")
+            await cur.take(":")
+            if await cur.peek() == "[":
+                cur.pos += 1
+                if await cur.peek() == "]":
+                    cur.pos += 1
+                else:
+                    while True:
+                        yield key, await cur.value(), True
+                        if await cur.take(",]") == "]":
+                            break
+            else:
+                yield key, await cur.value(), False
+            if await cur.take(",}") == "}":
+                break
+    if await cur.peek():
+        raise SyncPayloadError("malformed sync document")
+
+
+def iter_pull_items(
+    client: Any, counts: Optional[StreamStats] = None
+) -> AsyncIterator[tuple[str, Any, bool]]:
+    """Download, decompress, decode and parse the sync blob as a stream.
+
+    ``counts`` (if given) accumulates downloaded and decompressed bytes.
+    """
+    chunks = decompress_stream(iter_blob_chunks(client, counts), counts)
+    return iter_document(decode_text(chunks))
+
+
+@dataclass
+class SyncManifest:
+    """Which blobs make up a remote, in apply order."""
+
+    generation: int
+    base: str
+    segments: list[str] = field(default_factory=list)
+    # ETag and SHA-256 of the manifest blob this was read from or written to
+    etag: str = field(default="", compare=False)
+    digest: str = field(default="", compare=False)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def segment_blob_name(base: str, generation: int) -> str:
+    """Unique name for the segment written at ``generation``."""
+    stem = base.removesuffix(".json")
+    return f"{stem}.segment-{generation:010d}-{secrets.token_hex(4)}.json"
+
+
+def snapshot_blob_name(base: str, generation: int) -> str:
+    """Unique name for the full snapshot written at ``generation``."""
+    stem = base.removesuffix(".json")
+    return f"{stem}.snapshot-{generation:010d}-{secrets.token_hex(4)}.json"
+
+
+async def manifest_etag(client: Any) -> Optional[str]:
+    """The manifest's current ETag (one HEAD request), or None if absent."""
+    try:
+        properties = await _call(client.get_blob_properties)
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        raise SyncDownloadError(str(e)) from e
+    return properties.etag
+
+
+async def read_manifest(client: Any) -> Optional[SyncManifest]:
+    """Fetch the manifest, or None if the remote has none."""
+    try:
+        downloader = await _call(client.download_blob)
+        raw = await _call(downloader.readall)
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        raise SyncDownloadError(str(e)) from e
+    try:
+        data = json.loads(raw)
+        return SyncManifest(
+            generation=int(data["generation"]),
+            base=str(data["base"]),
+            segments=[str(name) for name in data["segments"]],
+            etag=downloader.properties.etag,
+            digest=_digest(raw),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        raise SyncPayloadError("malformed sync manifest") from e
+
+
+async def write_manifest(
+    client: Any, manifest: SyncManifest, *, if_match: Optional[str]
+) -> SyncManifest:
+    """Replace the manifest if its ETag is still ``if_match``.
+
+    With ``if_match=None`` the manifest must not exist yet. Raises
+    ``SyncConflictError`` when another machine wrote it in the meantime.
+    Returns ``manifest`` with the ETag and digest of the new blob.
+    """
+    data = wire.dumps(
+        {
+            "version": PAYLOAD_VERSION,
+            "generation": manifest.generation,
+            "base": manifest.base,
+            "segments": manifest.segments,
+        }
+    )
+    if if_match is None:
+        conditions: dict[str, Any] = {"overwrite": False}
+    else:
+        conditions = {
+            "overwrite": True,
+            "etag": if_match,
+            "match_condition": MatchConditions.IfNotModified,
+        }
+    try:
+        result = await _call(client.upload_blob, data, **conditions)
+    except (ResourceExistsError, ResourceModifiedError) as e:
+        raise SyncConflictError("the sync manifest was changed by another machine") from e
+    return replace(manifest, etag=result["etag"], digest=_digest(data))
+
+
+async def delete_blob_quietly(client: Any) -> None:
+    """Best-effort delete of a blob that is no longer referenced."""
+    try:
+        await _call(client.delete_blob)
+    except Exception as e:
+        logger.warning("Could not delete stale sync blob: %s", e)
@@ -0,0 +1,54 @@
+"""Column-level mapping between table rows and the camelCase wire format.
+
+List endpoints and sync select these raw columns and build wire dicts
+directly, skipping ORM objects and per-row Pydantic models; ``dumps`` encodes
+them with orjson. ``tests/test_wire.py`` pins the output to the Pydantic
+response models so the two paths cannot drift.
+"""
+
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import orjson
+
+from app.models import KanbanTask, SessionRecord
+
+SESSION_COLUMNS = (
+    SessionRecord.id,
+    SessionRecord.type,
+    SessionRecord.label,
+    SessionRecord.started_at,
+    SessionRecord.completed_at,
+    SessionRecord.duration,
+)
+SESSION_KEYS = ("id", "type", "label", "startedAt", "completedAt", "duration")
+
+TASK_COLUMNS = (
+    KanbanTask.id,
+    KanbanTask.title,
+    KanbanTask.status,
+    KanbanTask.pomodoros_completed,
+    KanbanTask.created_at,
+    KanbanTask.completed_at,
+)
+TASK_KEYS = ("id", "title", "status", "pomodorosCompleted", "createdAt", "completedAt")
+
+
+def session_to_wire(row: Sequence[Any]) -> dict[str, Any]:
+    """Wire dict for a row selected with ``SESSION_COLUMNS``."""
+    return dict(zip(SESSION_KEYS, row))
+
+
+def task_to_wire(row: Sequence[Any]) -> dict[str, Any]:
+    """Wire dict for a row selected with ``TASK_COLUMNS``."""
+    return dict(zip(TASK_KEYS, row))
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    return orjson.dumps(value)
+
+
+def dumps_rows(rows: Iterable[Sequence[Any]], keys: Sequence[str]) -> bytes:
+    """Encode rows as a JSON array of objects keyed by ``keys``."""
+    return orjson.dumps([dict(zip(keys, row)) for row in rows])
@@ -0,0 +1 @@
+"""Performance benchmarks for the Pomotrack backend (not collected by pytest)."""
@@ -0,0 +1,89 @@
+"""Compare per-row ``merge`` against the set-based bulk upsert path.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bulk_upsert --rows 50000
+
+Each strategy writes ``--rows`` new sessions into a fresh on-disk SQLite
+database, then writes them again (every row hits the conflict path), and
+reports rows/sec for both passes.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app import bulk
+from app.models import SessionRecord
+
+
+def make_rows(n: int, revision: int = 0) -> list[dict]:
+    base = 1_700_000_000_000
+    return [
+        {
+            "id": f"bench-{i}",
+            "type": "focus" if i % 4 else "short-break",
+            "label": f"label-{i % 50}-{revision}",
+            "started_at": base + i * 60_000,
+            "completed_at": base + i * 60_000 + 1_500_000,
+            "duration": 1500,
+        }
+        for i in range(n)
+    ]
+
+
+async def _merge_rows(db, rows: list[dict]) -> None:
+    for row in rows:
+        await db.merge(SessionRecord(**row))
+
+
+async def _bulk_rows(db, rows: list[dict], chunk_size: int) -> None:
+    await bulk.upsert_sessions(db, rows, chunk_size)
+
+
+async def run_strategy(name: str, rows_n: int, chunk_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        results = {"strategy": name, "rows": rows_n}
+        for phase, revision in (("insert", 0), ("update", 1)):
+            rows = make_rows(rows_n, revision)
+            async with factory() as db:
+                start = time.perf_counter()
+                if name == "merge":
+                    await _merge_rows(db, rows)
+                else:
+                    await _bulk_rows(db, rows, chunk_size)
+                await db.commit()
+                elapsed = time.perf_counter() - start
+            results[f"{phase}_seconds"] = round(elapsed, 3)
+            results[f"{phase}_rows_per_sec"] = round(rows_n / elapsed)
+        await engine.dispose()
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--chunk-size", type=int, default=bulk.BULK_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    for name in ("merge", "bulk"):
+        r = await run_strategy(name, args.rows, args.chunk_size)
+        print(
+            f"{name:>6}: insert {r['insert_rows_per_sec']:>9,} rows/s "
+            f"({r['insert_seconds']}s), update {r['update_rows_per_sec']:>9,} rows/s "
+            f"({r['update_seconds']}s)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
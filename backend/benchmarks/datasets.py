@@ -0,0 +1,125 @@
+"""Deterministic synthetic datasets for the benchmark suite.
+
+Run from ``backend/``::
+
+    python -m benchmarks.datasets --size 100k
+
+Each size has that many sessions and that many kanban tasks, written through
+the same bulk upsert and rollup code the API uses. Rows depend only on their
+index, so every build of a size is identical. Built databases are cached in
+``benchmarks/.data`` and copied before each run, because runs write to them.
+
+Importing this module imports ``app`` (and so reads ``POMOTRACK_*``
+settings); set the environment first.
+"""
+
+import argparse
+import asyncio
+import shutil
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import bulk, changes, labels, stats
+from app.database import create_schema
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+DATA_DIR = Path(__file__).parent / ".data"
+
+BASE_MS = 1_700_000_000_000
+SESSION_TYPES = ("focus", "focus", "focus", "short-break", "focus", "long-break")
+LABELS = ("", "Coding", "Review", "Writing", "Email", "Planning", "Reading", "Émigré ✓")
+TASK_STATUSES = ("todo", "in-progress", "done")
+
+
+def session_id(i: int) -> str:
+    return f"s-{i:07d}"
+
+
+def task_id(i: int) -> str:
+    return f"t-{i:07d}"
+
+
+def session_row(i: int) -> dict:
+    """The ``i``-th synthetic session: ~30 sessions a day, newest last."""
+    type_ = SESSION_TYPES[i % len(SESSION_TYPES)]
+    duration = 1500 if type_ == "focus" else 300 if type_ == "short-break" else 900
+    completed_at = BASE_MS + i * 2_880_000 + (i * 7919) % 60_000
+    return {
+        "id": session_id(i),
+        "type": type_,
+        "label": LABELS[(i * 31) % len(LABELS)] if type_ == "focus" else "",
+        "started_at": completed_at - duration * 1000,
+        "completed_at": completed_at,
+        "duration": duration,
+    }
+
+
+def task_row(i: int) -> dict:
+    """The ``i``-th synthetic kanban task."""
+    status = TASK_STATUSES[i % len(TASK_STATUSES)]
+    created_at = BASE_MS + i * 60_000
+    return {
+        "id": task_id(i),
+        "title": f"Task {i}: {LABELS[i % len(LABELS)] or 'Untitled'}",
+        "status": status,
+        "pomodoros_completed": i % 9,
+        "created_at": created_at,
+        "completed_at": created_at + 3_600_000 if status == "done" else None,
+    }
+
+
+async def build(path: Path, rows: int) -> None:
+    """Write a fresh dataset of ``rows`` sessions and tasks to ``path``."""
+    path.unlink(missing_ok=True)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(create_schema)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as db:
+        seq = await changes.next_seq(db)
+        await bulk.upsert_sessions(
+            db, ({**session_row(i), "seq": seq} for i in range(rows))
+        )
+        await bulk.upsert_tasks(db, ({**task_row(i), "seq": seq} for i in range(rows)))
+        await stats.rebuild_daily_stats(db)
+        await labels.rebuild_labels(db)
+        await db.commit()
+    await engine.dispose()
+
+
+async def ensure(size: str, data_dir: Path = DATA_DIR) -> Path:
+    """Path of the cached dataset for ``size``, building it if needed."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / f"pomotrack-{size}.db"
+    if not path.exists():
+        tmp = path.with_suffix(".tmp")
+        await build(tmp, SIZES[size])
+        tmp.replace(path)
+    return path
+
+
+async def copy_to(size: str, dest: Path, data_dir: Path = DATA_DIR) -> Path:
+    """Copy the cached dataset for ``size`` to ``dest`` (a database file)."""
+    shutil.copyfile(await ensure(size, data_dir), dest)
+    return dest
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild if cached")
+    args = parser.parse_args()
+
+    path = args.data_dir / f"pomotrack-{args.size}.db"
+    if args.force:
+        path.unlink(missing_ok=True)
+    start = time.perf_counter()
+    await ensure(args.size, args.data_dir)
+    print(f"{path} ({SIZES[args.size]:,} rows) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
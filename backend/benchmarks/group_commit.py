@@ -0,0 +1,118 @@
+"""Single-session upsert throughput with and without group commit.
+
+Run from ``backend/``::
+
+    python -m benchmarks.group_commit --writes 5000 --concurrency 64
+    python -m benchmarks.group_commit --synchronous full
+
+Concurrent callers each upsert one session through the same write path as
+``POST /api/sessions``, on the server's writer engine over a fresh on-disk
+database, without the HTTP layer. A batch size of 1 commits every write on
+its own, as before coalescing; the other runs use the configured window and
+batch size. A second round repeats this with a single caller, whose writes
+must not get slower. Reports writes/sec, commits and caller latency.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.routes import SessionIn, _flush_session_writes
+from app.coalescer import WriteCoalescer
+from app.config import Settings, settings
+from app.database import build_engine, create_schema
+
+
+def _session(i: int) -> SessionIn:
+    started = 1_700_000_000_000 + i * 60_000
+    return SessionIn(
+        id=f"bench-gc-{i}",
+        type="focus",
+        label=f"label-{i % 20}",
+        startedAt=started,
+        completedAt=started + 1_500_000,
+        duration=1500,
+    )
+
+
+async def run(
+    args: argparse.Namespace, window_ms: float, batch_size: int, concurrency: int, writes: int
+) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pomotrack-gc-") as tmp:
+        cfg = Settings(db_path=str(Path(tmp) / "bench.db"), sqlite_synchronous=args.synchronous)
+        engine = build_engine(cfg)
+        async with engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        commits = 0
+
+        def count(_conn):
+            nonlocal commits
+            commits += 1
+
+        event.listen(engine.sync_engine, "commit", count)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        coalescer = WriteCoalescer(_flush_session_writes, window_ms / 1000, batch_size)
+        items = iter(range(writes))
+        latencies: list[float] = []
+
+        async def caller() -> None:
+            for i in items:
+                started = time.perf_counter()
+                async with factory() as db:
+                    await coalescer.submit(db, _session(i))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(caller() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+
+    latencies.sort()
+    return {
+        "window_ms": window_ms,
+        "batch_size": batch_size,
+        "writes_per_sec": round(writes / elapsed),
+        "commits": commits,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--lone-writes", type=int, default=500, help="writes by a single caller")
+    parser.add_argument("--window-ms", type=float, default=settings.session_write_window_ms)
+    parser.add_argument("--batch-size", type=int, default=settings.session_write_batch_size)
+    parser.add_argument(
+        "--synchronous", choices=("off", "normal", "full"), default=settings.sqlite_synchronous
+    )
+    args = parser.parse_args()
+
+    runs = [(0, 1), (0, args.batch_size), (args.window_ms, args.batch_size)]
+    # Concurrent callers, then one caller at a time: a lone write must not wait
+    for concurrency, writes in ((args.concurrency, args.writes), (1, args.lone_writes)):
+        print(f"{concurrency} concurrent callers, {writes} writes")
+        base = None
+        for window_ms, batch_size in runs:
+            r = await run(args, window_ms, batch_size, concurrency, writes)
+            base = base or r["writes_per_sec"]
+            print(
+                f"  window {r['window_ms']:>5} ms  batch {r['batch_size']:>4}  "
+                f"{r['writes_per_sec']:>7} writes/s  ({r['writes_per_sec'] / base:.1f}x)  "
+                f"{r['commits']:>5} commits  p50 {r['p50_ms']:>8.2f} ms  "
+                f"p99 {r['p99_ms']:>8.2f} ms"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
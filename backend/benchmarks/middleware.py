@@ -0,0 +1,124 @@
+"""Per-request overhead of the security headers middleware.
+
+Run from ``backend/``::
+
+    python -m benchmarks.middleware --requests 20000
+
+Builds the same small app (``/api/health`` plus a ``StaticFiles`` mount
+serving a 32 KiB asset) three times: without middleware, wrapped in the old
+``BaseHTTPMiddleware`` implementation, and wrapped in the pure ASGI
+``SecurityHeadersMiddleware``. Requests are driven straight through the ASGI
+callable so the numbers are not drowned out by an HTTP client, and p50/p99
+latency and throughput are reported per route.
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.staticfiles import StaticFiles
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.main import SECURITY_HEADERS, SecurityHeadersMiddleware
+
+ROUTES = ("/api/health", "/assets/app.js")
+
+
+class BaseHTTPSecurityHeaders(BaseHTTPMiddleware):
+    """The previous ``BaseHTTPMiddleware`` based implementation."""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS:
+            response.headers[name.decode()] = value.decode()
+        return response
+
+
+def build_app(assets: Path, middleware: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy", "version": "1.0.0"}
+
+    app.mount("/assets", StaticFiles(directory=assets), name="assets")
+    if middleware == "base-http":
+        app.add_middleware(BaseHTTPSecurityHeaders)
+    elif middleware == "asgi":
+        app.add_middleware(SecurityHeadersMiddleware)
+    return app
+
+
+async def request(app, path: str) -> int:
+    scope = {
+        "type": "http",
+        # 2.4 like uvicorn: responses need not poll receive() for disconnects
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run(app, path: str, n: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        assert await request(app, path) == 200
+    samples = []
+    start = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await request(app, path)
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        "p50_us": round(statistics.median(samples) * 1e6, 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1] * 1e6, 1),
+        "req_per_sec": round(n / elapsed),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        assets = Path(tmp)
+        (assets / "app.js").write_bytes(b"x" * 32 * 1024)
+        for path in ROUTES:
+            for middleware in ("none", "base-http", "asgi"):
+                app = build_app(assets, middleware)
+                r = await run(app, path, args.requests, args.warmup)
+                print(
+                    f"{path:<16} {middleware:>9}: p50 {r['p50_us']:>7} us, "
+                    f"p99 {r['p99_us']:>7} us, {r['req_per_sec']:>7,} req/s"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
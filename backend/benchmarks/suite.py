@@ -0,0 +1,429 @@
+"""End-to-end benchmark of every API route plus static/SPA serving.
+
+Run from ``backend/``::
+
+    python -m benchmarks.suite --size 1k
+    python -m benchmarks.suite --size 100k --transport uvicorn --output run.json
+    python -m benchmarks.suite --size 1k --compare benchmarks/baselines/1k-asgi.json
+
+A copy of the synthetic dataset for ``--size`` (see ``benchmarks.datasets``)
+is served either in-process through ``httpx.ASGITransport`` or by a real
+uvicorn subprocess. Sync goes to a local directory blob store and the SPA to
+a generated static tree. Scenarios run in order, reads first and destructive
+deletes last. For each one the report gives p50/p99 latency, throughput,
+error count and the server's peak RSS so far, as JSON.
+
+``--compare`` checks a run against a stored report and lists scenarios whose
+p50 or throughput got worse by more than ``--tolerance``. With
+``--fail-on-regression`` the exit status is 1 when any did. Store a new
+baseline with ``--output benchmarks/baselines/<size>-<transport>.json``.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+BASELINE_DIR = Path(__file__).parent / "baselines"
+SYNC_CREDS = {"accountName": "bench", "containerName": "bench", "accountKey": "bench"}
+HASHED_ASSET = "assets/index-Bx7k2_Qa.js"
+
+
+@dataclass
+class Scenario:
+    """One route exercised ``requests`` times; ``build(i)`` gives request kwargs."""
+
+    name: str
+    method: str
+    build: Callable[[int], dict[str, Any]]
+    heavy: bool = False  # cost grows with the dataset: uses --heavy-requests
+    requests: Optional[int] = None  # fixed count (e.g. delete-all)
+    concurrency: Optional[int] = None  # cap, for requests that depend on each other
+    ok_status: frozenset[int] = field(default=frozenset({200, 201, 304}))
+    # Untimed request(s) made before each timed one
+    setup: Optional[Callable[[httpx.AsyncClient, int], Awaitable[Any]]] = None
+
+
+def _session(i: int, prefix: str) -> dict:
+    completed_at = 1_900_000_000_000 + i * 60_000
+    return {
+        "id": f"{prefix}-{i}",
+        "type": "focus",
+        "label": "Bench",
+        "startedAt": completed_at - 1_500_000,
+        "completedAt": completed_at,
+        "duration": 1500,
+    }
+
+
+def _task(i: int, prefix: str, status: str = "todo") -> dict:
+    return {
+        "id": f"{prefix}-{i}",
+        "title": f"Bench task {i}",
+        "status": status,
+        "pomodorosCompleted": i % 5,
+        "createdAt": 1_900_000_000_000 + i,
+        "completedAt": None,
+    }
+
+
+def build_scenarios(rows: int, etag: str) -> list[Scenario]:
+    from benchmarks.datasets import task_id
+
+    def get(path: str, **kwargs: Any) -> Callable[[int], dict[str, Any]]:
+        return lambda _i: {"url": path, **kwargs}
+
+    # Day of the newest session in the dataset (UTC)
+    last_day = datetime.fromtimestamp(
+        (1_700_000_000_000 + rows * 2_880_000) // 1000, tz=timezone.utc
+    ).date()
+
+    return [
+        Scenario("health", "GET", get("/api/health")),
+        Scenario("list_sessions_page", "GET", get("/api/sessions?limit=100")),
+        Scenario(
+            "list_sessions_page_deep",
+            "GET",
+            get(f"/api/sessions?limit=100&before={1_700_000_000_000 + rows * 1_440_000}"),
+        ),
+        Scenario(
+            "list_sessions_not_modified",
+            "GET",
+            get("/api/sessions", headers={"If-None-Match": etag}),
+        ),
+        Scenario(
+            "list_sessions_filtered",
+            "GET",
+            get(
+                "/api/sessions?type=focus&label=Writing&limit=100"
+                f"&from={1_700_000_000_000 + rows * 720_000}"
+            ),
+        ),
+        Scenario("list_sessions_full", "GET", get("/api/sessions"), heavy=True),
+        Scenario("export_sessions_ndjson", "GET", get("/api/export/sessions"), heavy=True),
+        Scenario(
+            "export_sessions_columns",
+            "GET",
+            get("/api/export/sessions?format=columns"),
+            heavy=True,
+        ),
+        Scenario(
+            "stats_30d",
+            "GET",
+            get(f"/api/stats?from={last_day - timedelta(days=29)}&to={last_day}"),
+        ),
+        Scenario("labels_top", "GET", get("/api/labels")),
+        Scenario("labels_prefix", "GET", get("/api/labels?prefix=re")),
+        Scenario("search_rare", "GET", get("/api/search?q=task+12345")),
+        Scenario("search_common", "GET", get("/api/search?q=rev")),
+        Scenario(
+            "stats_all_time", "GET", get("/api/stats?from=2023-01-01&to=2099-12-31")
+        ),
+        Scenario("list_tasks", "GET", get("/api/kanban/tasks"), heavy=True),
+        Scenario(
+            "spa_fallback",
+            "GET",
+            get("/board", headers={"Accept-Encoding": "gzip, br"}),
+        ),
+        Scenario(
+            "static_asset",
+            "GET",
+            get(f"/{HASHED_ASSET}", headers={"Accept-Encoding": "gzip, br"}),
+        ),
+        Scenario(
+            "upsert_session",
+            "POST",
+            lambda i: {"url": "/api/sessions", "json": _session(i, "bench-one")},
+        ),
+        Scenario(
+            "batch_sessions_100",
+            "POST",
+            lambda i: {
+                "url": "/api/sessions/batch",
+                "json": [_session(i * 100 + j, "bench-batch") for j in range(100)],
+            },
+        ),
+        Scenario(
+            "create_task",
+            "POST",
+            lambda i: {"url": "/api/kanban/tasks", "json": _task(i, "bench")},
+        ),
+        Scenario(
+            "update_task",
+            "PUT",
+            lambda i: {
+                "url": f"/api/kanban/tasks/{task_id(i % rows)}",
+                "json": {**_task(i, "x", "in-progress"), "id": task_id(i % rows)},
+            },
+        ),
+        Scenario(
+            "delete_task",
+            "DELETE",
+            lambda i: {"url": f"/api/kanban/tasks/bench-{i}"},
+        ),
+        Scenario("stats_rebuild", "POST", get("/api/stats/rebuild"), heavy=True),
+        Scenario("sync_push", "POST", get("/api/sync/push", json=SYNC_CREDS), heavy=True),
+        Scenario(
+            "sync_pull",
+            "POST",
+            get("/api/sync/pull", json=SYNC_CREDS),
+            heavy=True,
+            concurrency=1,
+            # A local write first, so each pull downloads and applies the
+            # remote instead of finding it unchanged
+            setup=lambda client, i: client.post(
+                "/api/sessions", json=_session(i, "bench-pull")
+            ),
+        ),
+        Scenario("delete_all_tasks", "DELETE", get("/api/kanban/tasks"), requests=1),
+        Scenario("delete_all_sessions", "DELETE", get("/api/sessions"), requests=1),
+    ]
+
+
+def write_static_tree(root: Path) -> None:
+    """A small built-frontend stand-in with precompressed variants."""
+    index = b'<!doctype html><html><head><script type="module" src="/%s"></script>' % (
+        HASHED_ASSET.encode()
+    )
+    script = b"export const pomotrack = () => console.log('tick');\n" * 4000
+    (root / "assets").mkdir(parents=True)
+    for name, body in (("index.html", index), (HASHED_ASSET, script)):
+        (root / name).write_bytes(body)
+        (root / f"{name}.gz").write_bytes(gzip.compress(body, 9))
+
+
+def _rss_mib_self() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _rss_mib_pid(pid: int) -> Optional[float]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int
+) -> dict:
+    samples: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            kwargs = scenario.build(i)
+            if scenario.setup is not None:
+                await scenario.setup(client, i)
+            start = time.perf_counter()
+            response = await client.request(scenario.method, **kwargs)
+            samples.append(time.perf_counter() - start)
+            if response.status_code not in scenario.ok_status:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(samples[max(0, -(-len(samples) * 99 // 100) - 1)] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+    }
+
+
+async def run_all(
+    client: httpx.AsyncClient,
+    rows: int,
+    args: argparse.Namespace,
+    peak_rss: Callable[[], Optional[float]],
+) -> dict:
+    etag = (await client.get("/api/sessions?limit=1")).headers["etag"]
+    results = {}
+    for scenario in build_scenarios(rows, etag):
+        if args.only and scenario.name not in args.only:
+            continue
+        count = scenario.requests or (args.heavy_requests if scenario.heavy else args.requests)
+        concurrency = min(scenario.concurrency or args.concurrency, count)
+        r = await run_scenario(client, scenario, count, concurrency)
+        r["peak_rss_mib"] = peak_rss()
+        results[scenario.name] = r
+        print(
+            f"{scenario.name:<28} p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+            f"{r['throughput_rps']:>9.1f} req/s  rss {r['peak_rss_mib']} MiB"
+            + (f"  errors {r['errors']}" if r["errors"] else ""),
+            file=sys.stderr,
+        )
+    return results
+
+
+async def run_asgi(rows: int, args: argparse.Namespace) -> dict:
+    # Imported only now: app reads POMOTRACK_* settings at import time
+    from app.main import app, lifespan
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            return await run_all(client, rows, args, _rss_mib_self)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve_uvicorn(*extra_args: str) -> AsyncIterator[tuple[httpx.AsyncClient, int]]:
+    """Start uvicorn on a free port and yield a client for it and its pid."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+            *extra_args,
+        ],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None
+        ) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                await asyncio.sleep(0.1)
+            yield client, server.pid
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def run_uvicorn(rows: int, args: argparse.Namespace) -> dict:
+    async with serve_uvicorn() as (client, pid):
+        return await run_all(client, rows, args, lambda: _rss_mib_pid(pid))
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe scenarios slower than ``baseline`` by more than ``tolerance``."""
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        p50 = now["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+        rps = now["throughput_rps"] / before["throughput_rps"] if before["throughput_rps"] else 1.0
+        flag = p50 > 1 + tolerance or rps < 1 / (1 + tolerance)
+        print(
+            f"{name:<28} p50 {before['p50_ms']:>9.2f} -> {now['p50_ms']:>9.2f} ms "
+            f"({p50 - 1:+6.0%})  throughput ({rps - 1:+6.0%})"
+            + ("  REGRESSION" if flag else ""),
+            file=sys.stderr,
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=("1k", "100k", "1m"), default="1k")
+    parser.add_argument("--transport", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--heavy-requests", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--data-dir", type=Path, help="dataset cache directory")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="baseline JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="pomotrack-bench-") as tmp:
+        work = Path(tmp)
+        write_static_tree(work / "static")
+        os.environ.update(
+            POMOTRACK_DB_PATH=str(work / "pomotrack.db"),
+            POMOTRACK_SYNC_LOCAL_BLOB_DIR=str(work / "blobs"),
+            POMOTRACK_STATIC_DIR=str(work / "static"),
+        )
+        from benchmarks import datasets
+
+        data_dir = args.data_dir or datasets.DATA_DIR
+        await datasets.copy_to(args.size, work / "pomotrack.db", data_dir)
+        rows = datasets.SIZES[args.size]
+        run = run_asgi if args.transport == "asgi" else run_uvicorn
+        started = time.perf_counter()
+        scenarios = await run(rows, args)
+
+    report = {
+        "meta": {
+            "size": args.size,
+            "rows": rows,
+            "transport": args.transport,
+            "requests": args.requests,
+            "heavy_requests": args.heavy_requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - started, 1),
+        },
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        for key in ("size", "transport", "concurrency"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"warning: baseline {key} is {baseline['meta'].get(key)!r}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
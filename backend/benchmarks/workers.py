@@ -0,0 +1,115 @@
+"""Throughput of reads and writes as uvicorn worker processes are added.
+
+Run from ``backend/``::
+
+    python -m benchmarks.workers --size 100k --workers 1 2 4
+    python -m benchmarks.workers --size 1k --requests 2000 --concurrency 64
+
+For each worker count a fresh copy of the dataset is served by
+``uvicorn --workers N`` and hit with concurrent requests: a page of sessions
+(reads, spread over every worker's read pool) and single-session upserts
+(writes, serialised by SQLite's write lock across processes). The report
+gives throughput and latency per worker count, plus the speedup over the
+first count and how many writes were retried on lock contention.
+
+The load generator shares the machine with the server, so scaling stops at
+the number of free cores.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks import datasets
+from benchmarks.suite import Scenario, _session, run_scenario, serve_uvicorn, write_static_tree
+
+SCENARIOS = (
+    Scenario("read_sessions_page", "GET", lambda _i: {"url": "/api/sessions?limit=100"}),
+    Scenario(
+        "write_session",
+        "POST",
+        lambda i: {"url": "/api/sessions", "json": _session(i, "bench-workers")},
+    ),
+)
+
+
+async def _write_retries(client) -> float:
+    """Retries reported by whichever worker answers (metrics are per process)."""
+    for line in (await client.get("/api/metrics")).text.splitlines():
+        if line.startswith("pomotrack_db_write_retries_total "):
+            return float(line.split()[1])
+    return 0.0
+
+
+async def run_workers(workers: int, work: Path, args: argparse.Namespace) -> dict:
+    await datasets.copy_to(args.size, work / "pomotrack.db", args.data_dir or datasets.DATA_DIR)
+    os.environ["POMOTRACK_WORKERS"] = str(workers)
+    results = {}
+    async with serve_uvicorn("--workers", str(workers)) as (client, _pid):
+        for scenario in SCENARIOS:
+            r = await run_scenario(client, scenario, args.requests, args.concurrency)
+            results[scenario.name] = r
+            print(
+                f"workers {workers}  {scenario.name:<20} p50 {r['p50_ms']:>8.2f} ms  "
+                f"p99 {r['p99_ms']:>8.2f} ms  {r['throughput_rps']:>8.1f} req/s"
+                + (f"  errors {r['errors']}" if r["errors"] else ""),
+                file=sys.stderr,
+            )
+        results["write_retries_sampled"] = await _write_retries(client)
+    for suffix in ("", "-wal", "-shm"):
+        (work / f"pomotrack.db{suffix}").unlink(missing_ok=True)
+    return results
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=tuple(datasets.SIZES), default="1k")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--data-dir", type=Path, help="dataset cache directory")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    args = parser.parse_args()
+
+    runs = {}
+    with tempfile.TemporaryDirectory(prefix="pomotrack-workers-") as tmp:
+        work = Path(tmp)
+        write_static_tree(work / "static")
+        os.environ.update(
+            POMOTRACK_DB_PATH=str(work / "pomotrack.db"),
+            POMOTRACK_STATIC_DIR=str(work / "static"),
+        )
+        for workers in args.workers:
+            runs[workers] = await run_workers(workers, work, args)
+
+    first = runs[args.workers[0]]
+    for result in runs.values():
+        for scenario in SCENARIOS:
+            base = first[scenario.name]["throughput_rps"]
+            now = result[scenario.name]
+            now["speedup"] = round(now["throughput_rps"] / base, 2) if base else None
+
+    report = {
+        "meta": {
+            "size": args.size,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cpus": os.cpu_count(),
+        },
+        "workers": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
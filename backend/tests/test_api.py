@@ -1,15 +1,22 @@
 """Tests for the Pomotrack API."""
 
+import asyncio
+import gzip
 import json
 
 import pytest
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
 
 import app.api.routes as routes_module
-from app.database import get_session
-from app.main import app
+from app import bulk, changes, export, metrics, sync
+from app.config import settings
+from app.database import get_read_session, get_session
+from app.feed import ChangeFeed
+from app.localblob import LocalBlobClient
+from app.main import SecurityHeadersMiddleware, app
 
 # ---------------------------------------------------------------------------
 # Fixtures
@@ -41,6 +48,7 @@ async def client(transport, db_engine):
             yield session
 
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
     app.dependency_overrides.clear()
@@ -72,6 +80,30 @@ async def test_security_headers(client):
     assert "content-security-policy" in response.headers
 
 
+@pytest.mark.asyncio
+async def test_security_headers_replace_app_values():
+    """Headers set by the app are overridden, not duplicated, and bodies stream."""
+
+    async def inner(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"x-frame-options", b"SAMEORIGIN"), (b"x-extra", b"1")],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        await send({"type": "http.response.body", "body": b"b"})
+
+    wrapped = ASGITransport(app=SecurityHeadersMiddleware(inner))
+    async with AsyncClient(transport=wrapped, base_url="http://test") as ac:
+        response = await ac.get("/")
+    assert response.content == b"ab"
+    assert response.headers.get_list("x-frame-options") == ["DENY"]
+    assert response.headers["x-extra"] == "1"
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+
 @pytest.mark.asyncio
 async def test_unknown_api_route_returns_404_or_fallback(client):
     """Unknown API routes should not leak data."""
@@ -137,6 +169,157 @@ async def test_batch_post_sessions(client):
     assert len(sessions) == 2
 
 
+@pytest.mark.asyncio
+async def test_batch_post_sessions_last_duplicate_wins(client):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    payload = [
+        {**SESSION_PAYLOAD, "label": "First"},
+        {**SESSION_PAYLOAD, "label": "Second"},
+    ]
+    response = await client.post("/api/sessions/batch", json=payload)
+    assert response.json()["count"] == 2
+    sessions = (await client.get("/api/sessions")).json()
+    assert [s["label"] for s in sessions] == ["Second"]
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_keyset_pagination(client):
+    """Pages follow the X-Next-Cursor header without gaps or duplicates."""
+    payload = [
+        {**SESSION_PAYLOAD, "id": f"s-{i}", "completedAt": 1700000000000 + (i // 2)}
+        for i in range(5)
+    ]
+    await client.post("/api/sessions/batch", json=payload)
+
+    seen: list[str] = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["before"] = cursor
+        response = await client.get("/api/sessions", params=params)
+        assert response.status_code == 200
+        seen.extend(s["id"] for s in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert seen == ["s-4", "s-3", "s-2", "s-1", "s-0"]
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_before_timestamp(client):
+    payload = [
+        {**SESSION_PAYLOAD, "id": f"s-{i}", "completedAt": 1700000000000 + i}
+        for i in range(3)
+    ]
+    await client.post("/api/sessions/batch", json=payload)
+    response = await client.get("/api/sessions", params={"before": 1700000000002})
+    assert [s["id"] for s in response.json()] == ["s-1", "s-0"]
+    assert "x-next-cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_invalid_cursor(client):
+    response = await client.get("/api/sessions", params={"before": "yesterday"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_page_uses_index(db_engine):
+    """The keyset page query is served by the completed_at index, not a sort."""
+    async with db_engine.connect() as conn:
+        rows = await conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM sessions "
+            "WHERE (completed_at, id) < (?, ?) "
+            "ORDER BY completed_at DESC, id DESC LIMIT 50",
+            (1700000000000, "x"),
+        )
+        plan = " ".join(str(r[-1]) for r in rows)
+    assert "ix_sessions_completed_at_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def _filter_payload() -> list[dict]:
+    kinds = [("focus", "Coding"), ("short-break", ""), ("focus", "Reading")]
+    return [
+        {
+            **SESSION_PAYLOAD,
+            "id": f"s-{i}",
+            "type": kinds[i % 3][0],
+            "label": kinds[i % 3][1],
+            "completedAt": 1700000000000 + i,
+        }
+        for i in range(9)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_filters(client):
+    await client.post("/api/sessions/batch", json=_filter_payload())
+
+    async def ids(**params):
+        response = await client.get("/api/sessions", params=params)
+        assert response.status_code == 200
+        return [s["id"] for s in response.json()]
+
+    assert await ids(type="focus") == ["s-8", "s-6", "s-5", "s-3", "s-2", "s-0"]
+    assert await ids(label="Coding") == ["s-6", "s-3", "s-0"]
+    assert await ids(label="") == ["s-7", "s-4", "s-1"]
+    assert await ids(type="focus", label="Reading") == ["s-8", "s-5", "s-2"]
+    # from is inclusive, to is exclusive
+    assert await ids(**{"from": 1700000000003, "to": 1700000000006}) == ["s-5", "s-4", "s-3"]
+    assert await ids(type="short-break", to=1700000000004) == ["s-1"]
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_filters_paginate(client):
+    await client.post("/api/sessions/batch", json=_filter_payload())
+    seen, cursor = [], None
+    while True:
+        params = {"type": "focus", "from": 1700000000001, "limit": 2}
+        if cursor:
+            params["before"] = cursor
+        response = await client.get("/api/sessions", params=params)
+        seen.extend(s["id"] for s in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == ["s-8", "s-6", "s-5", "s-3", "s-2"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params, index",
+    [
+        ({"type": "focus"}, "ix_sessions_type_completed_at_id"),
+        ({"type": "focus", "from": 1, "to": 2}, "ix_sessions_type_completed_at_id"),
+        ({"label": "Coding", "before": "5:x", "limit": 50}, "ix_sessions_label_completed_at_id"),
+        ({"from": 1, "to": 2, "limit": 50}, "ix_sessions_completed_at_id"),
+    ],
+)
+async def test_list_sessions_filters_use_index(client, db_engine, params, index):
+    """Each filter combination the endpoint issues is planned over an index."""
+    queries = []
+
+    def record(_conn, _cursor, statement, parameters, *_args):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM sessions" in statement:
+            queries.append((statement, parameters))
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        assert (await client.get("/api/sessions", params=params)).status_code == 200
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+    ((statement, parameters),) = queries
+    async with db_engine.connect() as conn:
+        rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plan = " ".join(str(r[-1]) for r in rows)
+    assert f"USING INDEX {index} " in plan
+    assert "TEMP B-TREE" not in plan
+
+
 @pytest.mark.asyncio
 async def test_delete_all_sessions(client):
     await client.post("/api/sessions", json=SESSION_PAYLOAD)
@@ -145,6 +328,425 @@ async def test_delete_all_sessions(client):
     assert response.json() == []
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/api/sessions", "/api/kanban/tasks"])
+async def test_list_conditional_get(client, path):
+    first = await client.get(path)
+    etag = first.headers["etag"]
+    assert etag.startswith('"')
+
+    cached = await client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    weak = await client.get(path, headers={"If-None-Match": f'"stale", W/{etag}'})
+    assert weak.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_list_etag_changes_on_every_mutation(client):
+    etags = [(await client.get("/api/sessions")).headers["etag"]]
+
+    async def check():
+        etag = (await client.get("/api/sessions")).headers["etag"]
+        assert etag not in etags
+        etags.append(etag)
+
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await check()
+    await client.post("/api/sessions/batch", json=[SESSION_PAYLOAD])
+    await check()
+    await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
+    await check()
+    await client.put(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}", json=TASK_PAYLOAD)
+    await check()
+    await client.delete(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}")
+    await check()
+    await client.delete("/api/kanban/tasks")
+    await check()
+    await client.delete("/api/sessions")
+    await check()
+
+    # A rejected mutation leaves the version alone
+    await client.put("/api/kanban/tasks/missing", json=TASK_PAYLOAD)
+    response = await client.get("/api/sessions", headers={"If-None-Match": etags[-1]})
+    assert response.status_code == 304
+
+
+# ---------------------------------------------------------------------------
+# Session archive
+# ---------------------------------------------------------------------------
+
+
+def _old_session(i: int) -> dict:
+    return {
+        **SESSION_PAYLOAD,
+        "id": f"old-{i}",
+        "startedAt": SESSION_PAYLOAD["startedAt"] + i * 3_600_000,
+        "completedAt": SESSION_PAYLOAD["completedAt"] + i * 3_600_000,
+    }
+
+
+@pytest.mark.asyncio
+async def test_archive_run_requires_an_age(client):
+    assert (await client.post("/api/archive/run")).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_archived_sessions_listed_on_request(client):
+    await client.post("/api/sessions/batch", json=[_old_session(i) for i in range(5)])
+    recent = {**SESSION_PAYLOAD, "id": "recent", "completedAt": 4102444800000}
+    await client.post("/api/sessions", json=recent)
+    etag = (await client.get("/api/sessions")).headers["etag"]
+
+    run = await client.post("/api/archive/run", params={"olderThanDays": 30})
+    assert run.json()["archivedSessions"] == 5
+    (segment,) = (await client.get("/api/archive")).json()
+    assert segment["month"] == "2023-11"
+    assert segment["sessionCount"] == 5
+
+    # Archiving changes no data, so cached lists stay valid
+    cached = await client.get("/api/sessions", headers={"if-none-match": etag})
+    assert cached.status_code == 304
+    hot = await client.get("/api/sessions")
+    assert [s["id"] for s in hot.json()] == ["recent"]
+    everything = await client.get("/api/sessions", params={"includeArchived": "true"})
+    assert [s["id"] for s in everything.json()] == ["recent"] + [f"old-{i}" for i in range(4, -1, -1)]
+    assert everything.json()[1] == _old_session(4)
+
+    page = await client.get("/api/sessions", params={"includeArchived": "true", "limit": 3})
+    assert [s["id"] for s in page.json()] == ["recent", "old-4", "old-3"]
+    rest = await client.get(
+        "/api/sessions",
+        params={"includeArchived": "true", "before": page.headers["x-next-cursor"]},
+    )
+    assert [s["id"] for s in rest.json()] == ["old-2", "old-1", "old-0"]
+
+
+@pytest.mark.asyncio
+async def test_rewriting_archived_session_moves_it_back(client):
+    await client.post("/api/sessions/batch", json=[_old_session(i) for i in range(3)])
+    await client.post("/api/archive/run", params={"olderThanDays": 30})
+    days = {"from": "2023-11-14", "to": "2023-11-15"}
+    before = (await client.get("/api/stats", params=days)).json()
+    assert before["focusCount"] == 3
+
+    await client.post("/api/sessions", json={**_old_session(0), "duration": 600})
+    after = (await client.get("/api/stats", params=days)).json()
+    assert after["focusCount"] == 3
+    assert after["focusSeconds"] == before["focusSeconds"] - 900
+    assert [s["id"] for s in (await client.get("/api/sessions")).json()] == ["old-0"]
+    assert (await client.get("/api/archive")).json()[0]["sessionCount"] == 2
+
+
+@pytest.mark.asyncio
+async def test_archived_session_rewritten_into_another_month_is_not_duplicated(client):
+    await client.post("/api/sessions/batch", json=[_old_session(i) for i in range(3)])
+    await client.post("/api/archive/run", params={"olderThanDays": 30})
+    moved = {**_old_session(0), "completedAt": 4102444800000}
+    await client.post("/api/sessions", json=moved)
+
+    everything = await client.get("/api/sessions", params={"includeArchived": "true"})
+    assert [s["id"] for s in everything.json()] == ["old-0", "old-2", "old-1"]
+    exported = _ndjson(await client.get("/api/export/sessions", params={"includeArchived": "true"}))
+    assert [s["id"] for s in exported] == ["old-1", "old-2", "old-0"]
+
+
+@pytest.mark.asyncio
+async def test_delete_all_sessions_clears_archive(client):
+    await client.post("/api/sessions/batch", json=[_old_session(i) for i in range(3)])
+    await client.post("/api/archive/run", params={"olderThanDays": 30})
+    await client.delete("/api/sessions")
+    assert (await client.get("/api/archive")).json() == []
+    assert (await client.get("/api/sessions", params={"includeArchived": "true"})).json() == []
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+
+def _ndjson(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_export_sessions_ndjson_with_time_range(client):
+    sessions = [_old_session(i) for i in range(5)]
+    await client.post("/api/sessions/batch", json=list(reversed(sessions)))
+
+    response = await client.get("/api/export/sessions")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert _ndjson(response) == sessions
+
+    window = {"from": sessions[1]["completedAt"], "to": sessions[3]["completedAt"]}
+    ranged = await client.get("/api/export/sessions", params=window)
+    assert _ndjson(ranged) == sessions[1:3]
+
+
+@pytest.mark.asyncio
+async def test_export_columns_format(client, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH", 2)
+    sessions = [_old_session(i) for i in range(3)]
+    await client.post("/api/sessions/batch", json=sessions)
+    batches = _ndjson(await client.get("/api/export/sessions", params={"format": "columns"}))
+    assert [len(b["id"]) for b in batches] == [2, 1]
+    assert batches[0]["completedAt"] == [s["completedAt"] for s in sessions[:2]]
+    assert set(batches[0]) == set(SESSION_PAYLOAD)
+    assert (await client.get("/api/export/sessions", params={"format": "csv"})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_includes_archived_on_request(client):
+    sessions = [_old_session(i) for i in range(3)]
+    recent = {**SESSION_PAYLOAD, "id": "recent", "completedAt": 4102444800000}
+    await client.post("/api/sessions/batch", json=[*sessions, recent])
+    await client.post("/api/archive/run", params={"olderThanDays": 30})
+
+    assert _ndjson(await client.get("/api/export/sessions")) == [recent]
+    everything = await client.get("/api/export/sessions", params={"includeArchived": "true"})
+    assert _ndjson(everything) == [*sessions, recent]
+    window = {"includeArchived": "true", "to": sessions[2]["completedAt"], "format": "columns"}
+    (batch,) = _ndjson(await client.get("/api/export/sessions", params=window))
+    assert batch["id"] == ["old-0", "old-1"]
+
+
+@pytest.mark.asyncio
+async def test_export_streams_before_its_read_session_closes(client, db_engine, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH", 1)
+    await client.post("/api/sessions/batch", json=[_old_session(i) for i in range(3)])
+    events = []
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+
+    async def tracked_read_session():
+        async with session_factory() as session:
+            yield session
+        events.append("closed")
+
+    sessions = routes_module.export.export_sessions
+
+    async def tracked_export(*args):
+        async for chunk in sessions(*args):
+            events.append("chunk")
+            yield chunk
+
+    app.dependency_overrides[get_read_session] = tracked_read_session
+    monkeypatch.setattr(routes_module.export, "export_sessions", tracked_export)
+    response = await client.get("/api/export/sessions", params={"format": "columns"})
+    assert len(_ndjson(response)) == 3
+    assert events == ["chunk", "chunk", "chunk", "closed"]
+
+
+@pytest.mark.asyncio
+async def test_export_tasks_gzip(client):
+    await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
+    later = {**TASK_PAYLOAD, "id": "task-002", "createdAt": TASK_PAYLOAD["createdAt"] + 1}
+    await client.post("/api/kanban/tasks", json=later)
+
+    response = await client.get("/api/export/tasks", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert _ndjson(response) == [TASK_PAYLOAD, later]  # httpx decodes gzip
+    plain = await client.get(
+        "/api/export/tasks",
+        params={"from": later["createdAt"]},
+        headers={"accept-encoding": "identity"},
+    )
+    assert "content-encoding" not in plain.headers
+    assert _ndjson(plain) == [later]
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+# 2023-11-14 in UTC
+STATS_DAY = "2023-11-14"
+
+
+async def _get_stats(client, **params):
+    response = await client.get(
+        "/api/stats", params={"from": STATS_DAY, "to": STATS_DAY, **params}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_stats_track_upserts(client):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post(
+        "/api/sessions",
+        json={**SESSION_PAYLOAD, "id": "break-1", "type": "short-break", "duration": 300},
+    )
+    data = await _get_stats(client)
+    assert data["focusCount"] == 1
+    assert data["focusSeconds"] == 1500
+    assert data["breakCount"] == 1
+    assert data["breakSeconds"] == 300
+    assert [d["day"] for d in data["days"]] == [STATS_DAY]
+
+
+@pytest.mark.asyncio
+async def test_stats_replacing_session_moves_totals(client):
+    """Re-posting a session with new values replaces, not adds to, its totals."""
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post(
+        "/api/sessions/batch",
+        json=[{**SESSION_PAYLOAD, "type": "long-break", "duration": 900}],
+    )
+    data = await _get_stats(client)
+    assert data["focusCount"] == 0
+    assert data["breakCount"] == 1
+    assert data["breakSeconds"] == 900
+
+
+@pytest.mark.asyncio
+async def test_stats_cleared_with_sessions(client):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.delete("/api/sessions")
+    data = await _get_stats(client)
+    assert data["focusCount"] == 0
+    assert data["days"] == []
+
+
+@pytest.mark.asyncio
+async def test_stats_rebuild_matches_incremental(client):
+    payload = [
+        {**SESSION_PAYLOAD, "id": f"s-{i}", "completedAt": 1700001500000 + i * 43_200_000}
+        for i in range(6)
+    ]
+    await client.post("/api/sessions/batch", json=payload)
+    params = {"from": "2023-11-01", "to": "2023-11-30"}
+    incremental = (await client.get("/api/stats", params=params)).json()
+    assert incremental["focusCount"] == 6
+    assert len(incremental["days"]) == 4
+
+    response = await client.post("/api/stats/rebuild")
+    assert response.status_code == 200
+    rebuilt = (await client.get("/api/stats", params=params)).json()
+    assert rebuilt == incremental
+
+
+@pytest.mark.asyncio
+async def test_stats_invalid_range(client):
+    response = await client.get("/api/stats", params={"from": "2024-01-02", "to": "2024-01-01"})
+    assert response.status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# Labels
+# ---------------------------------------------------------------------------
+
+
+def _labelled(i: int, label: str, type_: str = "focus") -> dict:
+    return {
+        **SESSION_PAYLOAD,
+        "id": f"l-{i}",
+        "type": type_,
+        "label": label,
+        "completedAt": 1700000000000 + i,
+    }
+
+
+LABELLED = [
+    _labelled(0, "Coding"),
+    _labelled(1, "Reading"),
+    _labelled(2, "Coding"),
+    _labelled(3, "coffee", "short-break"),
+    _labelled(4, ""),
+    _labelled(5, "Coding"),
+    _labelled(6, "Reading"),
+]
+
+
+async def _labels(client, **params) -> list[dict]:
+    response = await client.get("/api/labels", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_labels_track_upserts(client):
+    for session in LABELLED[:4]:
+        await client.post("/api/sessions", json=session)
+    await client.post("/api/sessions/batch", json=LABELLED[4:])
+
+    assert await _labels(client) == [
+        {"label": "Coding", "sessionCount": 3, "focusSeconds": 4500, "lastUsedAt": 1700000000005},
+        {"label": "Reading", "sessionCount": 2, "focusSeconds": 3000, "lastUsedAt": 1700000000006},
+        {"label": "coffee", "sessionCount": 1, "focusSeconds": 0, "lastUsedAt": 1700000000003},
+    ]
+    recent = await _labels(client, order="recent", limit=2)
+    assert [lb["label"] for lb in recent] == ["Reading", "Coding"]
+    # Prefix matching ignores case
+    assert [lb["label"] for lb in await _labels(client, prefix="co")] == ["Coding", "coffee"]
+    assert [lb["label"] for lb in await _labels(client, prefix="COF")] == ["coffee"]
+    assert await _labels(client, prefix="x") == []
+
+
+@pytest.mark.asyncio
+async def test_labels_follow_replaced_sessions(client):
+    await client.post("/api/sessions/batch", json=LABELLED)
+    # Re-posting is idempotent
+    await client.post("/api/sessions", json=LABELLED[5])
+    # Relabelling Coding's latest session moves it and rewinds its last use
+    await client.post("/api/sessions", json={**LABELLED[5], "label": "Reading"})
+    # A label loses its last session
+    await client.post("/api/sessions", json={**LABELLED[3], "label": "Tea"})
+
+    by_label = {lb["label"]: lb for lb in await _labels(client)}
+    assert set(by_label) == {"Coding", "Reading", "Tea"}
+    assert by_label["Coding"]["sessionCount"] == 2
+    assert by_label["Coding"]["lastUsedAt"] == 1700000000002
+    assert by_label["Reading"]["sessionCount"] == 3
+    assert by_label["Reading"]["focusSeconds"] == 4500
+
+    incremental = await _labels(client)
+    await client.post("/api/stats/rebuild")
+    assert await _labels(client) == incremental
+
+
+@pytest.mark.asyncio
+async def test_labels_cleared_with_sessions(client):
+    await client.post("/api/sessions/batch", json=LABELLED)
+    await client.delete("/api/sessions")
+    assert await _labels(client) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params, index",
+    [
+        ({"prefix": "co"}, "ix_session_label_stats_label_lower"),
+        ({}, "ix_session_label_stats_count"),
+        ({"order": "recent"}, "ix_session_label_stats_last_used_at"),
+    ],
+)
+async def test_labels_use_index(client, db_engine, params, index):
+    queries = []
+
+    def record(_conn, _cursor, statement, parameters, *_args):
+        if "FROM session_label_stats" in statement:
+            queries.append((statement, parameters))
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await _labels(client, **params)
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+    ((statement, parameters),) = queries
+    async with db_engine.connect() as conn:
+        rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plan = " ".join(str(r[-1]) for r in rows)
+    assert index in plan.split()
+    if not params.get("prefix"):
+        assert "TEMP B-TREE" not in plan
+
+
 # ---------------------------------------------------------------------------
 # Kanban tasks
 # ---------------------------------------------------------------------------
@@ -165,25 +767,13 @@ SYNC_CREDS = {
 }
 
 
-class _FakeDownload:
-    def __init__(self, data: bytes):
-        self._data = data
-
-    def readall(self) -> bytes:
-        return self._data
-
-
-class _FakeBlobClient:
-    def __init__(self):
-        self.uploaded_bytes: bytes | None = None
-        self.download_bytes: bytes = b"{}"
-
-    def upload_blob(self, data: bytes, overwrite: bool):
-        assert overwrite is True
-        self.uploaded_bytes = data
-
-    def download_blob(self):
-        return _FakeDownload(self.download_bytes)
+@pytest.fixture
+def fake_blob(tmp_path, monkeypatch):
+    """Route sync through a directory-backed stand-in for the Azure blob."""
+    root = tmp_path / "blobs"
+    blob = LocalBlobClient(root, "test-container", routes_module.SYNC_BLOB_NAME)
+    monkeypatch.setattr(settings, "sync_local_blob_dir", str(root))
+    return blob
 
 
 @pytest.mark.asyncio
@@ -237,16 +827,98 @@ async def test_delete_all_kanban_tasks(client):
     assert response.json() == []
 
 
+async def _create_tasks(client, count: int) -> list[str]:
+    ids = [f"task-{i:03d}" for i in range(count)]
+    for i, task_id in enumerate(ids):
+        task = {**TASK_PAYLOAD, "id": task_id, "createdAt": TASK_PAYLOAD["createdAt"] + i}
+        await client.post("/api/kanban/tasks", json=task)
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_patch_kanban_tasks_partial_updates(client):
+    first, second = await _create_tasks(client, 2)
+    await client.put(
+        f"/api/kanban/tasks/{second}",
+        json={**TASK_PAYLOAD, "id": second, "status": "done", "completedAt": 5},
+    )
+    response = await client.patch(
+        "/api/kanban/tasks",
+        json=[
+            {"id": second, "status": "todo", "completedAt": None},
+            {"id": first, "status": "in-progress", "pomodorosIncrement": 2},
+            {"id": first, "title": "Renamed", "pomodorosIncrement": 1},
+        ],
+    )
+    assert response.status_code == 200
+    patched = response.json()
+    assert [t["id"] for t in patched] == [second, first]
+    assert patched[0]["status"] == "todo"
+    assert patched[0]["completedAt"] is None
+    assert patched[1]["title"] == "Renamed"
+    assert patched[1]["status"] == "in-progress"
+    assert patched[1]["pomodorosCompleted"] == 3
+    assert (await client.get("/api/kanban/tasks")).json() == [patched[1], patched[0]]
+
+
+@pytest.mark.asyncio
+async def test_patch_kanban_tasks_increment_is_relative(client):
+    (task_id,) = await _create_tasks(client, 1)
+    await client.patch("/api/kanban/tasks", json=[{"id": task_id, "pomodorosCompleted": 4}])
+    for _ in range(2):
+        await client.patch(
+            "/api/kanban/tasks", json=[{"id": task_id, "pomodorosIncrement": 1}]
+        )
+    (task,) = (await client.get("/api/kanban/tasks")).json()
+    assert task["pomodorosCompleted"] == 6
+    assert task["title"] == TASK_PAYLOAD["title"]
+
+
+@pytest.mark.asyncio
+async def test_patch_kanban_tasks_groups_identical_updates(client, db_engine):
+    ids = await _create_tasks(client, 20)
+    statements = []
+
+    def record(_conn, _cursor, statement, *_args):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        moves = [{"id": task_id, "status": "done", "completedAt": 9} for task_id in ids]
+        moves.append({"id": ids[0], "status": "in-progress", "completedAt": None})
+        response = await client.patch("/api/kanban/tasks", json=moves)
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    # Bump the data version, then one UPDATE per distinct assignment
+    assert statements == ["INSERT", "UPDATE", "UPDATE"]
+    statuses = [t["status"] for t in (await client.get("/api/kanban/tasks")).json()]
+    assert statuses == ["in-progress"] + ["done"] * 19
+
+
+@pytest.mark.asyncio
+async def test_patch_kanban_tasks_missing_id_applies_nothing(client):
+    (task_id,) = await _create_tasks(client, 1)
+    etag = (await client.get("/api/kanban/tasks")).headers["etag"]
+    response = await client.patch(
+        "/api/kanban/tasks",
+        json=[{"id": task_id, "status": "done"}, {"id": "nope", "status": "done"}],
+    )
+    assert response.status_code == 404
+    assert "nope" in response.json()["detail"]
+    after = await client.get("/api/kanban/tasks")
+    assert after.headers["etag"] == etag
+    assert after.json()[0]["status"] == "todo"
+    assert (await client.patch("/api/kanban/tasks", json=[])).json() == []
+
+
 # ---------------------------------------------------------------------------
 # Sync
 # ---------------------------------------------------------------------------
 
 
 @pytest.mark.asyncio
-async def test_sync_push_uploads_expected_payload(client, monkeypatch):
-    fake_blob = _FakeBlobClient()
-    monkeypatch.setattr(routes_module, "_build_blob_client", lambda _creds: fake_blob)
-
+async def test_sync_push_uploads_expected_payload(client, fake_blob):
     await client.post("/api/sessions", json=SESSION_PAYLOAD)
     await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
 
@@ -257,18 +929,14 @@ async def test_sync_push_uploads_expected_payload(client, monkeypatch):
     assert data["exportedSessions"] == 1
     assert data["exportedTasks"] == 1
 
-    assert fake_blob.uploaded_bytes is not None
-    payload = json.loads(fake_blob.uploaded_bytes)
+    payload = _read_blob_json(_snapshot(fake_blob))
     assert payload["version"] == 1
     assert len(payload["sessions"]) == 1
     assert len(payload["tasks"]) == 1
 
 
 @pytest.mark.asyncio
-async def test_sync_pull_replaces_local_data(client, monkeypatch):
-    fake_blob = _FakeBlobClient()
-    monkeypatch.setattr(routes_module, "_build_blob_client", lambda _creds: fake_blob)
-
+async def test_sync_pull_replaces_local_data(client, fake_blob):
     await client.post("/api/sessions", json=SESSION_PAYLOAD)
     await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
 
@@ -296,7 +964,7 @@ async def test_sync_pull_replaces_local_data(client, monkeypatch):
             }
         ],
     }
-    fake_blob.download_bytes = json.dumps(replacement).encode("utf-8")
+    fake_blob.upload_blob(json.dumps(replacement).encode("utf-8"), overwrite=True)
 
     response = await client.post("/api/sync/pull", json=SYNC_CREDS)
     assert response.status_code == 200
@@ -308,12 +976,14 @@ async def test_sync_pull_replaces_local_data(client, monkeypatch):
     assert [s["id"] for s in sessions] == ["pulled-session"]
     assert [t["id"] for t in tasks] == ["pulled-task"]
 
+    data = await _get_stats(client)
+    assert data["focusCount"] == 1
+    assert data["focusSeconds"] == 1500
+    assert [lb["label"] for lb in (await client.get("/api/labels")).json()] == ["Pulled"]
 
-@pytest.mark.asyncio
-async def test_sync_pull_invalid_payload_does_not_modify_local_data(client, monkeypatch):
-    fake_blob = _FakeBlobClient()
-    monkeypatch.setattr(routes_module, "_build_blob_client", lambda _creds: fake_blob)
 
+@pytest.mark.asyncio
+async def test_sync_pull_invalid_payload_does_not_modify_local_data(client, fake_blob):
     await client.post("/api/sessions", json=SESSION_PAYLOAD)
     await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
 
@@ -322,7 +992,7 @@ async def test_sync_pull_invalid_payload_does_not_modify_local_data(client, monk
         "sessions": [{"id": "broken-session"}],
         "tasks": [],
     }
-    fake_blob.download_bytes = json.dumps(invalid_payload).encode("utf-8")
+    fake_blob.upload_blob(json.dumps(invalid_payload).encode("utf-8"), overwrite=True)
 
     response = await client.post("/api/sync/pull", json=SYNC_CREDS)
     assert response.status_code == 422
@@ -333,3 +1003,693 @@ async def test_sync_pull_invalid_payload_does_not_modify_local_data(client, monk
     assert sessions[0]["id"] == SESSION_PAYLOAD["id"]
     assert len(tasks) == 1
     assert tasks[0]["id"] == TASK_PAYLOAD["id"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["none", "gzip", "zstd"])
+async def test_sync_push_pull_round_trip(client, fake_blob, monkeypatch, compression):
+    """A multi-block push can be pulled back for every compression setting."""
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    monkeypatch.setattr(settings, "sync_compression", compression)
+    monkeypatch.setattr(settings, "sync_block_size", 1024)
+
+    sessions = [
+        {**SESSION_PAYLOAD, "id": f"s-{i}", "label": f"Label ünïcode {i}"}
+        for i in range(200)
+    ]
+    await client.post("/api/sessions/batch", json=sessions)
+    await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
+
+    response = await client.post("/api/sync/push", json=SYNC_CREDS)
+    assert response.status_code == 200
+    assert response.json()["exportedSessions"] == 200
+
+    await client.delete("/api/sessions")
+    await client.delete("/api/kanban/tasks")
+
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 200
+    assert response.json()["importedSessions"] == 200
+    assert response.json()["importedTasks"] == 1
+    pulled = (await client.get("/api/sessions")).json()
+    assert sorted(s["label"] for s in pulled) == sorted(s["label"] for s in sessions)
+
+
+@pytest.mark.asyncio
+async def test_sync_round_trip_with_async_transport(client, fake_blob, monkeypatch):
+    monkeypatch.setattr(settings, "sync_async_transport", True)
+    monkeypatch.setattr(settings, "sync_block_size", 1024)
+    sessions = [{**SESSION_PAYLOAD, "id": f"s-{i}"} for i in range(50)]
+    await client.post("/api/sessions/batch", json=sessions)
+
+    assert (await client.post("/api/sync/push", json=SYNC_CREDS)).status_code == 200
+    await client.delete("/api/sessions")
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 200
+    assert response.json()["importedSessions"] == 50
+
+
+@pytest.mark.asyncio
+async def test_sync_push_stages_bounded_blocks(db_engine, tmp_path):
+    """Push uploads staged blocks no larger than block size plus one piece."""
+    staged: list[int] = []
+
+    class RecordingClient(LocalBlobClient):
+        def stage_block(self, block_id, data, **kwargs):
+            staged.append(len(data))
+            return super().stage_block(block_id, data, **kwargs)
+
+    factory = async_sessionmaker(db_engine, expire_on_commit=False)
+    async with factory() as db:
+        await bulk.upsert_sessions(
+            db,
+            (
+                {
+                    "id": f"s-{i}",
+                    "type": "focus",
+                    "label": f"label-{i}",
+                    "started_at": i,
+                    "completed_at": i + 1,
+                    "duration": 1500,
+                }
+                for i in range(20_000)
+            ),
+        )
+        await db.commit()
+
+    blob = RecordingClient(tmp_path, "c", "b.json")
+    async with factory() as db:
+        counts = await sync.push_payload(
+            db, blob, "2026-01-01T00:00:00Z", compression="none", block_size=256 * 1024
+        )
+
+    assert counts.sessions == 20_000
+    assert counts.blocks == len(staged) > 1
+    assert max(staged) < 256 * 1024 + 128 * 1024
+    payload = json.loads(blob.download_blob().readall())
+    assert len(payload["sessions"]) == 20_000
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_accepts_any_key_order(client, fake_blob):
+    body = (
+        '{"tasks": [], "sessions": [%s], "version": 1}'
+        % json.dumps({**SESSION_PAYLOAD, "id": "late-version"})
+    )
+    fake_blob.upload_blob(body.encode(), overwrite=True)
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 200
+    sessions = (await client.get("/api/sessions")).json()
+    assert [s["id"] for s in sessions] == ["late-version"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"version": 2, "sessions": [], "tasks": []}',
+        b'{"sessions": [], "tasks": []}',
+        b'{"version": 1, "sessions": [',
+        b"not json",
+    ],
+)
+async def test_sync_pull_rejects_bad_document_without_changes(client, fake_blob, body):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    fake_blob.upload_blob(body, overwrite=True)
+
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 422
+    sessions = (await client.get("/api/sessions")).json()
+    assert [s["id"] for s in sessions] == [SESSION_PAYLOAD["id"]]
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_missing_blob_returns_502(client, fake_blob):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 502
+    assert len((await client.get("/api/sessions")).json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_large_payload_in_batches(client, fake_blob):
+    """More records than one bulk chunk are applied across several batches."""
+    sessions = [
+        {**SESSION_PAYLOAD, "id": f"s-{i}", "completedAt": 1700001500000 + i}
+        for i in range(bulk.BULK_CHUNK_SIZE * 2 + 5)
+    ]
+    body = json.dumps({"version": 1, "sessions": sessions, "tasks": []}).encode()
+    fake_blob.upload_blob(gzip.compress(body), overwrite=True)
+
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 200
+    assert response.json()["importedSessions"] == len(sessions)
+    data = await _get_stats(client)
+    assert data["focusCount"] == len(sessions)
+
+
+def _read_blob_json(blob: LocalBlobClient) -> dict:
+    return json.loads(gzip.decompress(blob.download_blob().readall()))
+
+
+def _manifest(fake_blob: LocalBlobClient) -> dict:
+    blob = LocalBlobClient(fake_blob.root, "test-container", sync.MANIFEST_BLOB_NAME)
+    return json.loads(blob.download_blob().readall())
+
+
+def _snapshot(fake_blob: LocalBlobClient) -> LocalBlobClient:
+    """The full snapshot the remote manifest currently lists."""
+    return LocalBlobClient(fake_blob.root, "test-container", _manifest(fake_blob)["base"])
+
+
+def _bump_remote(fake_blob: LocalBlobClient) -> None:
+    """Rewrite the manifest with a new generation, as another machine's push would."""
+    manifest = _manifest(fake_blob)
+    manifest["generation"] += 1
+    blob = LocalBlobClient(fake_blob.root, "test-container", sync.MANIFEST_BLOB_NAME)
+    blob.upload_blob(json.dumps(manifest).encode(), overwrite=True)
+
+
+@pytest.mark.asyncio
+async def test_sync_push_uploads_only_changes_after_first_push(client, fake_blob):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
+    first = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    assert first["mode"] == "full"
+
+    unchanged = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    assert unchanged["mode"] == "unchanged"
+    assert _manifest(fake_blob)["segments"] == []
+
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "new-session"})
+    await client.delete(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}")
+    delta = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    assert delta["mode"] == "delta"
+    assert delta["exportedSessions"] == 1
+    assert delta["exportedTasks"] == 0
+    assert delta["deletedTasks"] == 1
+
+    manifest = _manifest(fake_blob)
+    assert manifest["generation"] == 2
+    assert len(manifest["segments"]) == 1
+    segment = _read_blob_json(
+        LocalBlobClient(fake_blob.root, "test-container", manifest["segments"][0])
+    )
+    assert [s["id"] for s in segment["sessions"]] == ["new-session"]
+    assert segment["deletedTasks"] == [TASK_PAYLOAD["id"]]
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_applies_snapshot_then_segments(client, fake_blob):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "label": "Edited"})
+    await client.delete(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}")
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "s-2"})
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    expected = (await client.get("/api/sessions")).json()
+
+    # Diverge locally, then pull the remote state back
+    await client.delete("/api/sessions")
+    await client.post("/api/kanban/tasks", json={**TASK_PAYLOAD, "id": "local-only"})
+    response = await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert response.status_code == 200
+    assert response.json()["importedSessions"] == 2
+    assert response.json()["importedTasks"] == 0
+
+    assert (await client.get("/api/sessions")).json() == expected
+    assert (await client.get("/api/kanban/tasks")).json() == []
+
+    # Freshly pulled data is not pushed back
+    again = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    assert again["mode"] == "unchanged"
+
+
+@pytest.mark.asyncio
+async def test_sync_push_compacts_segments(client, fake_blob, monkeypatch):
+    monkeypatch.setattr(settings, "sync_compact_segments", 2)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    for i in range(2):
+        await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": f"s-{i}"})
+        assert (await client.post("/api/sync/push", json=SYNC_CREDS)).json()["mode"] == "delta"
+    base, segments = _manifest(fake_blob)["base"], _manifest(fake_blob)["segments"]
+    assert len(segments) == 2
+
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "s-3"})
+    result = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    assert result["mode"] == "full"
+    assert result["exportedSessions"] == 3
+    assert _manifest(fake_blob)["segments"] == []
+    for name in [base, *segments]:
+        assert not LocalBlobClient(fake_blob.root, "test-container", name).exists()
+
+
+@pytest.mark.asyncio
+async def test_full_push_includes_archived_sessions(client, fake_blob):
+    await client.post("/api/sessions/batch", json=[_old_session(i) for i in range(3)])
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "completedAt": 4102444800000})
+    await client.post("/api/archive/run", params={"olderThanDays": 30})
+
+    result = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    assert result["exportedSessions"] == 4
+    assert len(_read_blob_json(_snapshot(fake_blob))["sessions"]) == 4
+
+    _bump_remote(fake_blob)
+    await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert (await client.get("/api/archive")).json() == []
+    assert len((await client.get("/api/sessions")).json()) == 4
+
+
+@pytest.fixture
+def blob_requests(monkeypatch):
+    """Names of the blob client calls made, in order."""
+    calls: list[str] = []
+    for name in (
+        "get_blob_properties",
+        "download_blob",
+        "upload_blob",
+        "stage_block",
+        "commit_block_list",
+        "delete_blob",
+    ):
+        method = getattr(LocalBlobClient, name)
+
+        def record(self, *args, _name=name, _method=method, **kwargs):
+            calls.append(_name)
+            return _method(self, *args, **kwargs)
+
+        monkeypatch.setattr(LocalBlobClient, name, record)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_sync_noop_push_and_pull_cost_one_head_request(
+    client, fake_blob, blob_requests
+):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    blob_requests.clear()
+
+    push = (await client.post("/api/sync/push", json=SYNC_CREDS)).json()
+    pull = (await client.post("/api/sync/pull", json=SYNC_CREDS)).json()
+    assert push["mode"] == pull["mode"] == "unchanged"
+    assert blob_requests == ["get_blob_properties", "get_blob_properties"]
+    assert len((await client.get("/api/sessions")).json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_downloads_after_remote_or_local_changes(client, fake_blob):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+
+    _bump_remote(fake_blob)
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).json()["mode"] == "full"
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).json()["mode"] == "unchanged"
+
+    # Local writes are replaced by the remote data even if the remote is as before
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "local-only"})
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).json()["mode"] == "full"
+    assert [s["id"] for s in (await client.get("/api/sessions")).json()] == [
+        SESSION_PAYLOAD["id"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_downloads_before_taking_the_write_lock(
+    client, fake_blob, blob_requests, monkeypatch
+):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "s-2"})
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    await client.delete("/api/sessions")
+    next_seq = changes.next_seq
+
+    async def record_write(db):
+        blob_requests.append("write")
+        return await next_seq(db)
+
+    monkeypatch.setattr(changes, "next_seq", record_write)
+    blob_requests.clear()
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).json()["importedSessions"] == 2
+    assert blob_requests.count("download_blob") == 3  # manifest, snapshot, segment
+    assert blob_requests[-1] == "write"
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_ignores_rewrite_with_same_content(client, fake_blob, blob_requests):
+    """A manifest rewritten unchanged moves its ETag but matches the stored digest."""
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    manifest = LocalBlobClient(fake_blob.root, "test-container", sync.MANIFEST_BLOB_NAME)
+    manifest.upload_blob(manifest.download_blob().readall(), overwrite=True)
+    blob_requests.clear()
+
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).json()["mode"] == "unchanged"
+    assert blob_requests == ["get_blob_properties", "download_blob"]
+    await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert blob_requests[2:] == ["get_blob_properties"]
+
+
+@pytest.mark.asyncio
+async def test_sync_push_detects_concurrent_writer(client, fake_blob, monkeypatch):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "second"})
+    write_manifest = sync.write_manifest
+
+    async def another_machine_writes_first(client_, manifest, **kwargs):
+        _bump_remote(fake_blob)
+        return await write_manifest(client_, manifest, **kwargs)
+
+    monkeypatch.setattr(sync, "write_manifest", another_machine_writes_first)
+    response = await client.post("/api/sync/push", json=SYNC_CREDS)
+    assert response.status_code == 409
+    # The segment written for the rejected manifest is removed again
+    assert _manifest(fake_blob)["segments"] == []
+    assert not list((fake_blob.root / "test-container").glob("*.segment-*"))
+
+    monkeypatch.setattr(sync, "write_manifest", write_manifest)
+    response = await client.post("/api/sync/push", json=SYNC_CREDS)
+    assert response.status_code == 200
+    assert response.json()["mode"] == "delta"
+
+
+@pytest.mark.asyncio
+async def test_sync_full_push_losing_a_race_leaves_the_remote_alone(
+    client, fake_blob, monkeypatch
+):
+    """Two machines compact at once: the loser's snapshot never replaces the winner's."""
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    monkeypatch.setattr(settings, "sync_compact_segments", 0)  # every push is full
+    await client.delete("/api/sessions")
+
+    other_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with other_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    other_sessions = async_sessionmaker(other_engine, expire_on_commit=False)
+
+    async def other_machine():
+        async with other_sessions() as session:
+            yield session
+
+    ours = dict(app.dependency_overrides)
+    write_manifest = sync.write_manifest
+
+    async def other_machine_pushes_first(client_, manifest, **kwargs):
+        monkeypatch.setattr(sync, "write_manifest", write_manifest)
+        app.dependency_overrides.update(
+            {get_session: other_machine, get_read_session: other_machine}
+        )
+        await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "other"})
+        assert (await client.post("/api/sync/push", json=SYNC_CREDS)).json()["mode"] == "full"
+        app.dependency_overrides.update(ours)
+        return await write_manifest(client_, manifest, **kwargs)
+
+    monkeypatch.setattr(sync, "write_manifest", other_machine_pushes_first)
+    assert (await client.post("/api/sync/push", json=SYNC_CREDS)).status_code == 409
+    await other_engine.dispose()
+
+    manifest = _manifest(fake_blob)
+    assert [s["id"] for s in _read_blob_json(_snapshot(fake_blob))["sessions"]] == ["other"]
+    snapshots = list((fake_blob.root / "test-container").glob("*.snapshot-*"))
+    assert [path.name for path in snapshots] == [manifest["base"]]
+
+    await client.post("/api/sync/pull", json=SYNC_CREDS)
+    assert [s["id"] for s in (await client.get("/api/sessions")).json()] == ["other"]
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+
+async def _search(client, q: str, **params) -> list[tuple[str, str]]:
+    response = await client.get("/api/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return [(hit["kind"], (hit.get("session") or hit.get("task"))["id"]) for hit in response.json()]
+
+
+async def _seed_search(client) -> None:
+    sessions = [
+        {**SESSION_PAYLOAD, "id": "s-review", "label": "Code review"},
+        {**SESSION_PAYLOAD, "id": "s-emigre", "label": "Émigré essay"},
+        {**SESSION_PAYLOAD, "id": "s-long", "label": "Review of the quarterly planning notes"},
+    ]
+    await client.post("/api/sessions/batch", json=sessions)
+    for task_id, title in [("t-review", "Review PR"), ("t-docs", "Write docs")]:
+        await client.post("/api/kanban/tasks", json={**TASK_PAYLOAD, "id": task_id, "title": title})
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_sessions_and_tasks(client):
+    await _seed_search(client)
+
+    hits = await _search(client, "review")
+    assert set(hits) == {("session", "s-review"), ("task", "t-review"), ("session", "s-long")}
+    # Shorter texts rank above longer ones with the same match
+    assert hits[-1] == ("session", "s-long")
+
+    response = await client.get("/api/search", params={"q": "docs"})
+    (hit,) = response.json()
+    assert hit["kind"] == "task"
+    assert hit["task"]["title"] == "Write docs"
+    assert "session" not in hit
+
+    # Prefixes, case and accents
+    assert await _search(client, "REV cod") == [("session", "s-review")]
+    assert await _search(client, "emigre") == [("session", "s-emigre")]
+    assert await _search(client, "review", kind="task") == [("task", "t-review")]
+
+
+@pytest.mark.asyncio
+async def test_search_paginates(client):
+    await _seed_search(client)
+    first = await client.get("/api/search", params={"q": "review", "limit": 2})
+    assert first.headers["x-next-cursor"] == "2"
+    rest = await _search(client, "review", limit=2, cursor=2)
+    pages = [*(await _search(client, "review", limit=2)), *rest]
+    assert pages == await _search(client, "review")
+    assert len(rest) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("q", ['"', "review AND (", "NEAR(a b)", "*", "label:x"])
+async def test_search_ignores_query_syntax(client, q):
+    await _seed_search(client)
+    response = await client.get("/api/search", params={"q": q})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_search_follows_writes(client, fake_blob):
+    await _seed_search(client)
+
+    await client.post("/api/sessions", json={**SESSION_PAYLOAD, "id": "s-review", "label": "Lunch"})
+    await client.put("/api/kanban/tasks/t-review", json={**TASK_PAYLOAD, "id": "t-review", "title": "Lunch order"})
+    assert await _search(client, "review") == [("session", "s-long")]
+    assert set(await _search(client, "lunch")) == {("session", "s-review"), ("task", "t-review")}
+
+    await client.patch("/api/kanban/tasks", json=[{"id": "t-docs", "title": "Lunch menu"}])
+    await client.delete("/api/kanban/tasks/t-review")
+    await client.delete("/api/sessions")
+    assert await _search(client, "lunch") == [("task", "t-docs")]
+
+    snapshot = {
+        "version": 1,
+        "exportedAt": "2026-01-01T00:00:00Z",
+        "sessions": [{**SESSION_PAYLOAD, "id": "pulled", "label": "Pulled lunch"}],
+        "tasks": [],
+    }
+    fake_blob.upload_blob(json.dumps(snapshot).encode(), overwrite=True)
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).status_code == 200
+    assert await _search(client, "lunch") == [("session", "pulled")]
+
+
+@pytest.mark.asyncio
+async def test_delete_all_rebuilds_only_its_own_search_index(client, db_engine):
+    await _seed_search(client)
+    statements: list[str] = []
+    event.listen(
+        db_engine.sync_engine,
+        "before_cursor_execute",
+        lambda _conn, _cursor, statement, *_args: statements.append(statement),
+    )
+
+    await client.delete("/api/kanban/tasks")
+    rebuilt = [s for s in statements if "'rebuild'" in s]
+    assert rebuilt == ["INSERT INTO kanban_tasks_fts(kanban_tasks_fts) VALUES ('rebuild')"]
+    assert set(await _search(client, "review")) == {("session", "s-review"), ("session", "s-long")}
+
+    statements.clear()
+    await client.delete("/api/sessions")
+    assert [s for s in statements if "'rebuild'" in s] == [
+        "INSERT INTO sessions_fts(sessions_fts) VALUES ('rebuild')"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_skips_archived_sessions(client):
+    await client.post("/api/sessions/batch", json=[_old_session(0)])
+    assert await _search(client, "coding") == [("session", "old-0")]
+    await client.post("/api/archive/run", params={"olderThanDays": 1})
+    assert await _search(client, "coding") == []
+    # Writing it again brings it back
+    await client.post("/api/sessions", json=_old_session(0))
+    assert await _search(client, "coding") == [("session", "old-0")]
+
+
+# ---------------------------------------------------------------------------
+# Change feed
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def changes_feed(monkeypatch):
+    """A fresh feed with one subscriber; returns a function draining it."""
+    fresh = ChangeFeed()
+    monkeypatch.setattr(routes_module, "feed", fresh)
+    subscription = fresh.subscribe()
+
+    def drain():
+        events = []
+        while not subscription.queue.empty():
+            event = subscription.queue.get_nowait()
+            events.append((event.type, event.data))
+        return events
+
+    return drain
+
+
+@pytest.mark.asyncio
+async def test_session_writes_publish_changes(client, changes_feed):
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    later = {**SESSION_PAYLOAD, "label": "Later"}
+    await client.post("/api/sessions/batch", json=[SESSION_PAYLOAD, later])
+    await client.delete("/api/sessions")
+    assert changes_feed() == [
+        ("session.upserted", {"session": SESSION_PAYLOAD}),
+        ("sessions.upserted", {"sessions": [later]}),
+        ("sessions.cleared", {}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_session_upserts_commit_together(client, db_engine, changes_feed):
+    commits = []
+    event.listen(db_engine.sync_engine, "commit", lambda _conn: commits.append(1))
+    payloads = [
+        {**SESSION_PAYLOAD, "id": f"burst-{i}", "completedAt": 1700000000000 + i}
+        for i in range(20)
+    ]
+    responses = await asyncio.gather(
+        *(client.post("/api/sessions", json=payload) for payload in payloads)
+    )
+    assert [r.json() for r in responses] == [{"ok": True}] * 20
+    assert len(commits) < 5
+
+    sessions = (await client.get("/api/sessions")).json()
+    assert sorted(s["id"] for s in sessions) == sorted(p["id"] for p in payloads)
+    published = [item for _type, data in changes_feed() for item in data["sessions"]]
+    assert sorted(s["id"] for s in published) == sorted(p["id"] for p in payloads)
+    # Derived tables see every write of the batch
+    labels = (await client.get("/api/labels")).json()
+    assert [(item["label"], item["sessionCount"]) for item in labels] == [("Coding", 20)]
+
+
+@pytest.mark.asyncio
+async def test_task_writes_publish_changes(client, changes_feed):
+    created = (await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)).json()
+    moved = {**TASK_PAYLOAD, "status": "done", "completedAt": 1700003600000}
+    updated = (await client.put(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}", json=moved)).json()
+    await client.delete(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}")
+    await client.delete("/api/kanban/tasks")
+    assert changes_feed() == [
+        ("task.upserted", {"task": created}),
+        ("task.upserted", {"task": updated}),
+        ("task.deleted", {"id": TASK_PAYLOAD["id"]}),
+        ("tasks.cleared", {}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_event_ids_match_list_etags(client, changes_feed):
+    """Resuming from a list ETag picks up exactly the later writes."""
+    routes_module.feed.start(0)
+    etag = (await client.get("/api/sessions")).headers["etag"]
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    after = routes_module.feed.subscribe(since=int(etag.strip('"')))
+    event = after.queue.get_nowait()
+    assert f'"{event.seq}"' == (await client.get("/api/sessions")).headers["etag"]
+    assert after.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_large_batch_and_pull_publish_replace(
+    client, changes_feed, fake_blob, monkeypatch
+):
+    monkeypatch.setattr(routes_module, "MAX_EVENT_ITEMS", 1)
+    batch = [SESSION_PAYLOAD, {**SESSION_PAYLOAD, "id": "test-session-2"}]
+    await client.post("/api/sessions/batch", json=batch)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    _bump_remote(fake_blob)
+    assert (await client.post("/api/sync/pull", json=SYNC_CREDS)).status_code == 200
+    assert [type_ for type_, _ in changes_feed()] == ["replace", "replace"]
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.asyncio
+async def test_metrics_per_route_requests_and_latency(client):
+    metrics.reset()
+    await client.get("/api/health")
+    await client.post("/api/kanban/tasks", json=TASK_PAYLOAD)
+    await client.put(f"/api/kanban/tasks/{TASK_PAYLOAD['id']}", json=TASK_PAYLOAD)
+    await client.put("/api/kanban/tasks/missing", json=TASK_PAYLOAD)
+
+    response = await client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'pomotrack_http_requests_total{method="GET",route="/api/health",status="200"} 1' in text
+    route = "/api/kanban/tasks/{task_id}"
+    assert f'pomotrack_http_requests_total{{method="PUT",route="{route}",status="200"}} 1' in text
+    assert f'pomotrack_http_requests_total{{method="PUT",route="{route}",status="404"}} 1' in text
+    assert f'pomotrack_http_request_duration_seconds_count{{method="PUT",route="{route}"}} 2' in text
+    # The metrics request itself is still in flight while rendering
+    assert 'pomotrack_http_requests_in_flight{method="GET"} 1' in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_sync_bytes_and_durations(client, fake_blob):
+    metrics.reset()
+    await client.post("/api/sessions", json=SESSION_PAYLOAD)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    _bump_remote(fake_blob)
+    await client.post("/api/sync/pull", json=SYNC_CREDS)
+
+    pushed = metrics.SYNC_BYTES.values
+    assert pushed[("push", "compressed")] == len(_snapshot(fake_blob).download_blob().readall())
+    assert pushed[("pull", "compressed")] >= pushed[("push", "compressed")]
+    assert pushed[("pull", "uncompressed")] >= pushed[("push", "uncompressed")] > 0
+    text = (await client.get("/api/metrics")).text
+    assert 'pomotrack_sync_duration_seconds_count{direction="push",outcome="ok"} 1' in text
+    assert 'pomotrack_sync_duration_seconds_count{direction="pull",outcome="ok"} 1' in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_disabled(client, fake_blob, monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    await client.post("/api/sync/push", json=SYNC_CREDS)
+    assert (await client.get("/api/metrics")).status_code == 404
+    assert metrics.SYNC_DURATION.values == {}
+    assert metrics.SYNC_BYTES.values == {}
@@ -0,0 +1,165 @@
+"""Tests for monthly session archive segments."""
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app import archive, bulk, changes, stats
+from app.models import SessionArchive, SessionArchiveId, SessionDailyStat, SessionRecord
+
+
+def ms(year: int, month: int, day: int) -> int:
+    return int(datetime(year, month, day, 12, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def session(id_: str, completed_at: int, duration: int = 1500) -> dict:
+    return {
+        "id": id_,
+        "type": "focus",
+        "label": "Coding",
+        "started_at": completed_at - duration * 1000,
+        "completed_at": completed_at,
+        "duration": duration,
+        "seq": 1,
+    }
+
+
+ROWS = [
+    session("jan-1", ms(2025, 1, 5)),
+    session("jan-2", ms(2025, 1, 31)),
+    session("feb-1", ms(2025, 2, 10)),
+    session("mar-1", ms(2025, 3, 1)),
+    session("apr-1", ms(2025, 4, 20)),
+]
+
+
+@pytest.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'archive.db'}")
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session_:
+        await bulk.upsert_sessions(session_, ROWS)
+        await stats.rebuild_daily_stats(session_)
+        await session_.commit()
+        yield session_
+    await engine.dispose()
+
+
+async def hot_ids(db) -> list[str]:
+    return list(await db.scalars(select(SessionRecord.id).order_by(SessionRecord.id)))
+
+
+async def rollup(db) -> list[tuple]:
+    result = await db.execute(
+        select(SessionDailyStat.day, SessionDailyStat.session_count).order_by(
+            SessionDailyStat.day
+        )
+    )
+    return result.all()
+
+
+def test_payload_round_trip():
+    rows = [["a", "focus", "Émigré ✓", 1, 2, 3]]
+    assert archive.decode_rows(archive.encode_rows(rows)) == rows
+    assert archive.month_of(ms(2024, 12, 31)) == "2024-12"
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_sessions_into_monthly_segments(db):
+    before_rollup = await rollup(db)
+    assert await archive.archive_sessions(db, ms(2025, 3, 1)) == 3
+    await db.commit()
+
+    assert await hot_ids(db) == ["apr-1", "mar-1"]
+    segments = (await db.execute(select(SessionArchive).order_by(SessionArchive.month))).scalars().all()
+    assert [(s.month, s.session_count) for s in segments] == [("2025-01", 2), ("2025-02", 1)]
+    assert segments[0].first_completed_at == ms(2025, 1, 5)
+    assert segments[0].last_completed_at == ms(2025, 1, 31)
+    assert [r[0] for r in archive.decode_rows(segments[0].payload)] == ["jan-1", "jan-2"]
+    # Stats still count archived sessions, including after a rebuild
+    assert await rollup(db) == before_rollup
+    await stats.rebuild_daily_stats(db)
+    assert await rollup(db) == before_rollup
+
+
+@pytest.mark.asyncio
+async def test_archive_appends_to_existing_segment(db):
+    await archive.archive_sessions(db, ms(2025, 1, 10))
+    await archive.archive_sessions(db, ms(2025, 2, 1))
+    count = await db.scalar(
+        select(SessionArchive.session_count).where(SessionArchive.month == "2025-01")
+    )
+    assert count == 2
+    assert await archive.archive_sessions(db, ms(2025, 2, 1)) == 0
+
+
+@pytest.mark.asyncio
+async def test_list_rows_pages_newest_first(db):
+    await archive.archive_sessions(db, ms(2025, 4, 1))
+    ids = lambda rows: [r[0] for r in rows]  # noqa: E731
+    assert ids(await archive.list_rows(db)) == ["mar-1", "feb-1", "jan-2", "jan-1"]
+    assert ids(await archive.list_rows(db, limit=2)) == ["mar-1", "feb-1"]
+    assert ids(await archive.list_rows(db, (ms(2025, 2, 10), "feb-1"), 2)) == ["jan-2", "jan-1"]
+    assert ids(await archive.list_rows(db, (ms(2025, 1, 31), None))) == ["jan-1"]
+
+
+@pytest.mark.asyncio
+async def test_unarchive_returns_replaced_rows(db):
+    await archive.archive_sessions(db, ms(2025, 3, 1))
+    rewritten = {**ROWS[0], "duration": 600}
+    removed = await archive.unarchive_sessions(db, [rewritten, session("new", ms(2025, 1, 6))])
+    assert [r["id"] for r in removed] == ["jan-1"]
+    assert removed[0]["duration"] == 1500
+    assert await archive.archived_ids(db) == ["jan-2", "feb-1"]
+
+    # The last session of a month takes its segment with it
+    await archive.unarchive_sessions(db, [ROWS[2]])
+    months = list(await db.scalars(select(SessionArchive.month)))
+    assert months == ["2025-01"]
+
+
+@pytest.mark.asyncio
+async def test_unarchive_finds_sessions_moved_to_another_month(db):
+    await archive.archive_sessions(db, ms(2025, 3, 1))
+    moved = {**ROWS[0], "completed_at": ms(2025, 2, 20)}
+    removed = await archive.unarchive_sessions(db, [moved])
+    assert [r["id"] for r in removed] == ["jan-1"]
+    assert await archive.archived_ids(db) == ["jan-2", "feb-1"]
+    index = await db.execute(select(SessionArchiveId.id, SessionArchiveId.month))
+    assert sorted(index.all()) == [("feb-1", "2025-02"), ("jan-2", "2025-01")]
+
+
+@pytest.mark.asyncio
+async def test_run_leaves_version_and_vacuums(db):
+    now = ms(2025, 4, 21)
+    many = [session(f"old-{i}", ms(2025, 1, 2) + i) for i in range(2000)]
+    await bulk.upsert_sessions(db, many)
+    await db.commit()
+
+    result = await archive.run(db, older_than_days=30, now=now)
+    assert result.archived == len(many) + 4
+    assert await changes.current_seq(db) == 0
+    assert result.vacuumed_pages > 0
+    assert await db.scalar(text("PRAGMA freelist_count")) == 0
+    assert await db.scalar(select(func.count()).select_from(SessionRecord)) == 1
+
+    again = await archive.run(db, older_than_days=30, now=now)
+    assert again.archived == 0
+
+
+@pytest.mark.asyncio
+async def test_list_rows_filters(db):
+    await archive.archive_sessions(db, ms(2025, 4, 1))
+    ids = lambda rows: [r[0] for r in rows]  # noqa: E731
+    assert ids(await archive.list_rows(db, start=ms(2025, 1, 31), end=ms(2025, 3, 1))) == [
+        "feb-1",
+        "jan-2",
+    ]
+    assert ids(await archive.list_rows(db, type_="focus", label="Coding", limit=1)) == ["mar-1"]
+    assert await archive.list_rows(db, label="Reading") == []
+    assert await archive.list_rows(db, type_="long-break") == []
@@ -0,0 +1,116 @@
+"""Tests for the cached, pooled blob clients used by sync."""
+
+import pytest
+
+from app import blobclients, sync
+from app.blobclients import ClientCache
+from app.config import settings
+from app.localblob import AsyncLocalBlobClient, LocalBlobClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+async def fresh_cache():
+    await blobclients.close()
+    yield
+    await blobclients.close()
+
+
+@pytest.fixture
+def local_blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "sync_local_blob_dir", str(tmp_path))
+    return tmp_path
+
+
+def _root_transport(client):
+    transport = client._pipeline._transport
+    while hasattr(transport, "_transport"):  # per-client wrappers
+        transport = transport._transport
+    return transport
+
+
+def test_cache_returns_the_same_client_until_evicted():
+    cache = ClientCache(max_entries=2, ttl_seconds=60, clock=FakeClock())
+    built = []
+
+    def build(key):
+        return lambda: built.append(key) or object()
+
+    a = cache.get("a", build("a"))
+    b = cache.get("b", build("b"))
+    assert cache.get("a", build("a")) is a  # hit; "a" is now the newest
+    cache.get("c", build("c"))  # evicts "b", the least recently used
+    assert cache.get("a", build("a")) is a
+    assert cache.get("b", build("b")) is not b
+    assert built == ["a", "b", "c", "b"]
+    assert len(cache) == 2
+
+
+def test_cache_rebuilds_entries_older_than_ttl():
+    clock = FakeClock()
+    cache = ClientCache(max_entries=4, ttl_seconds=60, clock=clock)
+    first = cache.get("a", object)
+    clock.now = 59
+    assert cache.get("a", object) is first
+    clock.now = 61
+    assert cache.get("a", object) is not first
+
+
+def test_container_clients_are_keyed_by_credentials(local_blobs):
+    first = blobclients.container_client("acct", "box", "key-1")
+    assert blobclients.container_client("acct", "box", "key-1") is first
+    assert blobclients.container_client("acct", "box", "key-2") is not first
+    assert blobclients.container_client("acct", "other", "key-1") is not first
+
+
+def test_blob_clients_follow_the_transport_setting(local_blobs, monkeypatch):
+    assert isinstance(blobclients.blob_client("a", "box", "k", "x.json"), LocalBlobClient)
+    monkeypatch.setattr(settings, "sync_async_transport", True)
+    assert isinstance(blobclients.blob_client("a", "box", "k", "x.json"), AsyncLocalBlobClient)
+
+
+def test_azure_clients_share_one_connection_pool():
+    """Blob clients of every cached remote send through one HTTP session."""
+    first = blobclients.blob_client("acct", "box", "a2V5", "pomotrack-sync.json")
+    other = blobclients.blob_client("other", "box", "a2V5", "pomotrack-sync.json")
+    assert _root_transport(first).session is _root_transport(other).session
+    assert blobclients.container_client("acct", "box", "a2V5") is blobclients.container_client(
+        "acct", "box", "a2V5"
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_client_transfers_without_threads(tmp_path, monkeypatch):
+    """With an async client, upload and download never hand work to a thread."""
+    threads = []
+
+    async def no_threads(func, *args, **kwargs):
+        threads.append(func)
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(sync.asyncio, "to_thread", no_threads)
+    blob = AsyncLocalBlobClient(tmp_path, "box", "doc.json")
+    counts = sync.StreamStats()
+
+    async def chunks():
+        yield b'{"version": 1, "sessions": ['
+        yield b'{"id": "s-1"}]}'
+
+    compressed = sync.compress_stream(chunks(), sync.make_compressor("gzip"), counts)
+    await sync.upload_blocks(blob, compressed, 8, counts)
+    items = [item async for item in sync.iter_pull_items(blob)]
+    manifest_blob = AsyncLocalBlobClient(tmp_path, "box", "manifest.json")
+    await sync.write_manifest(manifest_blob, sync.SyncManifest(1, "doc.json"), if_match=None)
+    assert (await sync.read_manifest(manifest_blob)).generation == 1
+    await sync.delete_blob_quietly(blob)
+
+    assert items == [("version", 1, False), ("sessions", {"id": "s-1"}, True)]
+    assert threads == []
+    assert not await blob.exists()
@@ -0,0 +1,178 @@
+"""Tests for the group-commit write coalescer."""
+
+import asyncio
+
+import pytest
+
+from app.coalescer import WriteCoalescer
+
+
+class FakeSession:
+    def __init__(self, name: str):
+        self.name = name
+        self.rollbacks = 0
+
+    async def rollback(self) -> None:
+        self.rollbacks += 1
+
+
+class Recorder:
+    """A flush that records each batch and which caller's session wrote it."""
+
+    def __init__(self, delay: float = 0.0, fail: int = 0):
+        self.batches: list[list[int]] = []
+        self.sessions: list[str] = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, db: FakeSession, items: list[int]) -> None:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("disk full")
+        self.batches.append(items)
+        self.sessions.append(db.name)
+
+
+async def _submit_all(coalescer, items, spacing: float = 0.0):
+    async def one(i):
+        await asyncio.sleep(spacing * i)
+        await coalescer.submit(FakeSession(f"db-{i}"), i)
+        return i
+
+    return await asyncio.gather(*(one(i) for i in items), return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_flush():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=0.05, max_batch=100)
+    assert await _submit_all(coalescer, range(10)) == list(range(10))
+    assert flush.batches == [list(range(10))]
+    assert flush.sessions == ["db-0"]  # the first caller flushed for everyone
+
+
+@pytest.mark.asyncio
+async def test_lone_write_does_not_wait_for_the_window():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=10, max_batch=100)
+    for i in range(3):
+        await asyncio.wait_for(coalescer.submit(FakeSession(f"db-{i}"), i), timeout=1)
+    assert flush.batches == [[0], [1], [2]]
+
+
+@pytest.mark.asyncio
+async def test_callers_return_only_after_their_batch_is_flushed():
+    flush = Recorder(delay=0.01)
+    coalescer = WriteCoalescer(flush, window_seconds=0, max_batch=100)
+    done = []
+
+    async def one(i):
+        await coalescer.submit(FakeSession(f"db-{i}"), i)
+        done.append((i, sum(len(b) for b in flush.batches)))
+
+    await asyncio.gather(*(one(i) for i in range(5)))
+    assert all(flushed > i for i, flushed in done)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_the_window():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=10, max_batch=4)
+    await asyncio.wait_for(_submit_all(coalescer, range(8)), timeout=1)
+    assert flush.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    # The first leader handed the second batch to the oldest waiting caller
+    assert flush.sessions == ["db-0", "db-4"]
+
+
+@pytest.mark.asyncio
+async def test_writes_arriving_during_a_flush_form_the_next_batch():
+    flush = Recorder(delay=0.02)
+    coalescer = WriteCoalescer(flush, window_seconds=0, max_batch=100)
+    await _submit_all(coalescer, range(6), spacing=0.005)
+    assert flush.batches[0] == [0]
+    assert sorted(i for batch in flush.batches for i in batch) == list(range(6))
+    assert len(flush.batches) < 6
+
+
+@pytest.mark.asyncio
+async def test_batch_size_one_writes_one_at_a_time():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=0, max_batch=1)
+    await _submit_all(coalescer, range(3))
+    assert flush.batches == [[0], [1], [2]]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_fails_every_caller_in_the_batch():
+    flush = Recorder(fail=1)
+    coalescer = WriteCoalescer(flush, window_seconds=0.01, max_batch=100)
+    db = FakeSession("leader")
+
+    results = await asyncio.gather(
+        coalescer.submit(db, 0),
+        coalescer.submit(FakeSession("other"), 1),
+        return_exceptions=True,
+    )
+    assert [str(r) for r in results] == ["disk full", "disk full"]
+    assert db.rollbacks == 1
+
+    await coalescer.submit(db, 2)
+    assert flush.batches == [[2]]
+
+
+@pytest.mark.asyncio
+async def test_write_of_a_caller_that_gave_up_is_still_flushed():
+    flush = Recorder(delay=0.02)
+    coalescer = WriteCoalescer(flush, window_seconds=0, max_batch=1)
+    leader = asyncio.create_task(coalescer.submit(FakeSession("a"), 0))
+    await asyncio.sleep(0)
+    impatient = asyncio.create_task(coalescer.submit(FakeSession("b"), 1))
+    await asyncio.sleep(0)
+    impatient.cancel()
+    await leader
+    # Nobody is waiting for write 1, so the next caller flushes it first
+    await coalescer.submit(FakeSession("c"), 2)
+    assert flush.batches == [[0], [1], [2]]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_block_later_writes():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=0.05, max_batch=100)
+    leader = asyncio.create_task(coalescer.submit(FakeSession("a"), 0))
+    follower = asyncio.create_task(coalescer.submit(FakeSession("b"), 1))
+    for _ in range(2):
+        await asyncio.sleep(0)
+    assert coalescer._full is not None
+    leader.cancel()  # while it waits for the window
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    await asyncio.wait_for(follower, timeout=1)  # it took over and flushed
+
+    await asyncio.wait_for(coalescer.submit(FakeSession("c"), 2), timeout=1)
+    assert sorted(i for batch in flush.batches for i in batch) == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_caller_cancelled_as_it_is_made_leader_passes_leadership_on():
+    flush = Recorder(delay=0.01)
+    coalescer = WriteCoalescer(flush, window_seconds=0, max_batch=1)
+    hand_over = coalescer._hand_over
+    tasks = []
+
+    def hand_over_then_cancel_heir(current):
+        hand_over(current)
+        if len(tasks) > 1 and not tasks[1].done():
+            tasks[1].cancel()
+
+    coalescer._hand_over = hand_over_then_cancel_heir
+    for i, name in enumerate("ab"):
+        tasks.append(asyncio.create_task(coalescer.submit(FakeSession(name), i)))
+        await asyncio.sleep(0)
+    await tasks[0]
+    with pytest.raises(asyncio.CancelledError):
+        await tasks[1]
+
+    await asyncio.wait_for(coalescer.submit(FakeSession("c"), 2), timeout=1)
+    assert flush.batches == [[0], [1], [2]]
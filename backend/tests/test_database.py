@@ -0,0 +1,238 @@
+"""Tests for the tuned SQLite engine layer."""
+
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel
+
+from app import metrics
+from app.config import Settings
+from app.database import build_engine, connection_pragmas, create_schema
+from app.locks import FileLock
+
+
+@pytest.fixture
+async def engines(tmp_path):
+    """Writer + read-only engines on a temp-file database."""
+    cfg = Settings(db_path=str(tmp_path / "pomotrack.db"))
+    writer = build_engine(cfg)
+    reader = build_engine(cfg, read_only=True, pool_size=2)
+    async with writer.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield writer, reader
+    await reader.dispose()
+    await writer.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pragmas_applied_on_connect(engines):
+    writer, reader = engines
+    async with writer.connect() as conn:
+        assert (await conn.scalar(text("PRAGMA journal_mode"))) == "wal"
+        assert (await conn.scalar(text("PRAGMA synchronous"))) == 1  # NORMAL
+        assert (await conn.scalar(text("PRAGMA busy_timeout"))) == 5000
+        assert (await conn.scalar(text("PRAGMA cache_size"))) == -16 * 1024
+    async with reader.connect() as conn:
+        assert (await conn.scalar(text("PRAGMA query_only"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_reader_rejects_writes(engines):
+    _, reader = engines
+    async with reader.connect() as conn:
+        with pytest.raises(OperationalError):
+            await conn.execute(text("DELETE FROM sessions"))
+
+
+@pytest.mark.asyncio
+async def test_reads_proceed_during_open_write_transaction(engines):
+    """Under WAL a reader sees the last committed state while a write is open."""
+    writer, reader = engines
+    async with writer.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO sessions (id, type, label, started_at, completed_at, duration)"
+                " VALUES ('s1', 'focus', '', 0, 1, 1)"
+            )
+        )
+        async with reader.connect() as read_conn:
+            count = await read_conn.scalar(text("SELECT COUNT(*) FROM sessions"))
+        assert count == 0
+
+    async with reader.connect() as read_conn:
+        assert (await read_conn.scalar(text("SELECT COUNT(*) FROM sessions"))) == 1
+
+
+def test_invalid_pragma_setting_rejected():
+    with pytest.raises(ValueError):
+        connection_pragmas(Settings(sqlite_synchronous="sometimes"), read_only=False)
+
+
+@pytest.mark.asyncio
+async def test_create_schema_upgrades_old_tables(tmp_path):
+    """Tables from an older version gain new columns and indexes."""
+    writer = build_engine(Settings(db_path=str(tmp_path / "old.db")))
+    async with writer.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE sessions (id VARCHAR PRIMARY KEY, type VARCHAR NOT NULL,"
+                " label VARCHAR NOT NULL, started_at INTEGER NOT NULL,"
+                " completed_at INTEGER NOT NULL, duration INTEGER NOT NULL)"
+            )
+        )
+        await conn.execute(
+            text("INSERT INTO sessions VALUES ('old', 'focus', '', 0, 1, 1500)")
+        )
+
+    async with writer.begin() as conn:
+        await conn.run_sync(create_schema)
+        await conn.run_sync(create_schema)  # idempotent
+
+    async with writer.connect() as conn:
+        assert (await conn.scalar(text("SELECT seq FROM sessions WHERE id = 'old'"))) == 0
+        indexes = {
+            row[1] for row in await conn.execute(text("PRAGMA index_list('sessions')"))
+        }
+    assert {"ix_sessions_completed_at_id", "ix_sessions_seq"} <= indexes
+    await writer.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_schema_indexes_existing_rows_for_search(tmp_path):
+    """Search tables added to an existing database are filled from its rows."""
+    writer = build_engine(Settings(db_path=str(tmp_path / "old.db")))
+    async with writer.begin() as conn:
+        await conn.run_sync(create_schema)
+        for name in ("sessions_fts", "kanban_tasks_fts"):
+            await conn.exec_driver_sql(f"DROP TABLE {name}")
+            for suffix in ("ai", "ad", "au"):
+                await conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}_{suffix}")
+        await conn.execute(
+            text("INSERT INTO sessions VALUES ('old', 'focus', 'Deep work', 0, 1, 1500, 0)")
+        )
+
+    async with writer.begin() as conn:
+        await conn.run_sync(create_schema)
+        hits = await conn.scalar(
+            text("SELECT count(*) FROM sessions_fts WHERE sessions_fts MATCH 'deep'")
+        )
+    assert hits == 1
+    await writer.dispose()
+
+
+# ---------------------------------------------------------------------------
+# Several processes on one database
+# ---------------------------------------------------------------------------
+
+
+def _increment(db_path: str, count: int) -> None:
+    """Read-modify-write one counter ``count`` times (run in a process)."""
+
+    async def write() -> None:
+        writer = build_engine(Settings(db_path=db_path, sqlite_busy_timeout_ms=100))
+        for _ in range(count):
+            async with writer.begin() as conn:
+                value = await conn.scalar(text("SELECT duration FROM sessions"))
+                await asyncio.sleep(0.001)
+                await conn.execute(text("UPDATE sessions SET duration = :v"), {"v": value + 1})
+        await writer.dispose()
+
+    asyncio.run(write())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writer_processes(engines, tmp_path):
+    """Write transactions from several processes are isolated: no lost updates
+    and no "database is locked" errors."""
+    writer, _ = engines
+    async with writer.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO sessions (id, type, label, started_at, completed_at, duration)"
+                " VALUES ('counter', 'focus', '', 0, 1, 0)"
+            )
+        )
+    context = multiprocessing.get_context("spawn")
+    db_path = str(tmp_path / "pomotrack.db")
+    with ProcessPoolExecutor(3, mp_context=context) as pool:
+        for future in [pool.submit(_increment, db_path, 50) for _ in range(3)]:
+            future.result()
+    async with writer.connect() as conn:
+        assert (await conn.scalar(text("SELECT duration FROM sessions"))) == 150
+
+
+@pytest.mark.asyncio
+async def test_write_retries_while_another_process_holds_the_lock(engines, tmp_path):
+    """BEGIN is retried with backoff once busy_timeout runs out."""
+    db_path = str(tmp_path / "pomotrack.db")
+    holder = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, holder.rollback).start()
+    metrics.reset()
+    cfg = Settings(
+        db_path=db_path,
+        sqlite_busy_timeout_ms=50,
+        sqlite_write_retries=6,
+        sqlite_write_backoff_ms=50,
+    )
+    writer = build_engine(cfg)
+    async with writer.begin() as conn:
+        await conn.execute(text("DELETE FROM sessions"))
+    await writer.dispose()
+    holder.close()
+    assert metrics.DB_WRITE_RETRIES.values[()] >= 1
+
+
+@pytest.mark.asyncio
+async def test_write_fails_once_retries_run_out(engines, tmp_path):
+    db_path = str(tmp_path / "pomotrack.db")
+    holder = sqlite3.connect(db_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    cfg = Settings(db_path=db_path, sqlite_busy_timeout_ms=10, sqlite_write_retries=0)
+    writer = build_engine(cfg)
+    with pytest.raises(OperationalError, match="locked"):
+        async with writer.begin() as conn:
+            await conn.execute(text("DELETE FROM sessions"))
+    await writer.dispose()
+    holder.rollback()
+    holder.close()
+
+
+def test_startup_with_archival_on_file_database(tmp_path):
+    """Switching to incremental vacuum at startup runs VACUUM outside BEGIN IMMEDIATE."""
+    env = {
+        **os.environ,
+        "POMOTRACK_DB_PATH": str(tmp_path / "pomotrack.db"),
+        "POMOTRACK_ARCHIVE_AFTER_DAYS": "30",
+    }
+    script = "import asyncio; from app.main import prepare_database; asyncio.run(prepare_database())"
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    with sqlite3.connect(tmp_path / "pomotrack.db") as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    db_path = str(tmp_path / "pomotrack.db")
+    first, second = FileLock("archiver", db_path), FileLock("archiver", db_path)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_file_lock_is_a_no_op_in_memory():
+    first, second = FileLock("archiver", ":memory:"), FileLock("archiver", ":memory:")
+    assert first.try_acquire() and second.try_acquire()
@@ -0,0 +1,159 @@
+"""Tests for the in-process change feed and the SSE endpoint."""
+
+import asyncio
+import json
+
+import pytest
+
+import app.api.routes as routes_module
+from app.feed import RESET, ChangeEvent, ChangeFeed
+from app.main import app
+
+
+def drain(subscription) -> list[ChangeEvent]:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def test_event_encodes_as_sse_frame():
+    frame = ChangeEvent(7, "task.deleted", {"id": "t-1"}).encode()
+    assert frame == b'id: 7\nevent: task.deleted\ndata: {"id":"t-1"}\n\n'
+
+
+def test_publish_fans_out_to_subscribers():
+    feed = ChangeFeed()
+    first, second = feed.subscribe(), feed.subscribe()
+    feed.publish(1, "sessions.cleared")
+    assert [e.seq for e in drain(first)] == [1]
+    assert [e.seq for e in drain(second)] == [1]
+
+    feed.unsubscribe(second)
+    feed.publish(2, "tasks.cleared")
+    assert [e.type for e in drain(first)] == ["tasks.cleared"]
+    assert drain(second) == []
+
+
+def test_subscribe_replays_events_after_resume_token():
+    feed = ChangeFeed()
+    feed.start(10)
+    for seq in (11, 12, 13):
+        feed.publish(seq, "task.deleted", {"id": str(seq)})
+    assert [e.seq for e in drain(feed.subscribe(since=11))] == [12, 13]
+    assert drain(feed.subscribe(since=13)) == []
+    assert drain(feed.subscribe(since=10)) != []
+
+
+def test_resume_from_before_buffer_resets():
+    feed = ChangeFeed(buffer_size=2)
+    feed.start(5)
+    assert [e.type for e in drain(feed.subscribe(since=4))] == [RESET]
+
+    for seq in (6, 7, 8):
+        feed.publish(seq, "tasks.cleared")
+    # Event 6 fell out of the buffer, so resuming from 5 cannot be served
+    assert [(e.seq, e.type) for e in drain(feed.subscribe(since=5))] == [(8, RESET)]
+    assert [e.seq for e in drain(feed.subscribe(since=6))] == [7, 8]
+
+
+def test_slow_subscriber_is_reset_instead_of_growing():
+    feed = ChangeFeed(queue_size=3)
+    subscription = feed.subscribe()
+    for seq in range(1, 6):
+        feed.publish(seq, "tasks.cleared")
+    events = drain(subscription)
+    assert len(events) <= 3
+    assert RESET in [e.type for e in events]
+    # Events after the reset are delivered normally
+    feed.publish(6, "tasks.cleared")
+    assert [e.seq for e in drain(subscription)] == [6]
+
+
+@pytest.mark.asyncio
+async def test_stream_heartbeats_and_unsubscribes_on_close():
+    feed = ChangeFeed()
+    stream = feed.stream(heartbeat=0.01)
+    assert (await anext(stream)).startswith(b"retry:")
+    assert feed.subscriber_count == 1
+    assert await anext(stream) == b": keep-alive\n\n"
+    feed.publish(1, "tasks.cleared")
+    assert (await anext(stream)).startswith(b"id: 1\n")
+    await stream.aclose()
+    assert feed.subscriber_count == 0
+
+
+async def _read_sse(path: str, headers: list, frames: int) -> tuple[dict, list[bytes]]:
+    """Drive the app over raw ASGI until ``frames`` body chunks arrive."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path.partition("?")[0],
+        "raw_path": path.partition("?")[0].encode(),
+        "query_string": path.partition("?")[2].encode(),
+        "headers": [(b"host", b"test"), *headers],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    disconnected = asyncio.Event()
+    start: dict = {}
+    chunks: list[bytes] = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message.get("body"):
+            chunks.append(message["body"])
+            if len(chunks) >= frames:
+                disconnected.set()
+
+    await asyncio.wait_for(app(scope, receive, send), 5)
+    return start, chunks
+
+
+@pytest.mark.asyncio
+async def test_changes_endpoint_resumes_from_last_event_id(monkeypatch):
+    feed = ChangeFeed()
+    monkeypatch.setattr(routes_module, "feed", feed)
+    feed.start(3)
+    feed.publish(4, "task.deleted", {"id": "a"})
+    feed.publish(5, "task.deleted", {"id": "b"})
+
+    start, chunks = await _read_sse(
+        "/api/changes?since=3", [(b"last-event-id", b"4")], frames=2
+    )
+    headers = dict(start["headers"])
+    assert start["status"] == 200
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert headers[b"cache-control"] == b"no-cache"
+    assert chunks[0].startswith(b"retry:")
+    lines = chunks[1].decode().splitlines()
+    assert lines[:2] == ["id: 5", "event: task.deleted"]
+    assert json.loads(lines[2].removeprefix("data: ")) == {"id": "b"}
+    assert feed.subscriber_count == 0
+
+
+@pytest.mark.asyncio
+async def test_changes_endpoint_accepts_etag_as_resume_token(monkeypatch):
+    feed = ChangeFeed()
+    monkeypatch.setattr(routes_module, "feed", feed)
+    feed.start(1)
+    feed.publish(2, "tasks.cleared")
+
+    _, chunks = await _read_sse("/api/changes?since=W/%221%22", [], frames=2)
+    assert chunks[1].startswith(b"id: 2\nevent: tasks.cleared\n")
+
+    start, _ = await _read_sse("/api/changes?since=abc", [], frames=1)
+    assert start["status"] == 422
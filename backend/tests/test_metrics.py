@@ -0,0 +1,63 @@
+"""Tests for the in-process metrics registry and SQL instrumentation."""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("t_seconds", "Test.", ("op",), (0.1, 1))
+    metrics.REGISTRY.remove(hist)
+    for value in (0.05, 0.1, 0.5, 3):
+        hist.observe(value, 'a"b')
+    assert hist.render() == [
+        "# HELP t_seconds Test.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{op="a\\"b",le="0.1"} 2',
+        't_seconds_bucket{op="a\\"b",le="1"} 3',
+        't_seconds_bucket{op="a\\"b",le="+Inf"} 4',
+        't_seconds_sum{op="a\\"b"} 3.65',
+        't_seconds_count{op="a\\"b"} 4',
+    ]
+
+
+def test_counter_and_gauge():
+    counter = metrics.Counter("t_total", "Test.", ("kind",))
+    gauge = metrics.Gauge("t_active", "Test.")
+    metrics.REGISTRY.remove(counter)
+    metrics.REGISTRY.remove(gauge)
+    counter.inc("x")
+    counter.inc("x", amount=2.5)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert counter.samples() == ['t_total{kind="x"} 3.5']
+    assert gauge.samples() == ["t_active 1"]
+
+
+def test_render_lists_every_metric():
+    text = metrics.render()
+    for metric in metrics.REGISTRY:
+        assert f"# TYPE {metric.name} {metric.kind}" in text
+
+
+@pytest.mark.asyncio
+async def test_instrument_engine_times_statements():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    metrics.instrument_engine(engine, "test")
+    metrics.reset()
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        await conn.execute(text("INSERT INTO t VALUES (1)"))
+        await conn.execute(text("  select x from t"))
+        with pytest.raises(Exception):
+            await conn.execute(text("SELECT nope FROM t"))
+    await engine.dispose()
+
+    durations = metrics.DB_QUERY_DURATION.values
+    assert sum(durations[("test", "SELECT")][0]) == 1
+    assert sum(durations[("test", "INSERT")][0]) == 1
+    assert sum(durations[("test", "CREATE")][0]) == 1
+    assert metrics.DB_QUERY_ERRORS.values == {("test", "SELECT"): 1}
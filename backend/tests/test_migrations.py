@@ -0,0 +1,174 @@
+"""Tests for the versioned schema migration runner."""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import event, text
+from sqlmodel import SQLModel
+
+from app import archive, migrations
+from app.config import Settings
+from app.database import build_engine
+
+# The sessions and kanban_tasks tables as the first release created them
+OLD_SCHEMA = (
+    "CREATE TABLE sessions (id VARCHAR PRIMARY KEY, type VARCHAR NOT NULL,"
+    " label VARCHAR NOT NULL, started_at INTEGER NOT NULL,"
+    " completed_at INTEGER NOT NULL, duration INTEGER NOT NULL)",
+    "CREATE TABLE kanban_tasks (id VARCHAR PRIMARY KEY, title VARCHAR NOT NULL,"
+    " status VARCHAR NOT NULL, pomodoros_completed INTEGER NOT NULL,"
+    " created_at INTEGER NOT NULL, completed_at INTEGER)",
+)
+OLD_ROWS = 20_000
+
+
+@pytest.fixture
+async def writer(tmp_path):
+    engine = build_engine(Settings(db_path=str(tmp_path / "pomotrack.db")))
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def old_writer(writer):
+    """A database from before migrations existed, holding ``OLD_ROWS`` sessions."""
+    async with writer.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            await conn.exec_driver_sql(ddl)
+        await conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n"
+            f" WHERE i < {OLD_ROWS}) INSERT INTO sessions"
+            " SELECT 's' || i, 'focus', 'Label ' || (i % 50), i * 1000, i * 1000 + 1, 1500"
+            " FROM n"
+        )
+    return writer
+
+
+async def _indexes(engine) -> set[str]:
+    async with engine.connect() as conn:
+        rows = await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+        return {name for (name,) in rows if not name.startswith("sqlite_autoindex")}
+
+
+async def _versions(engine) -> set[int]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(migrations.applied_versions)
+
+
+def _model_indexes() -> set[str]:
+    return {index.name for table in SQLModel.metadata.sorted_tables for index in table.indexes}
+
+
+def _record_sql(engine) -> list[str]:
+    statements: list[str] = []
+
+    def record(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_versions_are_ordered_and_unique():
+    versions = [m.version for m in migrations.MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+@pytest.mark.asyncio
+async def test_migrate_new_database(writer):
+    deferred = await migrations.migrate(writer)
+    # New tables come with every index; deferred steps have nothing to build
+    assert _model_indexes() <= await _indexes(writer)
+    assert deferred == [m for m in migrations.MIGRATIONS if m.deferred]
+    assert await migrations.run_deferred(writer) == len(deferred)
+    assert await _versions(writer) == {m.version for m in migrations.MIGRATIONS}
+
+
+@pytest.mark.asyncio
+async def test_migrate_old_database_defers_index_builds(old_writer):
+    deferred = await migrations.migrate(old_writer)
+    assert deferred
+    async with old_writer.connect() as conn:
+        # Columns are added at startup: the code reading them runs straight away
+        assert (await conn.scalar(text("SELECT seq FROM sessions WHERE id = 's1'"))) == 0
+    assert "ix_sessions_completed_at_id" not in await _indexes(old_writer)
+
+    await migrations.run_deferred(old_writer)
+    assert _model_indexes() <= await _indexes(old_writer)
+    async with old_writer.connect() as conn:
+        hits = await conn.scalar(
+            text("SELECT count(*) FROM sessions_fts WHERE sessions_fts MATCH 'label'")
+        )
+    assert hits == OLD_ROWS
+    assert await migrations.migrate(old_writer) == []
+
+
+@pytest.mark.asyncio
+async def test_migrate_indexes_ids_of_existing_archive_segments(writer):
+    await migrations.migrate(writer)
+    row = ["s1", "focus", "", 1000, 2000, 1]
+    async with writer.begin() as conn:
+        # As left by a release from before the id index
+        await conn.exec_driver_sql("DROP TABLE session_archive_ids")
+        await conn.exec_driver_sql("DELETE FROM schema_version WHERE version = 7")
+        await conn.execute(
+            text("INSERT INTO session_archive VALUES ('1970-01', 1, 2000, 2000, :payload)"),
+            {"payload": archive.encode_rows([row])},
+        )
+    await migrations.migrate(writer)
+    async with writer.connect() as conn:
+        index = await conn.exec_driver_sql("SELECT id, month FROM session_archive_ids")
+        assert index.all() == [("s1", "1970-01")]
+
+
+@pytest.mark.asyncio
+async def test_current_schema_takes_the_fast_path(writer):
+    await migrations.migrate(writer)
+    await migrations.run_deferred(writer)
+    statements = _record_sql(writer)
+    assert await migrations.migrate(writer) == []
+    ddl = [s for s in statements if s.lstrip().upper().startswith(("CREATE", "ALTER", "DROP"))]
+    assert ddl == []
+    assert len(statements) <= 2  # table check, versions; no BEGIN IMMEDIATE
+
+
+@pytest.mark.asyncio
+async def test_current_schema_does_not_wait_for_the_write_lock(writer, tmp_path):
+    await migrations.migrate(writer)
+    other = build_engine(Settings(db_path=str(tmp_path / "pomotrack.db")))
+    try:
+        async with other.begin():  # another worker holding the write lock
+            assert await asyncio.wait_for(migrations.migrate(writer), timeout=1) == [
+                m for m in migrations.MIGRATIONS if m.deferred
+            ]
+    finally:
+        await other.dispose()
+
+
+@pytest.mark.asyncio
+async def test_run_deferred_skips_steps_applied_elsewhere(writer):
+    await migrations.migrate(writer)
+    await migrations.run_deferred(writer)
+    assert await migrations.run_deferred(writer) == 0
+
+
+@pytest.mark.asyncio
+async def test_cold_start_time(old_writer):
+    """Startup on a large old database does not wait for its index builds,
+    and a restart on a current schema costs next to nothing."""
+    started = time.perf_counter()
+    await migrations.migrate(old_writer)
+    upgrade = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await migrations.run_deferred(old_writer)
+    index_builds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await migrations.migrate(old_writer)
+    restart = time.perf_counter() - started
+
+    assert upgrade < index_builds
+    assert restart < upgrade
+    assert restart < 0.1
@@ -0,0 +1,132 @@
+"""Tests for the indexed static/SPA serving layer."""
+
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.static import IMMUTABLE, REVALIDATE, StaticSite, accepted_encodings
+
+INDEX = b"<!doctype html><div id=app></div>"
+SCRIPT = b"console.log('pomotrack');" * 100
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "index.html").write_bytes(INDEX)
+    (tmp_path / "index.html.gz").write_bytes(gzip.compress(INDEX))
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    (assets / "index-B3xk_9Qa.js").write_bytes(SCRIPT)
+    (assets / "index-B3xk_9Qa.js.gz").write_bytes(gzip.compress(SCRIPT))
+    (assets / "index-B3xk_9Qa.js.br").write_bytes(b"not really brotli")
+    sounds = tmp_path / "sounds"
+    sounds.mkdir()
+    (sounds / "bell.mp3").write_bytes(b"ID3")
+    (tmp_path / "favicon.svg").write_bytes(b"<svg/>")
+    return StaticSite(tmp_path)
+
+
+@pytest.fixture
+async def client(site):
+    app = FastAPI()
+
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve(full_path: str, request: Request):
+        return site.response(full_path, request.headers)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://t") as ac:
+        yield ac
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br;q=0.5") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip") == {"gzip"}
+    assert accepted_encodings(None) == set()
+
+
+def test_index_is_built_once_and_cached(site):
+    assert set(site.entries) == {
+        "index.html",
+        "assets/index-B3xk_9Qa.js",
+        "sounds/bell.mp3",
+        "favicon.svg",
+    }
+    assert site.entries["index.html"].identity.body == INDEX
+    assert site.entries["assets/index-B3xk_9Qa.js"].identity.body is None
+
+
+@pytest.mark.asyncio
+async def test_spa_fallback_serves_cached_index(client, site, tmp_path):
+    (tmp_path / "index.html").unlink()
+    for path in ("/", "/board", "/../../etc/passwd"):
+        response = await client.get(path, headers={"accept-encoding": "identity"})
+        assert response.status_code == 200
+        assert response.content == INDEX
+        assert response.headers["cache-control"] == REVALIDATE
+
+
+@pytest.mark.asyncio
+async def test_missing_file_in_asset_directory_is_404(client):
+    assert (await client.get("/assets/index-old12345.js")).status_code == 404
+    assert (await client.get("/sounds/missing.mp3")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_hashed_asset_is_immutable_and_precompressed(client):
+    response = await client.get(
+        "/assets/index-B3xk_9Qa.js", headers={"accept-encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.content == SCRIPT  # httpx decodes gzip
+
+    brotli = await client.head(
+        "/assets/index-B3xk_9Qa.js", headers={"accept-encoding": "gzip, br"}
+    )
+    assert brotli.headers["content-encoding"] == "br"
+
+    plain = await client.get(
+        "/assets/index-B3xk_9Qa.js", headers={"accept-encoding": "identity"}
+    )
+    assert "content-encoding" not in plain.headers
+    assert plain.content == SCRIPT
+    assert len({response.headers["etag"], brotli.headers["etag"], plain.headers["etag"]}) == 3
+
+
+@pytest.mark.asyncio
+async def test_unhashed_files_revalidate(client):
+    response = await client.get("/favicon.svg")
+    assert response.headers["cache-control"] == REVALIDATE
+    assert "vary" not in response.headers
+    assert response.headers["content-type"].startswith("image/svg+xml")
+
+
+@pytest.mark.asyncio
+async def test_if_none_match_returns_304(client):
+    headers = {"accept-encoding": "gzip"}
+    first = await client.get("/sounds/bell.mp3", headers=headers)
+    etag = first.headers["etag"]
+    second = await client.get(
+        "/sounds/bell.mp3", headers={**headers, "if-none-match": etag}
+    )
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+
+    index = await client.get("/", headers=headers)
+    assert index.headers["content-encoding"] == "gzip"
+    again = await client.get(
+        "/", headers={**headers, "if-none-match": index.headers["etag"]}
+    )
+    assert again.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_head_request(client):
+    response = await client.head("/favicon.svg")
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "6"
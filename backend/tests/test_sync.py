@@ -0,0 +1,88 @@
+"""Tests for the streaming sync decode pipeline."""
+
+import gzip
+import json
+
+import pytest
+
+from app import sync
+
+DOCUMENT = {
+    "version": 1,
+    "exportedAt": "2026-01-01T00:00:00+00:00",
+    "sessions": [
+        {"id": f"s-{i}", "label": "naïve \"quoted\" ✓", "duration": 1500 + i, "ratio": -1.5e3}
+        for i in range(50)
+    ],
+    "empty": [],
+    "nested": {"a": [1, 2, {"b": None}]},
+    "tasks": [{"id": "t", "completedAt": None, "done": True}],
+}
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _split(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+async def _collect(chunks):
+    return [item async for item in chunks]
+
+
+def _rebuild(items):
+    doc: dict = {}
+    for key, value, is_item in items:
+        if is_item:
+            doc.setdefault(key, []).append(value)
+        else:
+            doc[key] = value
+    return doc
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+async def test_iter_document_matches_json_loads(chunk_size):
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=1)
+    items = await _collect(sync.iter_document(_aiter(_split(text, chunk_size))))
+    expected = {k: v for k, v in DOCUMENT.items() if k != "empty"}
+    assert _rebuild(items) == expected
+
+
+@pytest.mark.asyncio
+async def test_iter_document_number_split_across_chunks():
+    items = await _collect(sync.iter_document(_aiter(['{"version": 1', '23}'])))
+    assert items == [("version", 123, False)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "text", ['{"sessions": [{"id": 1}', '[1, 2]', '{"a": 1} trailing', '{"a" 1}', ""]
+)
+async def test_iter_document_rejects_malformed(text):
+    with pytest.raises(sync.SyncPayloadError):
+        await _collect(sync.iter_document(_aiter(_split(text, 3))))
+
+
+@pytest.mark.asyncio
+async def test_decode_pipeline_gzip_small_chunks():
+    raw = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+    chunks = _aiter(_split(gzip.compress(raw), 3))
+    items = await _collect(sync.iter_document(sync.decode_text(sync.decompress_stream(chunks))))
+    assert _rebuild(items)["sessions"] == DOCUMENT["sessions"]
+
+
+@pytest.mark.asyncio
+async def test_decode_pipeline_rejects_corrupt_gzip():
+    corrupt = gzip.compress(b'{"version": 1}')[:10] + b"garbage-bytes"
+    with pytest.raises(sync.SyncPayloadError):
+        await _collect(sync.decompress_stream(_aiter([corrupt])))
+
+
+@pytest.mark.asyncio
+async def test_decode_text_rejects_invalid_utf8():
+    with pytest.raises(sync.SyncPayloadError):
+        await _collect(sync.decode_text(_aiter([b'{"a": "\xff"}'])))
@@ -0,0 +1,109 @@
+"""Parity tests: the column-level wire path must match the Pydantic models."""
+
+import json
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app import wire
+from app.api.routes import KanbanTaskOut, SessionOut
+from app.models import KanbanTask, SessionRecord
+
+SESSIONS = [
+    dict(id="s-1", type="focus", label="", started_at=0, completed_at=1, duration=0),
+    dict(
+        id="s-✓",
+        type="short-break",
+        label='naïve "quoted" \\ 漢字 \U0001f345\n',
+        started_at=1_700_000_000_000,
+        completed_at=2**53,
+        duration=-1,
+    ),
+]
+
+TASKS = [
+    dict(id="t-1", title="todo", status="todo", pomodoros_completed=0, created_at=1),
+    dict(
+        id="t-2",
+        title="\u2028line\tsep\u0000",
+        status="done",
+        pomodoros_completed=7,
+        created_at=2,
+        completed_at=3,
+    ),
+]
+
+
+@pytest.fixture
+async def rows():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as db:
+        db.add_all([SessionRecord(**r) for r in SESSIONS])
+        db.add_all([KanbanTask(**t) for t in TASKS])
+        await db.commit()
+        sessions = (await db.execute(select(*wire.SESSION_COLUMNS))).all()
+        tasks = (await db.execute(select(*wire.TASK_COLUMNS))).all()
+    yield sessions, tasks
+    await engine.dispose()
+
+
+def test_keys_match_response_models():
+    assert list(wire.SESSION_KEYS) == list(SessionOut.model_fields)
+    assert list(wire.TASK_KEYS) == list(KanbanTaskOut.model_fields)
+    assert len(wire.SESSION_COLUMNS) == len(wire.SESSION_KEYS)
+    assert len(wire.TASK_COLUMNS) == len(wire.TASK_KEYS)
+
+
+def _session_out(r: SessionRecord) -> SessionOut:
+    return SessionOut(
+        id=r.id,
+        type=r.type,
+        label=r.label,
+        startedAt=r.started_at,
+        completedAt=r.completed_at,
+        duration=r.duration,
+    )
+
+
+def _task_out(t: KanbanTask) -> KanbanTaskOut:
+    return KanbanTaskOut(
+        id=t.id,
+        title=t.title,
+        status=t.status,
+        pomodorosCompleted=t.pomodoros_completed,
+        createdAt=t.created_at,
+        completedAt=t.completed_at,
+    )
+
+
+@pytest.mark.asyncio
+async def test_session_rows_match_pydantic(rows):
+    sessions, _ = rows
+    assert len(sessions) == len(SESSIONS)
+    expected = {r["id"]: _session_out(SessionRecord(**r)) for r in SESSIONS}
+    for row in sessions:
+        assert wire.session_to_wire(row) == expected[row.id].model_dump()
+    body = json.loads(wire.dumps_rows(sessions, wire.SESSION_KEYS))
+    assert body == [json.loads(expected[r.id].model_dump_json()) for r in sessions]
+
+
+@pytest.mark.asyncio
+async def test_task_rows_match_pydantic(rows):
+    _, tasks = rows
+    assert len(tasks) == len(TASKS)
+    expected = {t["id"]: _task_out(KanbanTask(**t)) for t in TASKS}
+    for row in tasks:
+        assert wire.task_to_wire(row) == expected[row.id].model_dump()
+    assert expected["t-1"].completedAt is None
+    body = json.loads(wire.dumps_rows(tasks, wire.TASK_KEYS))
+    assert body == [json.loads(expected[t.id].model_dump_json()) for t in tasks]
+
+
+def test_dumps_round_trips_unicode():
+    value = {"label": SESSIONS[1]["label"], "title": TASKS[1]["title"], "n": None}
+    assert json.loads(wire.dumps(value)) == value
@@ -0,0 +1,61 @@
+import { describe, it, expect, beforeEach, vi } from "vitest";
+
+// Lists are tagged with the data version they reflect
+const versions: Record<string, string> = {
+  "/api/sessions": '"9"',
+  "/api/kanban/tasks": '"7"',
+};
+const mockFetch = vi.fn().mockImplementation((url: string) =>
+  Promise.resolve({
+    ok: true,
+    headers: new Headers(versions[url] ? { ETag: versions[url] } : {}),
+    json: () => Promise.resolve([]),
+  }),
+);
+vi.stubGlobal("fetch", mockFetch);
+
+const opened: string[] = [];
+class FakeEventSource {
+  constructor(url: string) {
+    opened.push(url);
+  }
+  addEventListener() {}
+  close() {}
+}
+vi.stubGlobal("EventSource", FakeEventSource);
+
+describe("useChangeFeed", () => {
+  beforeEach(() => {
+    mockFetch.mockClear();
+    opened.length = 0;
+    vi.resetModules();
+  });
+
+  it("resumes after the older of the loaded lists", async () => {
+    const { useChangeFeed } = await import("../composables/useChangeFeed");
+    const { connect, disconnect } = useChangeFeed();
+    await connect();
+    expect(opened).toEqual(["/api/changes?since=7"]);
+    disconnect();
+  });
+
+  it("starts from now when a list has no version", async () => {
+    mockFetch.mockImplementationOnce(() =>
+      Promise.resolve({ ok: false, status: 500, text: () => Promise.resolve("") }),
+    );
+    const { useChangeFeed } = await import("../composables/useChangeFeed");
+    const { connect, disconnect } = useChangeFeed();
+    await connect();
+    expect(opened).toEqual(["/api/changes"]);
+    disconnect();
+  });
+
+  it("does not connect when disconnected while lists load", async () => {
+    const { useChangeFeed } = await import("../composables/useChangeFeed");
+    const { connect, disconnect } = useChangeFeed();
+    const connecting = connect();
+    disconnect();
+    await connecting;
+    expect(opened).toEqual([]);
+  });
+});
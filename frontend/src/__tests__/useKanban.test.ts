@@ -8,7 +8,11 @@ const mockFetch = vi
   .mockImplementation((_url: string, options?: RequestInit) => {
     const method = options?.method ?? "GET";
     if (method === "GET") {
-      return Promise.resolve({ ok: true, json: () => Promise.resolve([]) });
+      return Promise.resolve({
+        ok: true,
+        headers: new Headers({ ETag: '"7"' }),
+        json: () => Promise.resolve([]),
+      });
     }
     // For POST (create) return the body back so the response doesn't break callers
     const body = options?.body
@@ -83,6 +87,26 @@ describe("useKanban", () => {
     expect(todoTasks.value[0].id).toBe(id1);
   });
 
+  it("sends every status change of a move in one PATCH", () => {
+    const { todoTasks, addTask, moveTask } = useKanban();
+    addTask("Task 1");
+    addTask("Task 2");
+    const [id1, id2] = todoTasks.value.map((t) => t.id);
+    moveTask(id1, "in-progress");
+    mockFetch.mockClear();
+
+    moveTask(id2, "in-progress");
+
+    expect(mockFetch).toHaveBeenCalledTimes(1);
+    const [url, options] = mockFetch.mock.calls[0];
+    expect(url).toBe("/api/kanban/tasks");
+    expect(options.method).toBe("PATCH");
+    expect(JSON.parse(options.body)).toEqual([
+      { id: id1, status: "todo", completedAt: null },
+      { id: id2, status: "in-progress", completedAt: null },
+    ]);
+  });
+
   it("moves task to done with completedAt timestamp", () => {
     const { todoTasks, doneTasks, addTask, moveTask } = useKanban();
     addTask("Task 1");
@@ -169,4 +193,30 @@ describe("useKanban", () => {
     addTask("Task 1");
     expect(activeTask.value).toBeNull();
   });
+
+  it("applies tasks changed elsewhere", async () => {
+    const mod = await import("../composables/useKanban");
+    const { tasks, addTask } = useKanban();
+    addTask("Local");
+    const local = tasks.value[0];
+
+    mod.applyTask({ ...local, status: "done", completedAt: 5 });
+    expect(tasks.value).toHaveLength(1);
+    expect(tasks.value[0].status).toBe("done");
+
+    mod.applyTask({
+      id: "remote",
+      title: "Remote",
+      status: "todo",
+      pomodorosCompleted: 0,
+      createdAt: 0,
+    });
+    expect(tasks.value.map((t) => t.id)).toEqual(["remote", local.id]);
+
+    mod.applyTaskDeleted("remote");
+    expect(tasks.value.map((t) => t.id)).toEqual([local.id]);
+
+    mod.applyTasksCleared();
+    expect(tasks.value).toHaveLength(0);
+  });
 });
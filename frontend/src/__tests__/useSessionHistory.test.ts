@@ -13,6 +13,7 @@ const mockFetch = vi
         : JSON.stringify({ ok: true, count: 1 });
     return Promise.resolve({
       ok: true,
+      headers: new Headers({ ETag: '"7"' }),
       json: () => Promise.resolve(JSON.parse(body)),
     });
   });
@@ -128,6 +129,35 @@ describe("useSessionHistory", () => {
     expect(recentLabels.value.filter((l) => l === "Alpha")).toHaveLength(1);
   });
 
+  it("fills recent labels from the server's label index", async () => {
+    mockFetch.mockImplementationOnce(() =>
+      Promise.resolve({
+        ok: true,
+        headers: new Headers(),
+        json: () => Promise.resolve([]),
+      }),
+    );
+    mockFetch.mockImplementationOnce(() =>
+      Promise.resolve({
+        ok: true,
+        json: () =>
+          Promise.resolve([
+            { label: "Old", sessionCount: 3, focusSeconds: 4500, lastUsedAt: 1 },
+          ]),
+      }),
+    );
+    const mod = await import("../composables/useSessionHistory");
+    await mod.refreshSessions();
+    const { recentLabels, recordSession } = mod.useSessionHistory();
+
+    recordSession("focus", "New", 1500, Date.now());
+    expect(recentLabels.value).toEqual(["New", "Old"]);
+    expect(mockFetch).toHaveBeenCalledWith(
+      "/api/labels?order=recent&limit=10",
+      expect.anything(),
+    );
+  });
+
   it("limits recent labels to 10", () => {
     const { recentLabels, recordSession } = useSessionHistory();
 
@@ -137,4 +167,84 @@ describe("useSessionHistory", () => {
 
     expect(recentLabels.value.length).toBeLessThanOrEqual(10);
   });
+
+  it("merges sessions changed elsewhere, newest first", async () => {
+    const mod = await import("../composables/useSessionHistory");
+    const { history, recordSession } = useSessionHistory();
+    const local = recordSession("focus", "Local", 1500, Date.now() - 1500000);
+
+    mod.applySessions([
+      { ...local, label: "Renamed" },
+      {
+        id: "older",
+        type: "short-break",
+        label: "",
+        startedAt: 0,
+        completedAt: 300000,
+        duration: 300,
+      },
+    ]);
+    expect(history.value.entries.map((e) => e.id)).toEqual([local.id, "older"]);
+    expect(history.value.entries[0].label).toBe("Renamed");
+
+    mod.applySessionsCleared();
+    expect(history.value.entries).toEqual([]);
+  });
+
+  it("caps merged sessions at MAX_ENTRIES (500)", async () => {
+    const mod = await import("../composables/useSessionHistory");
+    const { history } = useSessionHistory();
+    const sessions = Array.from({ length: 505 }, (_, i) => ({
+      id: `s-${i}`,
+      type: "focus" as const,
+      label: "",
+      startedAt: i * 1000,
+      completedAt: i * 1000 + 1,
+      duration: 1,
+    }));
+
+    mod.applySessions(sessions);
+    expect(history.value.entries).toHaveLength(500);
+    expect(history.value.entries[0].id).toBe("s-504");
+  });
+
+  it("loads period totals from the server's stats", async () => {
+    const mod = await import("../composables/useSessionHistory");
+    mockFetch.mockImplementationOnce(() =>
+      Promise.resolve({
+        ok: true,
+        json: () =>
+          Promise.resolve({
+            fromDay: "2025-03-01",
+            toDay: "2025-03-20",
+            focusCount: 700,
+            focusSeconds: 1050000,
+            breakCount: 650,
+            breakSeconds: 195000,
+            days: [],
+          }),
+      }),
+    );
+    const now = new Date();
+    const month = String(now.getMonth() + 1).padStart(2, "0");
+    const today = String(now.getDate()).padStart(2, "0");
+
+    const totals = await mod.fetchPeriodTotals("month");
+    expect(totals).toEqual({
+      focusCount: 700,
+      breakCount: 650,
+      totalFocusMinutes: 17500,
+    });
+    expect(mockFetch).toHaveBeenCalledWith(
+      `/api/stats?from=${now.getFullYear()}-${month}-01&to=${now.getFullYear()}-${month}-${today}`,
+      expect.anything(),
+    );
+  });
+
+  it("remembers the data version of the last fetch", async () => {
+    const mod = await import("../composables/useSessionHistory");
+    expect(mod.sessionsVersion()).toBeNull();
+    await mod.sessionsLoaded();
+    expect(mod.sessionsVersion()).toBe(7);
+  });
 });
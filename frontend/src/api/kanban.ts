@@ -1,4 +1,5 @@
 import type { KanbanTask } from "../composables/useKanban";
+import { parseDataVersion } from "./sessions";
 
 const BASE = "/api";
 
@@ -18,6 +19,22 @@ export async function fetchTasks(): Promise<KanbanTask[]> {
   return request<KanbanTask[]>("/kanban/tasks");
 }
 
+/** Tasks plus the data version they reflect, for resuming the change feed. */
+export async function fetchTasksVersioned(): Promise<{
+  tasks: KanbanTask[];
+  version: number | null;
+}> {
+  const res = await fetch(`${BASE}/kanban/tasks`);
+  if (!res.ok) {
+    const text = await res.text().catch(() => res.statusText);
+    throw new Error(`API /kanban/tasks: ${res.status} ${text}`);
+  }
+  return {
+    tasks: (await res.json()) as KanbanTask[],
+    version: parseDataVersion(res.headers.get("ETag")),
+  };
+}
+
 export async function createTask(task: KanbanTask): Promise<KanbanTask> {
   return request<KanbanTask>("/kanban/tasks", {
     method: "POST",
@@ -32,6 +49,26 @@ export async function updateTask(task: KanbanTask): Promise<KanbanTask> {
   });
 }
 
+/** Partial update of one task; omitted fields are left unchanged. */
+export interface KanbanTaskPatch {
+  id: string;
+  title?: string;
+  status?: KanbanTask["status"];
+  completedAt?: number | null;
+  pomodorosCompleted?: number;
+  pomodorosIncrement?: number;
+}
+
+/** Apply many partial updates in one request and one transaction. */
+export async function patchTasks(
+  patches: KanbanTaskPatch[],
+): Promise<KanbanTask[]> {
+  return request<KanbanTask[]>("/kanban/tasks", {
+    method: "PATCH",
+    body: JSON.stringify(patches),
+  });
+}
+
 export async function deleteTask(taskId: string): Promise<void> {
   await request(`/kanban/tasks/${taskId}`, { method: "DELETE" });
 }
@@ -0,0 +1,36 @@
+const BASE = "/api";
+
+export interface LabelUsage {
+  label: string;
+  sessionCount: number;
+  focusSeconds: number;
+  lastUsedAt: number; // timestamp ms
+}
+
+export interface LabelQuery {
+  /** Case-insensitive label prefix (autocomplete) */
+  prefix?: string;
+  order?: "count" | "recent";
+  limit?: number;
+}
+
+async function request<T>(path: string, options?: RequestInit): Promise<T> {
+  const res = await fetch(`${BASE}${path}`, {
+    headers: { "Content-Type": "application/json" },
+    ...options,
+  });
+  if (!res.ok) {
+    const text = await res.text().catch(() => res.statusText);
+    throw new Error(`API ${path}: ${res.status} ${text}`);
+  }
+  return res.json() as Promise<T>;
+}
+
+export async function fetchLabels(query: LabelQuery = {}): Promise<LabelUsage[]> {
+  const params = new URLSearchParams();
+  for (const [key, value] of Object.entries(query)) {
+    if (value !== undefined) params.set(key, String(value));
+  }
+  const search = params.toString();
+  return request<LabelUsage[]>(search ? `/labels?${search}` : "/labels");
+}
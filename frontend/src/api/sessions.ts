@@ -14,8 +14,51 @@ async function request<T>(path: string, options?: RequestInit): Promise<T> {
   return res.json() as Promise<T>;
 }
 
-export async function fetchSessions(): Promise<SessionHistoryEntry[]> {
-  return request<SessionHistoryEntry[]>("/sessions");
+export interface SessionQuery {
+  /** Completed at or after (epoch ms) */
+  from?: number;
+  /** Completed before (epoch ms) */
+  to?: number;
+  type?: SessionHistoryEntry["type"];
+  /** Exact label; "" matches unlabeled sessions */
+  label?: string;
+}
+
+function sessionsPath(query: SessionQuery): string {
+  const params = new URLSearchParams();
+  for (const [key, value] of Object.entries(query)) {
+    if (value !== undefined) params.set(key, String(value));
+  }
+  const search = params.toString();
+  return search ? `/sessions?${search}` : "/sessions";
+}
+
+export async function fetchSessions(
+  query: SessionQuery = {},
+): Promise<SessionHistoryEntry[]> {
+  return request<SessionHistoryEntry[]>(sessionsPath(query));
+}
+
+/** Parse the data version from a list ETag (`"42"` or `W/"42"`). */
+export function parseDataVersion(etag: string | null): number | null {
+  const version = Number(etag?.replace(/^W\//, "").replace(/"/g, ""));
+  return etag && Number.isInteger(version) ? version : null;
+}
+
+/** Sessions plus the data version they reflect, for resuming the change feed. */
+export async function fetchSessionsVersioned(
+  query: SessionQuery = {},
+): Promise<{ sessions: SessionHistoryEntry[]; version: number | null }> {
+  const path = sessionsPath(query);
+  const res = await fetch(`${BASE}${path}`);
+  if (!res.ok) {
+    const text = await res.text().catch(() => res.statusText);
+    throw new Error(`API ${path}: ${res.status} ${text}`);
+  }
+  return {
+    sessions: (await res.json()) as SessionHistoryEntry[],
+    version: parseDataVersion(res.headers.get("ETag")),
+  };
 }
 
 export async function postSession(entry: SessionHistoryEntry): Promise<void> {
@@ -0,0 +1,48 @@
+const BASE = "/api";
+
+export interface DailyStats {
+  day: string; // YYYY-MM-DD
+  focusCount: number;
+  focusSeconds: number;
+  breakCount: number;
+  breakSeconds: number;
+}
+
+export interface StatsSummary {
+  fromDay: string;
+  toDay: string;
+  focusCount: number;
+  focusSeconds: number;
+  breakCount: number;
+  breakSeconds: number;
+  days: DailyStats[];
+}
+
+export interface StatsQuery {
+  /** First day, inclusive (YYYY-MM-DD); defaults to `to` */
+  from?: string;
+  /** Last day, inclusive (YYYY-MM-DD); defaults to today */
+  to?: string;
+}
+
+async function request<T>(path: string, options?: RequestInit): Promise<T> {
+  const res = await fetch(`${BASE}${path}`, {
+    headers: { "Content-Type": "application/json" },
+    ...options,
+  });
+  if (!res.ok) {
+    const text = await res.text().catch(() => res.statusText);
+    throw new Error(`API ${path}: ${res.status} ${text}`);
+  }
+  return res.json() as Promise<T>;
+}
+
+/** Focus/break totals from the server's daily rollup, archived sessions included. */
+export async function fetchStats(query: StatsQuery = {}): Promise<StatsSummary> {
+  const params = new URLSearchParams();
+  for (const [key, value] of Object.entries(query)) {
+    if (value !== undefined) params.set(key, String(value));
+  }
+  const search = params.toString();
+  return request<StatsSummary>(search ? `/stats?${search}` : "/stats");
+}
@@ -8,6 +8,7 @@ export interface AzureCredentials {
 
 export interface PushResult {
   ok: boolean;
+  mode: "full" | "delta" | "unchanged";
   exportedSessions: number;
   exportedTasks: number;
   exportedAt: string;
@@ -15,6 +16,7 @@ export interface PushResult {
 
 export interface PullResult {
   ok: boolean;
+  mode: "full" | "unchanged";
   importedSessions: number;
   importedTasks: number;
 }
@@ -10,12 +10,17 @@ export {
   exportAllData,
   importAllData,
 } from "./useStorage";
-export { useSessionHistory, refreshSessions } from "./useSessionHistory";
+export {
+  useSessionHistory,
+  refreshSessions,
+  fetchPeriodTotals,
+} from "./useSessionHistory";
 export { useFavicon } from "./useFavicon";
 export { useWakeLock } from "./useWakeLock";
 export { useKanban, refreshTasks } from "./useKanban";
 export { useKeyboardShortcuts } from "./useKeyboardShortcuts";
 export { useAzureSync } from "./useAzureSync";
+export { useChangeFeed } from "./useChangeFeed";
 
 export type {
   TimerConfig,
@@ -24,6 +29,11 @@ export type {
   UrgencyLevel,
 } from "./useTimer";
 export type { Theme } from "./useTheme";
-export type { SessionHistoryEntry, SessionHistory } from "./useSessionHistory";
+export type {
+  SessionHistoryEntry,
+  SessionHistory,
+  SummaryPeriod,
+  PeriodTotals,
+} from "./useSessionHistory";
 export type { KanbanTask, KanbanStatus, KanbanState } from "./useKanban";
 export type { AzureConfig, SyncStatus } from "./useAzureSync";
@@ -1,5 +1,7 @@
 import { computed, ref } from "vue";
 import { useStorage } from "./useStorage";
+import { refreshSessions } from "./useSessionHistory";
+import { refreshTasks } from "./useKanban";
 import { pushToCloud, pullFromCloud, type AzureCredentials } from "../api/sync";
 
 export interface AzureConfig {
@@ -41,7 +43,10 @@ export function useAzureSync() {
     try {
       const result = await pushToCloud(config.value as AzureCredentials);
       _status.value = "success";
-      _message.value = `Pushed ${result.exportedSessions} sessions, ${result.exportedTasks} tasks`;
+      _message.value =
+        result.mode === "unchanged"
+          ? "Already up to date"
+          : `Pushed ${result.exportedSessions} sessions, ${result.exportedTasks} tasks`;
     } catch (e: unknown) {
       _status.value = "error";
       _message.value = e instanceof Error ? e.message : "Push failed";
@@ -55,9 +60,13 @@ export function useAzureSync() {
     try {
       const result = await pullFromCloud(config.value as AzureCredentials);
       _status.value = "success";
-      _message.value = `Pulled ${result.importedSessions} sessions, ${result.importedTasks} tasks. Reloading…`;
-      // Reload the app so all composables re-fetch from the DB
-      setTimeout(() => window.location.reload(), 1500);
+      if (result.mode === "unchanged") {
+        _message.value = "Already up to date";
+        return;
+      }
+      _message.value = `Pulled ${result.importedSessions} sessions, ${result.importedTasks} tasks`;
+      // Other tabs refetch when the change feed announces the replace
+      await Promise.all([refreshSessions(), refreshTasks()]);
     } catch (e: unknown) {
       _status.value = "error";
       _message.value = e instanceof Error ? e.message : "Pull failed";
@@ -0,0 +1,88 @@
+import {
+  refreshSessions,
+  applySessions,
+  applySessionsCleared,
+  sessionsLoaded,
+  sessionsVersion,
+} from "./useSessionHistory";
+import type { SessionHistoryEntry } from "./useSessionHistory";
+import {
+  refreshTasks,
+  applyTask,
+  applyTasks,
+  applyTaskDeleted,
+  applyTasksCleared,
+  tasksLoaded,
+  tasksVersion,
+} from "./useKanban";
+import type { KanbanTask } from "./useKanban";
+
+// Singleton connection – shared across all useChangeFeed() calls
+let _source: EventSource | null = null;
+let _wanted = false;
+
+function refetchAll() {
+  refreshSessions();
+  refreshTasks();
+}
+
+/**
+ * Feed URL resuming after the older of the two loaded lists, so writes made
+ * between a list fetch and the connection are replayed. A list that failed
+ * to load has no version: the feed then starts from now.
+ */
+function feedUrl(): string {
+  const versions = [sessionsVersion(), tasksVersion()];
+  if (versions.some((v) => v === null)) return "/api/changes";
+  return `/api/changes?since=${Math.min(...(versions as number[]))}`;
+}
+
+function on<T>(source: EventSource, type: string, apply: (data: T) => void) {
+  source.addEventListener(type, (event) => {
+    try {
+      apply(JSON.parse((event as MessageEvent<string>).data) as T);
+    } catch (e) {
+      console.error(`[useChangeFeed] Bad ${type} event:`, e);
+    }
+  });
+}
+
+/**
+ * Apply changes made in other tabs and clients as they are committed.
+ * The first connection resumes from the data version of the loaded lists;
+ * EventSource then reconnects on its own and resumes from the last event id.
+ */
+export function useChangeFeed() {
+  const connect = async () => {
+    if (_source || typeof EventSource === "undefined") return;
+    _wanted = true;
+    await Promise.all([sessionsLoaded(), tasksLoaded()]);
+    if (_source || !_wanted) return;
+    const source = new EventSource(feedUrl());
+    on<{ session: SessionHistoryEntry }>(source, "session.upserted", (d) =>
+      applySessions([d.session]),
+    );
+    on<{ sessions: SessionHistoryEntry[] }>(source, "sessions.upserted", (d) =>
+      applySessions(d.sessions),
+    );
+    on(source, "sessions.cleared", applySessionsCleared);
+    on<{ task: KanbanTask }>(source, "task.upserted", (d) => applyTask(d.task));
+    on<{ tasks: KanbanTask[] }>(source, "tasks.upserted", (d) =>
+      applyTasks(d.tasks),
+    );
+    on<{ id: string }>(source, "task.deleted", (d) => applyTaskDeleted(d.id));
+    on(source, "tasks.cleared", applyTasksCleared);
+    // Bulk replace (sync pull) or missed events: refetch everything
+    on(source, "replace", refetchAll);
+    on(source, "reset", refetchAll);
+    _source = source;
+  };
+
+  const disconnect = () => {
+    _wanted = false;
+    _source?.close();
+    _source = null;
+  };
+
+  return { connect, disconnect };
+}
@@ -1,5 +1,6 @@
 import { computed, ref } from "vue";
 import * as kanbanApi from "../api/kanban";
+import type { KanbanTaskPatch } from "../api/kanban";
 
 export type KanbanStatus = "todo" | "in-progress" | "done";
 
@@ -21,12 +22,20 @@ export interface KanbanState {
 // ---------------------------------------------------------------------------
 const _tasks = ref<KanbanTask[]>([]);
 const _loaded = ref(false);
+// Data version (list ETag) of the last full fetch, null until one succeeds
+let _version: number | null = null;
+
+/** Data version the loaded tasks reflect, for resuming the change feed. */
+export function tasksVersion(): number | null {
+  return _version;
+}
 
 /** Re-fetch all tasks from the backend. Called on init and after a pull. */
 export async function refreshTasks(): Promise<void> {
   try {
-    const data = await kanbanApi.fetchTasks();
-    _tasks.value = data;
+    const { tasks, version } = await kanbanApi.fetchTasksVersioned();
+    _tasks.value = tasks;
+    _version = version;
   } catch (e) {
     console.error("[useKanban] Failed to load tasks:", e);
   } finally {
@@ -34,9 +43,44 @@ export async function refreshTasks(): Promise<void> {
   }
 }
 
+let _initialLoad: Promise<void> | null = null;
+
+/** Resolves once tasks have been fetched, starting the first fetch if needed. */
+export function tasksLoaded(): Promise<void> {
+  _initialLoad ??= refreshTasks();
+  return _initialLoad;
+}
+
+/** Insert or replace a task written elsewhere (from the change feed). */
+export function applyTask(task: KanbanTask): void {
+  const index = _tasks.value.findIndex((t) => t.id === task.id);
+  if (index === -1) {
+    _tasks.value = [..._tasks.value, task].sort(
+      (a, b) => a.createdAt - b.createdAt,
+    );
+  } else {
+    _tasks.value = _tasks.value.map((t, i) => (i === index ? task : t));
+  }
+}
+
+/** Insert or replace several tasks written elsewhere. */
+export function applyTasks(tasks: KanbanTask[]): void {
+  tasks.forEach(applyTask);
+}
+
+/** Remove a task deleted elsewhere. */
+export function applyTaskDeleted(taskId: string): void {
+  _tasks.value = _tasks.value.filter((t) => t.id !== taskId);
+}
+
+/** Drop all local tasks after they were cleared elsewhere. */
+export function applyTasksCleared(): void {
+  _tasks.value = [];
+}
+
 export function useKanban() {
   if (!_loaded.value) {
-    refreshTasks();
+    tasksLoaded();
   }
 
   const todoTasks = computed(() =>
@@ -76,6 +120,8 @@ export function useKanban() {
     const task = _tasks.value.find((t) => t.id === taskId);
     if (!task) return;
 
+    // Every status change of one move goes out in a single PATCH
+    const patches: KanbanTaskPatch[] = [];
     const updated: KanbanTask[] = _tasks.value.map((t) => {
       // Bump existing in-progress back to todo
       if (
@@ -83,31 +129,25 @@ export function useKanban() {
         t.status === "in-progress" &&
         t.id !== taskId
       ) {
-        const reverted = {
-          ...t,
-          status: "todo" as KanbanStatus,
-          completedAt: undefined,
-        };
-        kanbanApi
-          .updateTask(reverted)
-          .catch((e) => console.error("[useKanban] Failed to update task:", e));
-        return reverted;
+        patches.push({ id: t.id, status: "todo", completedAt: null });
+        return { ...t, status: "todo" as KanbanStatus, completedAt: undefined };
       }
       if (t.id === taskId) {
-        const moved: KanbanTask = {
-          ...t,
+        const completedAt = newStatus === "done" ? Date.now() : undefined;
+        patches.push({
+          id: t.id,
           status: newStatus,
-          completedAt: newStatus === "done" ? Date.now() : undefined,
-        };
-        kanbanApi
-          .updateTask(moved)
-          .catch((e) => console.error("[useKanban] Failed to update task:", e));
-        return moved;
+          completedAt: completedAt ?? null,
+        });
+        return { ...t, status: newStatus, completedAt };
       }
       return t;
     });
 
     _tasks.value = updated;
+    kanbanApi
+      .patchTasks(patches)
+      .catch((e) => console.error("[useKanban] Failed to update task:", e));
   };
 
   const deleteTask = (taskId: string) => {
@@ -125,8 +165,9 @@ export function useKanban() {
       pomodorosCompleted: task.pomodorosCompleted + 1,
     };
     _tasks.value = _tasks.value.map((t) => (t.id === task.id ? updated : t));
+    // Incremented server-side so concurrent tabs never lose a pomodoro
     kanbanApi
-      .updateTask(updated)
+      .patchTasks([{ id: task.id, pomodorosIncrement: 1 }])
       .catch((e) =>
         console.error("[useKanban] Failed to increment pomodoros:", e),
       );
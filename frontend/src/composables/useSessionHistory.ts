@@ -1,6 +1,8 @@
 import { computed, ref } from "vue";
 import type { SessionType } from "./useTimer";
 import * as sessionsApi from "../api/sessions";
+import * as labelsApi from "../api/labels";
+import * as statsApi from "../api/stats";
 
 export interface SessionHistoryEntry {
   id: string;
@@ -16,7 +18,53 @@ export interface SessionHistory {
   lastCleared: number; // timestamp ms
 }
 
+export type SummaryPeriod = "today" | "week" | "month";
+
+export interface PeriodTotals {
+  focusCount: number;
+  breakCount: number;
+  totalFocusMinutes: number;
+}
+
 const MAX_ENTRIES = 500;
+const MAX_RECENT_LABELS = 10;
+
+/** Local midnight starting the period (weeks start on Monday). */
+function periodStart(period: SummaryPeriod): Date {
+  const now = new Date();
+  if (period === "month") return new Date(now.getFullYear(), now.getMonth(), 1);
+  const start = new Date(now);
+  if (period === "week") {
+    const day = now.getDay();
+    start.setDate(now.getDate() - (day === 0 ? 6 : day - 1));
+  }
+  start.setHours(0, 0, 0, 0);
+  return start;
+}
+
+function localDay(date: Date): string {
+  const month = String(date.getMonth() + 1).padStart(2, "0");
+  const day = String(date.getDate()).padStart(2, "0");
+  return `${date.getFullYear()}-${month}-${day}`;
+}
+
+/**
+ * Totals for a summary period from the server's daily rollup. Unlike the
+ * loaded history (the newest MAX_ENTRIES sessions), they count every session.
+ */
+export async function fetchPeriodTotals(
+  period: SummaryPeriod,
+): Promise<PeriodTotals> {
+  const stats = await statsApi.fetchStats({
+    from: localDay(periodStart(period)),
+    to: localDay(new Date()),
+  });
+  return {
+    focusCount: stats.focusCount,
+    breakCount: stats.breakCount,
+    totalFocusMinutes: Math.round(stats.focusSeconds / 60),
+  };
+}
 
 // ---------------------------------------------------------------------------
 // Module-level singleton state (shared across all useSessionHistory() calls)
@@ -24,12 +72,38 @@ const MAX_ENTRIES = 500;
 const _entries = ref<SessionHistoryEntry[]>([]);
 const _lastCleared = ref<number>(Date.now());
 const _loaded = ref(false);
+// Most recently used labels across the whole history, from the server's index
+const _serverLabels = ref<string[]>([]);
+// Data version (list ETag) of the last full fetch, null until one succeeds
+let _version: number | null = null;
+
+/** Data version the loaded sessions reflect, for resuming the change feed. */
+export function sessionsVersion(): number | null {
+  return _version;
+}
+
+/** Re-fetch the most recently used labels from the backend. */
+export async function refreshLabels(): Promise<void> {
+  try {
+    const data = await labelsApi.fetchLabels({
+      order: "recent",
+      limit: MAX_RECENT_LABELS,
+    });
+    _serverLabels.value = data.map((l) => l.label);
+  } catch (e) {
+    console.error("[useSessionHistory] Failed to load labels:", e);
+  }
+}
 
 /** Re-fetch all sessions from the backend. Called on init and after a pull. */
 export async function refreshSessions(): Promise<void> {
   try {
-    const data = await sessionsApi.fetchSessions();
-    _entries.value = data;
+    const [{ sessions, version }] = await Promise.all([
+      sessionsApi.fetchSessionsVersioned(),
+      refreshLabels(),
+    ]);
+    _entries.value = sessions;
+    _version = version;
   } catch (e) {
     console.error("[useSessionHistory] Failed to load sessions:", e);
   } finally {
@@ -37,10 +111,34 @@ export async function refreshSessions(): Promise<void> {
   }
 }
 
+let _initialLoad: Promise<void> | null = null;
+
+/** Resolves once sessions have been fetched, starting the first fetch if needed. */
+export function sessionsLoaded(): Promise<void> {
+  _initialLoad ??= refreshSessions();
+  return _initialLoad;
+}
+
+/** Merge sessions written elsewhere (from the change feed), newest first. */
+export function applySessions(entries: SessionHistoryEntry[]): void {
+  const byId = new Map(_entries.value.map((e) => [e.id, e]));
+  entries.forEach((e) => byId.set(e.id, e));
+  _entries.value = Array.from(byId.values())
+    .sort((a, b) => b.completedAt - a.completedAt || b.id.localeCompare(a.id))
+    .slice(0, MAX_ENTRIES);
+}
+
+/** Drop all local sessions after they were cleared elsewhere. */
+export function applySessionsCleared(): void {
+  _entries.value = [];
+  _serverLabels.value = [];
+  _lastCleared.value = Date.now();
+}
+
 export function useSessionHistory() {
   // Trigger a background load on first use
   if (!_loaded.value) {
-    refreshSessions();
+    sessionsLoaded();
   }
 
   // Computed view of the full history (read-only compatible with old interface)
@@ -49,32 +147,19 @@ export function useSessionHistory() {
     lastCleared: _lastCleared.value,
   }));
 
+  const entriesSince = (period: SummaryPeriod) => {
+    const start = periodStart(period).getTime();
+    return _entries.value.filter((e) => e.completedAt >= start);
+  };
+
   // Get today's entries only
-  const todayEntries = computed(() => {
-    const today = new Date();
-    today.setHours(0, 0, 0, 0);
-    const todayStart = today.getTime();
-    return _entries.value.filter((e) => e.completedAt >= todayStart);
-  });
+  const todayEntries = computed(() => entriesSince("today"));
 
   // Get this week's entries (Monday-based)
-  const weekEntries = computed(() => {
-    const now = new Date();
-    const day = now.getDay();
-    const diff = day === 0 ? 6 : day - 1;
-    const monday = new Date(now);
-    monday.setDate(now.getDate() - diff);
-    monday.setHours(0, 0, 0, 0);
-    const weekStart = monday.getTime();
-    return _entries.value.filter((e) => e.completedAt >= weekStart);
-  });
+  const weekEntries = computed(() => entriesSince("week"));
 
   // Get this month's entries
-  const monthEntries = computed(() => {
-    const now = new Date();
-    const monthStart = new Date(now.getFullYear(), now.getMonth(), 1).getTime();
-    return _entries.value.filter((e) => e.completedAt >= monthStart);
-  });
+  const monthEntries = computed(() => entriesSince("month"));
 
   // Today's stats
   const todayStats = computed(() => {
@@ -137,6 +222,7 @@ export function useSessionHistory() {
   /** Clear all history. Updates local state immediately, DELETEs on backend in background. */
   const clearHistory = () => {
     _entries.value = [];
+    _serverLabels.value = [];
     _lastCleared.value = Date.now();
     sessionsApi
       .deleteAllSessions()
@@ -145,13 +231,19 @@ export function useSessionHistory() {
       );
   };
 
-  // Get unique labels used (for autocomplete presets)
+  // Unique recently used labels (for autocomplete presets): the newest local
+  // entries first, then the server's label index for older history
   const recentLabels = computed(() => {
     const labels = new Set<string>();
-    _entries.value.forEach((e) => {
+    for (const e of _entries.value) {
+      if (labels.size >= MAX_RECENT_LABELS) break;
       if (e.label && e.label.trim()) labels.add(e.label);
-    });
-    return Array.from(labels).slice(0, 10);
+    }
+    for (const label of _serverLabels.value) {
+      if (labels.size >= MAX_RECENT_LABELS) break;
+      labels.add(label);
+    }
+    return Array.from(labels);
   });
 
   return {